@@ -0,0 +1,248 @@
+"""
+Módulo de armazenamento de anexos - disco local ou S3 compatível
+
+O banco guarda só os metadados (nome_arquivo é a chave do objeto); os bytes
+ficam no backend escolhido por ANEXOS_BACKEND:
+  - "local" (padrão): arquivos em UPLOADS_DIR, servidos pela própria API;
+  - "s3": bucket S3 ou compatível (MinIO, R2...). Downloads são redirecionados
+    para URLs pré-assinadas de curta duração e uploads podem ir direto do
+    navegador para o bucket, sem passar pelos workers.
+
+Cada inquilino (ver inquilinos.py) tem a sua subpasta UPLOADS_DIR/inquilinos/<id>
+ou o seu prefixo S3_PREFIXO + "inquilinos/<id>/".
+"""
+
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import quote
+
+import inquilinos
+
+ANEXOS_BACKEND = os.getenv("ANEXOS_BACKEND", "local")
+
+# Pasta para uploads (backend local)
+UPLOADS_DIR = Path(os.getenv("UPLOADS_DIR", Path(__file__).parent / "uploads"))
+UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Backend S3: credenciais pelas variáveis padrão da AWS (AWS_ACCESS_KEY_ID...)
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGIAO = os.getenv("S3_REGIAO") or None
+S3_PREFIXO = os.getenv("S3_PREFIXO", "anexos/")
+
+# Validade das URLs pré-assinadas e tamanho máximo de upload direto
+URL_EXPIRA_SEGUNDOS = int(os.getenv("ANEXOS_URL_EXPIRA_SEGUNDOS", "300"))
+ANEXO_TAMANHO_MAXIMO = int(os.getenv("ANEXO_TAMANHO_MAXIMO_MB", "25")) * 1024 * 1024
+
+# Nomes gerados por gerar_nome_arquivo (impede acessar chaves arbitrárias)
+_RE_NOME_ARQUIVO = re.compile(r"^[0-9a-f]{32}(\.[A-Za-z0-9]{1,10})?$")
+
+
+def gerar_nome_arquivo(nome_original: str) -> str:
+    """Gera um nome único para o arquivo, preservando a extensão."""
+    extensao = Path(nome_original).suffix
+    if not re.fullmatch(r"\.[A-Za-z0-9]{1,10}", extensao):
+        extensao = ""
+    return f"{uuid.uuid4().hex}{extensao}"
+
+
+def nome_arquivo_valido(nome_arquivo: str) -> bool:
+    """Indica se o nome tem o formato gerado por gerar_nome_arquivo."""
+    return bool(_RE_NOME_ARQUIVO.match(nome_arquivo))
+
+
+def pasta_uploads() -> Path:
+    """Pasta dos anexos do inquilino atual (backend local)."""
+    inquilino = inquilinos.atual()
+    return UPLOADS_DIR if inquilino is None else UPLOADS_DIR / "inquilinos" / inquilino
+
+
+def _prefixo_s3() -> str:
+    inquilino = inquilinos.atual()
+    return S3_PREFIXO if inquilino is None else f"{S3_PREFIXO}inquilinos/{inquilino}/"
+
+
+def _content_disposition(nome_original: str) -> str:
+    # filename* (RFC 5987) preserva acentos; filename é o fallback ASCII
+    ascii_ = nome_original.encode("ascii", "replace").decode().replace('"', "")
+    return f"attachment; filename=\"{ascii_}\"; filename*=UTF-8''{quote(nome_original)}"
+
+
+class ArmazenamentoLocal:
+    """Arquivos em UPLOADS_DIR; downloads e uploads passam pela API."""
+
+    def __init__(self, pasta: Path = UPLOADS_DIR):
+        self.pasta = pasta
+        self.pasta.mkdir(parents=True, exist_ok=True)
+
+    def salvar(self, nome_arquivo: str, conteudo: bytes, tipo: Optional[str] = None):
+        with open(self.pasta / nome_arquivo, "wb") as f:
+            f.write(conteudo)
+
+    def excluir(self, nome_arquivo: str):
+        (self.pasta / nome_arquivo).unlink(missing_ok=True)
+
+    def excluir_varios(self, nomes_arquivos: list[str]):
+        for nome_arquivo in nomes_arquivos:
+            self.excluir(nome_arquivo)
+
+    def ler(self, nome_arquivo: str) -> Optional[bytes]:
+        """Conteúdo do arquivo, ou None se não existir."""
+        caminho = self.pasta / nome_arquivo
+        return caminho.read_bytes() if caminho.exists() else None
+
+    def tamanho(self, nome_arquivo: str) -> Optional[int]:
+        """Tamanho do arquivo em bytes, ou None se não existir."""
+        caminho = self.pasta / nome_arquivo
+        return caminho.stat().st_size if caminho.exists() else None
+
+    def caminho_local(self, nome_arquivo: str) -> Path:
+        return self.pasta / nome_arquivo
+
+    def listar(self) -> Iterator[tuple[str, float]]:
+        """Percorre os arquivos armazenados: (nome_arquivo, modificado em - timestamp Unix)."""
+        for caminho in self.pasta.iterdir():
+            if caminho.is_file():
+                yield caminho.name, caminho.stat().st_mtime
+
+    def url_download(self, nome_arquivo: str, nome_original: str, tipo: Optional[str]) -> Optional[str]:
+        """Sem URL externa: o download é servido pela rota da API."""
+        return None
+
+    def url_upload(self, nome_arquivo: str, tipo: Optional[str]) -> Optional[dict]:
+        """Sem upload direto: o cliente envia o arquivo para a API."""
+        return None
+
+
+class ArmazenamentoS3:
+    """Objetos em um bucket S3 compatível, com URLs pré-assinadas."""
+
+    def __init__(self, prefixo: str = S3_PREFIXO, cliente=None):
+        import boto3
+        from botocore.config import Config
+
+        if not S3_BUCKET:
+            raise RuntimeError("ANEXOS_BACKEND=s3 requer S3_BUCKET")
+        self.bucket = S3_BUCKET
+        self.prefixo = prefixo
+        # Assinatura v4 e path-style funcionam tanto na AWS quanto no MinIO
+        self.cliente = cliente or boto3.client(
+            "s3",
+            endpoint_url=S3_ENDPOINT_URL,
+            region_name=S3_REGIAO,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"})
+        )
+
+    def _chave(self, nome_arquivo: str) -> str:
+        return f"{self.prefixo}{nome_arquivo}"
+
+    def salvar(self, nome_arquivo: str, conteudo: bytes, tipo: Optional[str] = None):
+        self.cliente.put_object(
+            Bucket=self.bucket,
+            Key=self._chave(nome_arquivo),
+            Body=conteudo,
+            ContentType=tipo or "application/octet-stream"
+        )
+
+    def excluir(self, nome_arquivo: str):
+        self.cliente.delete_object(Bucket=self.bucket, Key=self._chave(nome_arquivo))
+
+    def excluir_varios(self, nomes_arquivos: list[str]):
+        """Exclui em requisições de até 1000 objetos (limite do DeleteObjects)."""
+        for inicio in range(0, len(nomes_arquivos), 1000):
+            resposta = self.cliente.delete_objects(
+                Bucket=self.bucket,
+                Delete={
+                    "Objects": [{"Key": self._chave(nome)} for nome in nomes_arquivos[inicio:inicio + 1000]],
+                    "Quiet": True,
+                }
+            )
+            # Falhas vêm na resposta, não como exceção: a tarefa é tentada de novo
+            if resposta.get("Errors"):
+                raise RuntimeError(f"Falha ao excluir {len(resposta['Errors'])} objeto(s) do S3")
+
+    def ler(self, nome_arquivo: str) -> Optional[bytes]:
+        """Conteúdo do objeto, ou None se não existir."""
+        from botocore.exceptions import ClientError
+
+        try:
+            resposta = self.cliente.get_object(Bucket=self.bucket, Key=self._chave(nome_arquivo))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return resposta["Body"].read()
+
+    def tamanho(self, nome_arquivo: str) -> Optional[int]:
+        """Tamanho do objeto em bytes, ou None se não existir."""
+        from botocore.exceptions import ClientError
+
+        try:
+            resposta = self.cliente.head_object(Bucket=self.bucket, Key=self._chave(nome_arquivo))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return resposta["ContentLength"]
+
+    def caminho_local(self, nome_arquivo: str) -> Optional[Path]:
+        return None
+
+    def listar(self) -> Iterator[tuple[str, float]]:
+        """Percorre os objetos do prefixo: (nome_arquivo, modificado em - timestamp Unix)."""
+        # Delimiter: só os objetos do próprio prefixo, não os dos inquilinos abaixo dele
+        paginas = self.cliente.get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket, Prefix=self.prefixo, Delimiter="/"
+        )
+        for pagina in paginas:
+            for objeto in pagina.get("Contents", []):
+                yield objeto["Key"][len(self.prefixo):], objeto["LastModified"].timestamp()
+
+    def url_download(self, nome_arquivo: str, nome_original: str, tipo: Optional[str]) -> str:
+        """URL GET pré-assinada que já devolve o nome original como anexo."""
+        return self.cliente.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._chave(nome_arquivo),
+                "ResponseContentDisposition": _content_disposition(nome_original),
+                "ResponseContentType": tipo or "application/octet-stream",
+            },
+            ExpiresIn=URL_EXPIRA_SEGUNDOS
+        )
+
+    def url_upload(self, nome_arquivo: str, tipo: Optional[str]) -> dict:
+        """POST pré-assinado (url + campos do formulário) limitado a ANEXO_TAMANHO_MAXIMO."""
+        tipo = tipo or "application/octet-stream"
+        return self.cliente.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=self._chave(nome_arquivo),
+            Fields={"Content-Type": tipo},
+            Conditions=[
+                {"Content-Type": tipo},
+                ["content-length-range", 1, ANEXO_TAMANHO_MAXIMO],
+            ],
+            ExpiresIn=URL_EXPIRA_SEGUNDOS
+        )
+
+
+# inquilino -> backend (None = principal)
+_armazenamentos: dict = {}
+
+
+def obter_armazenamento():
+    """Retorna o backend de armazenamento do inquilino atual (criado no primeiro uso)."""
+    inquilino = inquilinos.atual()
+    armazenamento = _armazenamentos.get(inquilino)
+    if armazenamento is None:
+        if ANEXOS_BACKEND == "s3":
+            # Um único cliente boto3 para todos os inquilinos
+            existente = next(iter(_armazenamentos.values()), None)
+            armazenamento = ArmazenamentoS3(_prefixo_s3(), existente.cliente if existente else None)
+        else:
+            armazenamento = ArmazenamentoLocal(pasta_uploads())
+        _armazenamentos[inquilino] = armazenamento
+    return armazenamento
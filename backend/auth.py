@@ -1,8 +1,22 @@
 """
 Módulo de autenticação - JWT para API REST
+
+Sem inquilino, a senha é APP_PASSWORD e o acesso é ao banco principal. Com
+inquilinos (ver inquilinos.py), cada um tem a sua senha no cadastro e o seu
+ID vai no claim "inquilino" dos tokens; as dependências abaixo definem o
+inquilino da requisição a partir dele.
 """
 
+import asyncio
+import base64
+import hashlib
+import hmac
 import os
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -11,63 +25,276 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from dotenv import load_dotenv
 
+import database
+import inquilinos
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
 # Configurações
 APP_PASSWORD = os.getenv("APP_PASSWORD", "admin123")
+# Hash scrypt da senha (gerado com `python auth.py gerar-hash`); tem prioridade sobre APP_PASSWORD
+APP_PASSWORD_HASH = os.getenv("APP_PASSWORD_HASH")
 SECRET_KEY = os.getenv("SECRET_KEY", "sua-chave-secreta-aqui-mude-em-producao")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_DAYS = 7
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+
+# Cache de tokens já verificados (evita decodificar/verificar o HMAC a cada requisição)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+# Intervalo para recarregar revogações feitas por outros workers (as deste valem na hora)
+REVOGACAO_RECARGA_SEGUNDOS = 30
+
+# Parâmetros do scrypt (memory-hard: ~16 MB por verificação)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
 
 # Security scheme para Swagger
 security = HTTPBearer()
+# Para o stream SSE, onde o token também pode vir na query string
+security_opcional = HTTPBearer(auto_error=False)
+
+_cache_lock = threading.Lock()
+_tokens_verificados: "OrderedDict[bytes, dict]" = OrderedDict()
+_revogados: set[str] = set()
+_revogados_carregado_em = float("-inf")
+_revogados_recarregando = False
 
 
-def criar_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+def criar_token(data: dict, expires_delta: Optional[timedelta] = None, tipo: str = "access") -> str:
     """Cria um token JWT."""
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "tipo": tipo})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def carregar_revogados():
+    """Recarrega do banco a lista de revogação (bloqueante: fora do event loop)."""
+    global _revogados, _revogados_carregado_em, _revogados_recarregando
+    try:
+        with _cache_lock:
+            antes = set(_revogados)
+        revogados = database.listar_tokens_revogados()
+        with _cache_lock:
+            # Os revogados neste worker durante a consulta podem não estar nela
+            _revogados = revogados | (_revogados - antes)
+    finally:
+        # Também após uma falha: a próxima tentativa espera o intervalo
+        _revogados_carregado_em = time.monotonic()
+        _revogados_recarregando = False
+
+
+def _token_revogado(jti: Optional[str]) -> bool:
+    """
+    Verifica (em O(1)) se o jti está na lista de revogação.
+
+    Roda no event loop, então não consulta o banco: quando a lista passa de
+    REVOGACAO_RECARGA_SEGUNDOS, a recarga é feita em uma thread e esta
+    verificação usa a lista atual. Um token revogado em outro worker pode
+    ser aceito aqui por até esse intervalo (mais a duração da consulta); os
+    revogados neste worker são recusados na hora.
+    """
+    global _revogados_recarregando
+    if time.monotonic() - _revogados_carregado_em > REVOGACAO_RECARGA_SEGUNDOS:
+        with _cache_lock:
+            recarregar = not _revogados_recarregando
+            _revogados_recarregando = True
+        if recarregar:
+            threading.Thread(target=carregar_revogados, name="revogacoes", daemon=True).start()
+    return jti in _revogados
+
+
+def decodificar_token(token: str, tipo: str = "access") -> Optional[dict]:
+    """
+    Decodifica e valida um token JWT, retornando o payload ou None.
+
+    Tokens válidos ficam em um cache LRU (chave: SHA-256 do token) até expirarem,
+    então requisições repetidas com o mesmo token não refazem a verificação.
+    """
+    chave = hashlib.sha256(token.encode()).digest()
+
+    with _cache_lock:
+        payload = _tokens_verificados.get(chave)
+        if payload is not None:
+            _tokens_verificados.move_to_end(chave)
+
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        with _cache_lock:
+            _tokens_verificados[chave] = payload
+            if len(_tokens_verificados) > TOKEN_CACHE_SIZE:
+                _tokens_verificados.popitem(last=False)
+
+    if payload.get("exp", 0) <= time.time():
+        with _cache_lock:
+            _tokens_verificados.pop(chave, None)
+        return None
+
+    # Tokens antigos (sem "tipo") eram sempre de acesso
+    if payload.get("tipo", "access") != tipo or _token_revogado(payload.get("jti")):
+        return None
+
+    return payload
+
+
 def verificar_token(token: str) -> bool:
     """Verifica se um token JWT é válido."""
+    payload = decodificar_token(token)
+    return bool(payload and payload.get("authenticated", False))
+
+
+def revogar_token(token: str, tipo: str = "access"):
+    """Revoga um token (logout ou rotação do refresh token)."""
+    payload = decodificar_token(token, tipo=tipo)
+    if not payload or not payload.get("jti"):
+        return
+    database.revogar_token(payload["jti"], int(payload["exp"]))
+    with _cache_lock:
+        _revogados.add(payload["jti"])
+
+
+def gerar_hash_senha(senha: str) -> str:
+    """Gera o hash scrypt de uma senha no formato scrypt$n$r$p$salt$hash."""
+    salt = secrets.token_bytes(16)
+    derivada = hashlib.scrypt(senha.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return "$".join([
+        "scrypt", str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P),
+        base64.b64encode(salt).decode(), base64.b64encode(derivada).decode()
+    ])
+
+
+_hash_senha_app: Optional[str] = None
+
+
+def _obter_hash_senha_app() -> str:
+    """Retorna o hash configurado ou, na falta dele, o hash de APP_PASSWORD (calculado uma vez)."""
+    global _hash_senha_app
+    if _hash_senha_app is None:
+        _hash_senha_app = APP_PASSWORD_HASH or gerar_hash_senha(APP_PASSWORD)
+    return _hash_senha_app
+
+
+def verificar_senha(senha: str, senha_hash: Optional[str] = None) -> bool:
+    """Verifica a senha contra o hash (padrão: o da aplicação), com scrypt e comparação em tempo constante."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("authenticated", False)
-    except JWTError:
+        _, n, r, p, salt, esperado = (senha_hash or _obter_hash_senha_app()).split("$")
+        derivada = hashlib.scrypt(
+            senha.encode(), salt=base64.b64decode(salt), n=int(n), r=int(r), p=int(p)
+        )
+    except ValueError:
         return False
+    return hmac.compare_digest(derivada, base64.b64decode(esperado))
 
 
-def verificar_senha(senha: str) -> bool:
-    """Verifica se a senha está correta."""
-    return senha == APP_PASSWORD
+def criar_par_tokens(inquilino: Optional[str] = None) -> dict:
+    """Cria um access token de curta duração e o refresh token correspondente."""
+    data = {"authenticated": True}
+    if inquilino:
+        data["inquilino"] = inquilino
+    return {
+        "access_token": criar_token(
+            data=data,
+            expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        ),
+        "refresh_token": criar_token(
+            data=data,
+            expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+            tipo="refresh"
+        ),
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
 
 
-def fazer_login(senha: str) -> Optional[str]:
-    """Autentica e retorna o token JWT se a senha estiver correta."""
-    if verificar_senha(senha):
-        access_token = criar_token(
-            data={"authenticated": True},
-            expires_delta=timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
-        )
-        return access_token
+async def fazer_login(senha: str, inquilino: Optional[str] = None) -> Optional[dict]:
+    """Autentica (no inquilino, se informado) e retorna o par de tokens JWT se a senha estiver correta."""
+    senha_hash = None
+    if inquilino:
+        cadastro = None
+        if inquilinos.id_valido(inquilino):
+            cadastro = await asyncio.to_thread(database.obter_inquilino, inquilino)
+        if cadastro is None:
+            # Mesmo custo de uma senha errada: não revela quais inquilinos existem
+            await asyncio.to_thread(verificar_senha, senha)
+            return None
+        senha_hash = cadastro["senha_hash"]
+
+    # O scrypt é caro de propósito: roda em thread para não bloquear o event loop
+    if await asyncio.to_thread(verificar_senha, senha, senha_hash):
+        return criar_par_tokens(inquilino)
     return None
 
 
+def renovar_tokens(refresh_token: str) -> Optional[dict]:
+    """Troca um refresh token válido por um novo par (o refresh usado é revogado)."""
+    payload = decodificar_token(refresh_token, tipo="refresh")
+    if not payload or not payload.get("authenticated", False):
+        return None
+    revogar_token(refresh_token, tipo="refresh")
+    return criar_par_tokens(payload.get("inquilino"))
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Dependency para verificar autenticação nas rotas protegidas."""
-    token = credentials.credentials
-    if not verificar_token(token):
+    """Dependency para verificar autenticação nas rotas protegidas (define o inquilino da requisição)."""
+    payload = decodificar_token(credentials.credentials)
+    if not payload or not payload.get("authenticated", False):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido ou expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    inquilinos.definir(payload.get("inquilino"))
     return True
+
+
+
+async def get_current_user_stream(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_opcional)
+) -> dict:
+    """
+    Como get_current_user, mas aceita o token em ?token= (o EventSource do
+    navegador não envia headers). Retorna o payload, para o stream terminar
+    quando o token expirar.
+    """
+    token = credentials.credentials if credentials else token
+    payload = decodificar_token(token) if token else None
+    if not payload or not payload.get("authenticated", False):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido ou expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    inquilinos.definir(payload.get("inquilino"))
+    return payload
+
+
+if __name__ == "__main__":
+    import sys
+    from getpass import getpass
+
+    if sys.argv[1:] == ["gerar-hash"]:
+        print(gerar_hash_senha(getpass("Senha: ")))
+    elif len(sys.argv) in (4, 5) and sys.argv[1] == "criar-inquilino":
+        inquilino_id, nome = sys.argv[2], sys.argv[3]
+        if not inquilinos.id_valido(inquilino_id):
+            print("ID inválido: use minúsculas, dígitos e _ (2 a 40 caracteres, começando por letra)")
+            sys.exit(1)
+        database.init_db()
+        database.criar_inquilino(
+            inquilino_id, nome, gerar_hash_senha(getpass("Senha do inquilino: ")),
+            email_avisos=sys.argv[4] if len(sys.argv) == 5 else None
+        )
+        print(f"Inquilino {inquilino_id} criado")
+    else:
+        print("Uso: python auth.py gerar-hash")
+        print("     python auth.py criar-inquilino <id> <nome> [email_avisos]")
+        sys.exit(1)
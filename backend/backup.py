@@ -0,0 +1,326 @@
+"""
+Módulo de backup - cópias online do banco SQLite e dos anexos
+
+O banco é copiado com a API de backup do SQLite em passos de poucas páginas,
+soltando o lock entre eles, então as requisições continuam sendo atendidas
+durante a cópia. Cada backup é um .tar.gz com o snapshot do banco e um
+manifesto dos anexos que ele referencia. Os arquivos dos anexos nunca mudam
+depois de gravados (nomes únicos), então ficam em BACKUP_DIR/uploads e são
+copiados uma única vez, compartilhados entre os backups retidos.
+
+Uso (a partir de backend/):
+    python backup.py criar
+    python backup.py listar
+    python backup.py restaurar data/backups/backup-20250101-030000.tar.gz
+
+Com DB_BACKEND=postgres use pg_dump; com ANEXOS_BACKEND=s3 os anexos não são
+copiados (use o versionamento do bucket), apenas listados no manifesto.
+
+Cada inquilino (ver inquilinos.py) tem os seus backups em
+BACKUP_DIR/inquilinos/<id>; na linha de comando, use --inquilino <id>.
+"""
+
+import argparse
+import io
+import itertools
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Também roda como script: carrega o .env antes dos módulos que leem a configuração
+load_dotenv()
+
+import database
+import inquilinos
+from armazenamento import ANEXOS_BACKEND, pasta_uploads
+
+BACKUP_DIR = Path(os.getenv("BACKUP_DIR", database.DATA_DIR / "backups"))
+# Quantos backups manter (os mais antigos são removidos)
+BACKUP_RETENCAO = int(os.getenv("BACKUP_RETENCAO", "7"))
+# Intervalo do backup automático pela fila de tarefas (0 = desligado)
+BACKUP_INTERVALO_HORAS = float(os.getenv("BACKUP_INTERVALO_HORAS", "24"))
+
+# Páginas copiadas por passo e pausa entre passos (lock liberado na pausa)
+PAGINAS_POR_PASSO = 1024
+PAUSA_ENTRE_PASSOS = 0.005
+# Cada escrita de outra conexão reinicia a cópia; depois disso, copia em um passo só
+MAX_REINICIOS = 3
+
+logger = logging.getLogger("backup")
+
+
+def pasta_backups() -> Path:
+    """Pasta dos backups do inquilino atual."""
+    inquilino = inquilinos.atual()
+    return BACKUP_DIR if inquilino is None else BACKUP_DIR / "inquilinos" / inquilino
+
+
+def _exigir_sqlite():
+    if database.DB_BACKEND != "sqlite":
+        raise RuntimeError("Backup online disponível só para SQLite; no PostgreSQL use pg_dump")
+
+
+class _CopiaReiniciada(Exception):
+    pass
+
+
+def copiar_banco(destino: Path) -> int:
+    """
+    Copia o banco em uso para `destino` sem bloquear as escritas.
+
+    A cópia é feita em passos; se o banco for alterado no meio, o SQLite a
+    reinicia do zero. Com escrita contínua isso poderia não terminar nunca,
+    então após MAX_REINICIOS a cópia é feita em um único passo. O banco está
+    em WAL (ver database.init_db): esse passo é uma transação de leitura,
+    que copia um snapshot consistente enquanto as escritas seguem no WAL.
+    Retorna quantas vezes reiniciou.
+    """
+    reinicios = 0
+    restantes_antes = None
+
+    def progresso(status, restantes, total):
+        nonlocal restantes_antes, reinicios
+        if restantes_antes is not None and restantes > restantes_antes:
+            reinicios += 1
+            if reinicios > MAX_REINICIOS:
+                raise _CopiaReiniciada
+        restantes_antes = restantes
+
+    origem = sqlite3.connect(database.caminho_banco(), timeout=30)
+    copia = sqlite3.connect(destino)
+    try:
+        try:
+            origem.backup(copia, pages=PAGINAS_POR_PASSO, progress=progresso, sleep=PAUSA_ENTRE_PASSOS)
+        except _CopiaReiniciada:
+            origem.backup(copia, pages=-1)
+    finally:
+        copia.close()
+        origem.close()
+    return reinicios
+
+
+def _manifesto(db_snapshot: Path) -> dict:
+    """Lista os anexos referenciados pelo snapshot (e não pelo banco atual), inclusive os arquivados."""
+    conn = sqlite3.connect(db_snapshot)
+    rows = conn.execute(
+        """SELECT nome_arquivo, tamanho FROM anexos
+           UNION ALL
+           SELECT nome_arquivo, tamanho FROM anexos_arquivo
+           ORDER BY nome_arquivo"""
+    ).fetchall()
+    conn.close()
+    return {
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "armazenamento": ANEXOS_BACKEND,
+        "anexos": [{"nome_arquivo": nome, "tamanho": tamanho} for nome, tamanho in rows],
+    }
+
+
+def _copiar_anexos(manifesto: dict) -> int:
+    """Copia para a pasta de backups/uploads os anexos ainda não copiados. Retorna quantos copiou."""
+    if ANEXOS_BACKEND != "local":
+        return 0
+    pasta = pasta_backups() / "uploads"
+    uploads = pasta_uploads()
+    pasta.mkdir(parents=True, exist_ok=True)
+
+    copiados = 0
+    for anexo in manifesto["anexos"]:
+        destino = pasta / anexo["nome_arquivo"]
+        origem = uploads / anexo["nome_arquivo"]
+        if destino.exists() or not origem.exists():
+            continue
+        temporario = destino.with_suffix(destino.suffix + ".tmp")
+        shutil.copyfile(origem, temporario)
+        os.replace(temporario, destino)
+        copiados += 1
+    return copiados
+
+
+def _ordem_backup(arquivo: Path) -> tuple[str, int]:
+    """backup-AAAAMMDD-HHMMSS[-N].tar.gz: pela data e, no mesmo segundo, pelo N."""
+    nome = arquivo.name.removesuffix(".tar.gz")
+    sufixo = nome[len("backup-AAAAMMDD-HHMMSS-"):]
+    return nome[:len("backup-AAAAMMDD-HHMMSS")], int(sufixo) if sufixo.isdigit() else 1
+
+
+def listar_backups() -> list[Path]:
+    """Backups existentes, do mais antigo para o mais recente."""
+    return sorted(pasta_backups().glob("backup-*.tar.gz"), key=_ordem_backup)
+
+
+def _reservar_nome(pasta: Path) -> str:
+    """
+    Nome livre para um backup novo. O nome tem resolução de segundos: os
+    backups seguintes no mesmo segundo (ex.: a tarefa e a linha de comando)
+    recebem -2, -3... O .tmp é criado aqui, de forma exclusiva, e reserva o nome.
+    """
+    base = f"backup-{datetime.now():%Y%m%d-%H%M%S}"
+    # Depois do maior N existente: um N liberado pela retenção não volta, senão ficaria fora de ordem
+    usados = [_ordem_backup(Path(arquivo.name.removesuffix(".tmp")))[1] for arquivo in pasta.glob(f"{base}*")]
+    for n in itertools.count(max(usados, default=0) + 1):
+        nome = base if n == 1 else f"{base}-{n}"
+        try:
+            (pasta / f"{nome}.tar.gz.tmp").open("xb").close()
+        except FileExistsError:
+            continue
+        # Com o .tmp reservado, o .tar.gz só pode ser de um backup já concluído
+        if not (pasta / f"{nome}.tar.gz").exists():
+            return nome
+        (pasta / f"{nome}.tar.gz.tmp").unlink()
+
+
+def _ler_manifesto(arquivo: Path) -> dict:
+    with tarfile.open(arquivo, "r:gz") as tar:
+        return json.load(tar.extractfile("manifesto.json"))
+
+
+def aplicar_retencao(manter: int = BACKUP_RETENCAO) -> int:
+    """Remove os backups além dos `manter` mais recentes e os anexos que só eles usavam."""
+    backups = listar_backups()
+    removidos = backups[:-manter] if manter > 0 else []
+    for arquivo in removidos:
+        arquivo.unlink()
+
+    pasta = pasta_backups() / "uploads"
+    if removidos and pasta.exists():
+        em_uso = set()
+        for arquivo in listar_backups():
+            em_uso.update(a["nome_arquivo"] for a in _ler_manifesto(arquivo)["anexos"])
+        for copia in pasta.iterdir():
+            if copia.name not in em_uso:
+                copia.unlink()
+    return len(removidos)
+
+
+def criar_backup() -> Path:
+    """Cria um backup (snapshot do banco + manifesto + anexos novos) e aplica a retenção."""
+    _exigir_sqlite()
+    pasta = pasta_backups()
+    pasta.mkdir(parents=True, exist_ok=True)
+    inicio = time.perf_counter()
+    nome = _reservar_nome(pasta)
+
+    with tempfile.TemporaryDirectory(dir=pasta) as tmp:
+        snapshot = Path(tmp) / "dados.db"
+        copiar_banco(snapshot)
+        manifesto = _manifesto(snapshot)
+        copiados = _copiar_anexos(manifesto)
+
+        # Escrito com nome temporário: um backup pela metade nunca parece válido
+        parcial = pasta / f"{nome}.tar.gz.tmp"
+        with tarfile.open(parcial, "w:gz", compresslevel=6) as tar:
+            tar.add(snapshot, arcname="dados.db")
+            dados = json.dumps(manifesto, ensure_ascii=False, indent=2).encode()
+            info = tarfile.TarInfo("manifesto.json")
+            info.size = len(dados)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(dados))
+        destino = pasta / f"{nome}.tar.gz"
+        os.replace(parcial, destino)
+
+    removidos = aplicar_retencao()
+    logger.info(
+        "Backup %s criado em %.1fs (%d anexo(s) novo(s), %d backup(s) antigo(s) removido(s))",
+        destino.name, time.perf_counter() - inicio, copiados, removidos
+    )
+    return destino
+
+
+def _extrair_banco(tar: tarfile.TarFile, pasta: str):
+    """
+    Extrai o dados.db do backup. O filtro "data" do tarfile só existe a partir
+    do Python 3.11.4; sem ele, confere o membro à mão (arquivo comum, sem link).
+    """
+    if hasattr(tarfile, "data_filter"):
+        tar.extract("dados.db", pasta, filter="data")
+        return
+    membro = tar.getmember("dados.db")
+    if not membro.isfile():
+        raise RuntimeError("Backup inválido: dados.db não é um arquivo comum")
+    with tar.extractfile(membro) as origem, open(Path(pasta) / "dados.db", "wb") as destino:
+        shutil.copyfileobj(origem, destino)
+
+
+def restaurar_backup(arquivo: Path):
+    """
+    Restaura o banco e os anexos locais de um backup.
+
+    Deve rodar com a API parada: o arquivo do banco é substituído.
+    """
+    _exigir_sqlite()
+    caminho_banco = database.caminho_banco()
+    with tempfile.TemporaryDirectory(dir=caminho_banco.parent) as tmp:
+        with tarfile.open(arquivo, "r:gz") as tar:
+            _extrair_banco(tar, tmp)
+            manifesto = json.load(tar.extractfile("manifesto.json"))
+
+        restaurado = Path(tmp) / "dados.db"
+        conn = sqlite3.connect(restaurado)
+        resultado = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        conn.close()
+        if resultado != "ok":
+            raise RuntimeError(f"Backup corrompido: {resultado}")
+
+        faltando = []
+        if manifesto["armazenamento"] == "local" and ANEXOS_BACKEND == "local":
+            copias = pasta_backups() / "uploads"
+            uploads = pasta_uploads()
+            uploads.mkdir(parents=True, exist_ok=True)
+            for anexo in manifesto["anexos"]:
+                destino = uploads / anexo["nome_arquivo"]
+                if destino.exists():
+                    continue
+                origem = copias / anexo["nome_arquivo"]
+                if origem.exists():
+                    shutil.copyfile(origem, destino)
+                else:
+                    faltando.append(anexo["nome_arquivo"])
+
+        os.replace(restaurado, caminho_banco)
+        # O WAL de um banco que não fechou limpo seria aplicado sobre o restaurado
+        for sufixo in ("-wal", "-shm"):
+            Path(f"{caminho_banco}{sufixo}").unlink(missing_ok=True)
+
+    if faltando:
+        logger.warning("%d anexo(s) do manifesto não estão nas cópias do backup", len(faltando))
+    return faltando
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inquilino", help="ID do inquilino (padrão: banco principal)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("criar", help="cria um backup agora")
+    comandos.add_parser("listar", help="lista os backups retidos")
+    restaurar = comandos.add_parser("restaurar", help="restaura um backup (com a API parada)")
+    restaurar.add_argument("arquivo", type=Path)
+    args = parser.parse_args()
+    inquilinos.definir(args.inquilino)
+
+    if args.comando == "criar":
+        print(criar_backup())
+    elif args.comando == "listar":
+        for arquivo in listar_backups():
+            manifesto = _ler_manifesto(arquivo)
+            tamanho = arquivo.stat().st_size / 1024 / 1024
+            print(f"{arquivo.name}  {tamanho:8.1f} MB  {len(manifesto['anexos'])} anexo(s)")
+    else:
+        faltando = restaurar_backup(args.arquivo)
+        print(f"Restaurado de {args.arquivo}" + (f" ({len(faltando)} anexo(s) faltando)" if faltando else ""))
+        sys.exit(1 if faltando else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Módulo de banco PostgreSQL - backend alternativo para o database.py
+
+Ativado com DB_BACKEND=postgres e DATABASE_URL. As funções do database.py
+continuam as mesmas: este módulo só fornece conexões de um pool (psycopg 3)
+com a mesma interface usada por elas (cursor/execute/fetch/commit/close) e
+traduz o SQL escrito para o SQLite:
+  - marcadores "?" viram "%s";
+  - LIKE vira ILIKE (no SQLite o LIKE já ignora maiúsculas);
+  - CURRENT_TIMESTAMP vira texto "YYYY-MM-DD HH:MM:SS" em UTC, o mesmo
+    formato que o SQLite grava, para que datas e cursores de paginação
+    sejam idênticos nos dois backends.
+
+Cada inquilino (ver inquilinos.py) tem um schema próprio e um pool pequeno
+de conexões com o search_path apontando para ele. Os pools ficam em um LRU
+limitado por worker: com centenas de inquilinos, só os ativos mantêm
+conexões abertas.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+import psycopg
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/registros")
+# Conexões por worker do gunicorn (o total no servidor é workers x máximo)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Conexões por inquilino e quantos pools de inquilinos ficam abertos por worker
+INQUILINO_POOL_MAX = int(os.getenv("INQUILINO_POOL_MAX", "3"))
+INQUILINOS_MAX_POOLS = int(os.getenv("INQUILINOS_MAX_POOLS", "32"))
+
+ErroIntegridade = psycopg.IntegrityError
+
+_AGORA = "to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"
+
+SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS registros (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        titulo TEXT NOT NULL,
+        quilometragem INTEGER,
+        proxima_troca INTEGER,
+        data_proxima_troca TEXT,
+        filtro_trocado INTEGER DEFAULT 0,
+        dados TEXT DEFAULT '{{}}',
+        criado_em TEXT DEFAULT {_AGORA},
+        atualizado_em TEXT DEFAULT {_AGORA}
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS anexos (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        registro_id BIGINT NOT NULL REFERENCES registros(id) ON DELETE CASCADE,
+        nome_original TEXT NOT NULL,
+        nome_arquivo TEXT NOT NULL,
+        tipo TEXT,
+        tamanho INTEGER,
+        criado_em TEXT DEFAULT {_AGORA}
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS veiculos (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        placa TEXT NOT NULL UNIQUE,
+        modelo TEXT NOT NULL,
+        ano INTEGER,
+        cor TEXT,
+        placa_normalizada TEXT COLLATE "C",
+        modelo_normalizado TEXT COLLATE "C",
+        criado_em TEXT DEFAULT {_AGORA},
+        atualizado_em TEXT DEFAULT {_AGORA}
+    )
+    """,
+    # Chaves do autocompletar; COLLATE "C" para a busca por intervalo seguir a ordem dos bytes
+    'ALTER TABLE veiculos ADD COLUMN IF NOT EXISTS placa_normalizada TEXT COLLATE "C"',
+    'ALTER TABLE veiculos ADD COLUMN IF NOT EXISTS modelo_normalizado TEXT COLLATE "C"',
+    "CREATE INDEX IF NOT EXISTS idx_veiculos_placa_normalizada ON veiculos (placa_normalizada)",
+    "CREATE INDEX IF NOT EXISTS idx_veiculos_modelo_normalizado ON veiculos (modelo_normalizado, placa_normalizada)",
+    "CREATE INDEX IF NOT EXISTS idx_registros_criado_em ON registros (criado_em, id)",
+    "CREATE INDEX IF NOT EXISTS idx_registros_atualizado_em ON registros (atualizado_em, id)",
+    "CREATE INDEX IF NOT EXISTS idx_anexos_registro_id ON anexos (registro_id)",
+    # As escritas no log travam a tabela até o commit (database._travar_alteracoes),
+    # para os seqs ficarem visíveis na ordem em que foram atribuídos
+    f"""
+    CREATE TABLE IF NOT EXISTS alteracoes (
+        seq BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        entidade TEXT NOT NULL,
+        entidade_id BIGINT NOT NULL,
+        operacao TEXT NOT NULL,
+        criado_em TEXT DEFAULT {_AGORA}
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tokens_revogados (
+        jti TEXT PRIMARY KEY,
+        expira_em BIGINT NOT NULL
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS tarefas (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        tipo TEXT NOT NULL,
+        dados TEXT DEFAULT '{{}}',
+        chave TEXT UNIQUE,
+        estado TEXT NOT NULL DEFAULT 'pendente',
+        executar_em DOUBLE PRECISION NOT NULL,
+        reservada_ate DOUBLE PRECISION NOT NULL DEFAULT 0,
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        erro TEXT,
+        criado_em TEXT DEFAULT {_AGORA}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_tarefas_fila ON tarefas (estado, executar_em)",
+    "CREATE INDEX IF NOT EXISTS idx_registros_data_proxima_troca ON registros (data_proxima_troca)",
+    "CREATE INDEX IF NOT EXISTS idx_registros_titulo ON registros (titulo, criado_em, id)",
+    f"""
+    CREATE TABLE IF NOT EXISTS notificacoes (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        registro_id BIGINT NOT NULL,
+        tipo TEXT NOT NULL,
+        titulo TEXT NOT NULL,
+        mensagem TEXT NOT NULL,
+        data_proxima_troca TEXT NOT NULL,
+        criado_em TEXT DEFAULT {_AGORA},
+        UNIQUE (registro_id, tipo, data_proxima_troca)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS estatisticas_km (
+        placa TEXT PRIMARY KEY,
+        pontos INTEGER NOT NULL,
+        soma_t DOUBLE PRECISION NOT NULL,
+        soma_km DOUBLE PRECISION NOT NULL,
+        soma_tt DOUBLE PRECISION NOT NULL,
+        soma_tkm DOUBLE PRECISION NOT NULL,
+        ultimo_registro_id BIGINT NOT NULL,
+        ultimo_dia DOUBLE PRECISION NOT NULL,
+        ultima_quilometragem INTEGER NOT NULL,
+        proxima_troca INTEGER,
+        data_proxima_troca TEXT
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS registros_arquivo (
+        id BIGINT PRIMARY KEY,
+        titulo TEXT NOT NULL,
+        quilometragem INTEGER,
+        proxima_troca INTEGER,
+        data_proxima_troca TEXT,
+        filtro_trocado INTEGER DEFAULT 0,
+        dados BYTEA,
+        texto_busca TEXT,
+        criado_em TEXT,
+        atualizado_em TEXT,
+        arquivado_em TEXT DEFAULT {_AGORA}
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS anexos_arquivo (
+        id BIGINT PRIMARY KEY,
+        registro_id BIGINT NOT NULL,
+        nome_original TEXT NOT NULL,
+        nome_arquivo TEXT NOT NULL,
+        tipo TEXT,
+        tamanho INTEGER,
+        criado_em TEXT
+    )
+    """,
+    "ALTER TABLE registros_arquivo ADD COLUMN IF NOT EXISTS texto_busca TEXT",
+    "CREATE INDEX IF NOT EXISTS idx_registros_arquivo_criado_em ON registros_arquivo (criado_em, id)",
+    "CREATE INDEX IF NOT EXISTS idx_anexos_arquivo_registro_id ON anexos_arquivo (registro_id)",
+]
+
+# Só no schema public (banco principal)
+SCHEMA_PRINCIPAL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS inquilinos (
+        id TEXT PRIMARY KEY,
+        nome TEXT NOT NULL,
+        senha_hash TEXT NOT NULL,
+        email_avisos TEXT,
+        criado_em TEXT DEFAULT {_AGORA}
+    )
+    """,
+]
+
+_RE_LIKE = re.compile(r"\bLIKE\b")
+
+# esquema -> pool (None = schema public), do menos para o mais recente
+_pools: "OrderedDict[Optional[str], ConnectionPool]" = OrderedDict()
+_pools_lock = threading.Lock()
+
+
+@lru_cache(maxsize=256)
+def traduzir(sql: str) -> str:
+    """Converte o SQL do dialeto SQLite usado no database.py para PostgreSQL."""
+    sql = sql.replace("%", "%%").replace("?", "%s")
+    sql = _RE_LIKE.sub("ILIKE", sql)
+    return sql.replace("CURRENT_TIMESTAMP", _AGORA)
+
+
+def _criar_pool(esquema: Optional[str]) -> ConnectionPool:
+    if esquema is None:
+        return ConnectionPool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN,
+            max_size=DB_POOL_MAX,
+            kwargs={"row_factory": dict_row},
+            open=True
+        )
+    # Sem conexões mínimas: inquilino ocioso não segura conexões no servidor
+    return ConnectionPool(
+        DATABASE_URL,
+        min_size=0,
+        max_size=INQUILINO_POOL_MAX,
+        kwargs={"row_factory": dict_row, "options": f"-c search_path={esquema}"},
+        open=True
+    )
+
+
+def _obter_pool(esquema: Optional[str] = None) -> ConnectionPool:
+    # Criados na primeira conexão: cada worker (após o fork) tem os seus pools
+    with _pools_lock:
+        pool = _pools.get(esquema)
+        if pool is not None:
+            _pools.move_to_end(esquema)
+            return pool
+        pool = _pools[esquema] = _criar_pool(esquema)
+        de_inquilinos = [e for e in _pools if e is not None]
+        excedentes = de_inquilinos[:max(len(de_inquilinos) - INQUILINOS_MAX_POOLS, 0)]
+        fechar = [_pools.pop(e) for e in excedentes]
+
+    # Conexões emprestadas de um pool fechado são fechadas ao serem devolvidas
+    for antigo in fechar:
+        antigo.close()
+    return pool
+
+
+def fechar_pools():
+    """Fecha todos os pools do processo (o master do gunicorn, antes do fork)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class Cursor:
+    """Cursor com a interface usada pelo database.py (execute/fetch/rowcount)."""
+
+    def __init__(self, cursor: psycopg.Cursor):
+        self._cursor = cursor
+
+    def execute(self, sql: str, params=()):
+        self._cursor.execute(traduzir(sql), params)
+        return self
+
+    def executemany(self, sql: str, params):
+        self._cursor.executemany(traduzir(sql), params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, tamanho: int):
+        return self._cursor.fetchmany(tamanho)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+
+class Conexao:
+    """Conexão emprestada do pool; close() a devolve."""
+
+    def __init__(self, pool: ConnectionPool):
+        self._pool = pool
+        self._conn = pool.getconn()
+
+    def cursor(self) -> Cursor:
+        return Cursor(self._conn.cursor())
+
+    def execute(self, sql: str, params=()) -> Cursor:
+        return self.cursor().execute(sql, params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        # Leituras não fazem commit: encerra a transação antes de devolver ao pool
+        if not conn.closed:
+            conn.rollback()
+        self._pool.putconn(conn)
+
+    # Se uma exceção interromper a função antes do close(), a conexão
+    # volta ao pool quando o objeto é descartado, em vez de vazar.
+    __del__ = close
+
+
+def get_connection(esquema: Optional[str] = None) -> Conexao:
+    """Retorna uma conexão do pool do worker para o schema (None = public)."""
+    return Conexao(_obter_pool(esquema))
+
+
+def init_db(esquema: Optional[str] = None):
+    """Cria o schema, as tabelas e os índices (idempotente)."""
+    conn = get_connection(esquema)
+    cursor = conn.cursor()
+    if esquema is not None:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {esquema}")
+    for comando in (SCHEMA_PRINCIPAL if esquema is None else []) + SCHEMA:
+        cursor.execute(comando)
+    conn.commit()
+    conn.close()
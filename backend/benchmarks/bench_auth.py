@@ -0,0 +1,77 @@
+"""
+Microbenchmark do custo da autenticação por requisição.
+
+Compara a verificação completa do JWT (python-jose) com o caminho em cache
+de auth.decodificar_token e com a dependency get_current_user.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_auth.py [--iteracoes 20000]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database  # noqa: E402
+
+# Banco temporário: o benchmark não deve tocar no dados.db real
+database.DB_PATH = Path(tempfile.mkdtemp()) / "bench_auth.db"
+database.init_db()
+
+import auth  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+from jose import jwt  # noqa: E402
+
+
+def medir(funcao, iteracoes: int) -> dict:
+    """Executa a função N vezes e retorna o custo médio por chamada."""
+    funcao()  # aquecimento
+    inicio = time.perf_counter()
+    for _ in range(iteracoes):
+        funcao()
+    total = time.perf_counter() - inicio
+    return {
+        "iteracoes": iteracoes,
+        "total_s": round(total, 4),
+        "us_por_chamada": round(total / iteracoes * 1e6, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iteracoes", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = auth.criar_par_tokens()["access_token"]
+    credenciais = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    loop = asyncio.new_event_loop()
+
+    def sem_cache():
+        auth._tokens_verificados.clear()
+        auth.decodificar_token(token)
+
+    resultados = {
+        "jose_decode": medir(
+            lambda: jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM]),
+            args.iteracoes
+        ),
+        "decodificar_token_sem_cache": medir(sem_cache, args.iteracoes),
+        "decodificar_token_com_cache": medir(lambda: auth.decodificar_token(token), args.iteracoes),
+        "get_current_user_com_cache": medir(
+            lambda: loop.run_until_complete(auth.get_current_user(credenciais)),
+            args.iteracoes
+        ),
+    }
+    loop.close()
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Microbenchmark da geração de PDFs (relatorios.py), em páginas por segundo.
+
+Mede a listagem de todos os registros (em blocos de LINHAS_POR_TABELA e, para
+comparação, em uma tabela única), o PDF de um registro e o relatório
+consolidado de um veículo com miniaturas dos anexos, com o cache de
+miniaturas vazio e depois cheio.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_relatorios.py [--registros 5000] [--consolidado 200]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+# Anexos em uma pasta temporária: o benchmark não deve tocar em uploads/
+os.environ["UPLOADS_DIR"] = tempfile.mkdtemp()
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import relatorios  # noqa: E402
+from armazenamento import obter_armazenamento  # noqa: E402
+
+_PAGINA = re.compile(rb"/Type /Page[^s]")
+
+
+def gerar_registros(quantidade: int, rng: random.Random) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "titulo": f"Gol - ABC{rng.randint(1000, 9999)}",
+            "quilometragem": 10_000 + i * 500,
+            "proxima_troca": 20_000 + i * 500,
+            "data_proxima_troca": "2025-07-01",
+            "filtro_trocado": rng.random() < 0.7,
+            "dados": {"Óleo": "Mobil Super", "Viscosidade": "5W30", "Observações": "Filtro de ar também substituído"},
+            "criado_em": "2025-01-01 10:00:00",
+        }
+        for i in range(1, quantidade + 1)
+    ]
+
+
+def gerar_anexos(registros: list[dict]) -> dict[int, list[dict]]:
+    """
+    Uma foto (1600x1200, JPEG) e um PDF por registro, como os enviados pelo
+    celular. Cada foto é um arquivo próprio, para o cache de miniaturas
+    começar vazio.
+    """
+    from PIL import Image
+
+    imagem = Image.effect_mandelbrot((1600, 1200), (-2, -1.2, 1, 1.2), 100).convert("RGB")
+    conteudo = io.BytesIO()
+    imagem.save(conteudo, "JPEG", quality=85)
+
+    armazenamento = obter_armazenamento()
+    anexos = {}
+    for registro in registros:
+        nome_arquivo = f"{uuid.uuid4().hex}.jpg"
+        armazenamento.salvar(nome_arquivo, conteudo.getvalue())
+        anexos[registro["id"]] = [
+            {"id": registro["id"] * 2, "registro_id": registro["id"], "nome_original": "foto.jpg",
+             "nome_arquivo": nome_arquivo, "tipo": "image/jpeg"},
+            {"id": registro["id"] * 2 + 1, "registro_id": registro["id"], "nome_original": "nota.pdf",
+             "nome_arquivo": f"{uuid.uuid4().hex}.pdf", "tipo": "application/pdf"},
+        ]
+    return anexos
+
+
+def medir(funcao, repeticoes: int) -> dict:
+    """Executa a geração N vezes e retorna tempo médio, páginas e páginas/s."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        pdf = funcao()
+    total = time.perf_counter() - inicio
+    paginas = len(_PAGINA.findall(pdf))
+    return {
+        "paginas": paginas,
+        "kb": round(len(pdf) / 1024, 1),
+        "s_por_pdf": round(total / repeticoes, 4),
+        "paginas_por_s": round(paginas * repeticoes / total, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registros", type=int, default=5000, help="linhas da listagem")
+    parser.add_argument("--consolidado", type=int, default=200, help="registros do relatório consolidado")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    registros = gerar_registros(args.registros, rng)
+    historico = registros[:args.consolidado]
+    anexos = gerar_anexos(historico)
+    relatorios.pdf_registro(registros[0])  # aquecimento: importa o reportlab e monta os estilos
+
+    def tabela_unica():
+        blocos = relatorios.LINHAS_POR_TABELA
+        relatorios.LINHAS_POR_TABELA = len(registros)
+        try:
+            return relatorios.pdf_registros(registros)
+        finally:
+            relatorios.LINHAS_POR_TABELA = blocos
+
+    def consolidado_frio():
+        relatorios._gerar_miniatura.cache_clear()
+        return relatorios.pdf_consolidado("Histórico", historico, anexos, "veiculo")
+
+    resultados = {
+        "registro": medir(lambda: relatorios.pdf_registro(registros[0]), 50),
+        "listagem_em_blocos": medir(lambda: relatorios.pdf_registros(registros), args.repeticoes),
+        "listagem_tabela_unica": medir(tabela_unica, 1),
+        "consolidado_cache_vazio": medir(consolidado_frio, 1),
+        "consolidado_cache_cheio": medir(
+            lambda: relatorios.pdf_consolidado("Histórico", historico, anexos, "veiculo"), args.repeticoes
+        ),
+    }
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compara dois resultados de executar.py (base x novo) e aponta regressões.
+
+Sai com código 1 se algum endpoint ficou mais lento (p50/p99) ou com menos
+vazão além da tolerância, o que permite usá-lo em CI.
+
+Uso (a partir de backend/):
+    python benchmarks/comparar.py base.json novo.json --tolerancia 10
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def variacao(base: float, novo: float) -> float:
+    """Variação percentual de base para novo."""
+    if not base:
+        return 0.0
+    return (novo - base) / base * 100
+
+
+def comparar(base: dict, novo: dict, tolerancia: float) -> list[str]:
+    """Imprime a tabela comparativa e retorna a lista de regressões."""
+    regressoes = []
+    print(f"{'endpoint':24} {'req/s':>18} {'p50 ms':>22} {'p99 ms':>22}")
+
+    for nome, atual in novo["endpoints"].items():
+        anterior = base["endpoints"].get(nome)
+        if anterior is None:
+            print(f"{nome:24} (novo)")
+            continue
+
+        colunas = []
+        # (métrica, valor base, valor novo, maior é melhor)
+        for metrica, v_base, v_novo, maior_melhor in (
+            ("req/s", anterior["vazao_rps"], atual["vazao_rps"], True),
+            ("p50", anterior["latencia_ms"]["p50"], atual["latencia_ms"]["p50"], False),
+            ("p99", anterior["latencia_ms"]["p99"], atual["latencia_ms"]["p99"], False),
+        ):
+            delta = variacao(v_base, v_novo)
+            piora = -delta if maior_melhor else delta
+            marca = " !" if piora > tolerancia else "  "
+            if piora > tolerancia:
+                regressoes.append(f"{nome}: {metrica} {v_base} -> {v_novo} ({delta:+.1f}%)")
+            colunas.append(f"{v_novo:>9} {delta:>+7.1f}%{marca}")
+
+        print(f"{nome:24} " + " ".join(f"{c:>22}" for c in colunas))
+
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", type=Path)
+    parser.add_argument("novo", type=Path)
+    parser.add_argument("--tolerancia", type=float, default=10, help="piora máxima aceita, em %%")
+    args = parser.parse_args()
+
+    base = json.loads(args.base.read_text())
+    novo = json.loads(args.novo.read_text())
+    if (base["modo"], base["concorrencia"]) != (novo["modo"], novo["concorrencia"]):
+        print("Aviso: resultados com modo/concorrência diferentes não são comparáveis", file=sys.stderr)
+
+    regressoes = comparar(base, novo, args.tolerancia)
+    if regressoes:
+        print(f"\n{len(regressoes)} regressão(ões) acima de {args.tolerancia}%:")
+        for linha in regressoes:
+            print(f"  {linha}")
+        sys.exit(1)
+    print("\nSem regressões.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Executa o benchmark de todas as rotas da API e grava os resultados em JSON.
+
+Dois modos:
+  - em processo (padrão): importa main.app e usa um cliente ASGI (httpx),
+    medindo só a aplicação, sem rede;
+  - HTTP (--url): gera carga contra um servidor em execução (ex.: gunicorn).
+
+Para cada endpoint reporta vazão (req/s), latência p50/p90/p99/máx (ms),
+erros e, no modo em processo, o pico de memória (RSS) após o endpoint.
+
+Uso (a partir de backend/):
+    python benchmarks/semear.py --volume pequeno --destino /tmp/bench
+    python benchmarks/executar.py --dados /tmp/bench --saida resultado.json
+    python benchmarks/executar.py --url http://localhost:8000 --saida resultado.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+SENHA = os.getenv("APP_PASSWORD", "admin123")
+
+# Endpoints caros rodam menos vezes (fração do --requisicoes)
+FRACAO_PESADOS = {"exportar_pdf_todos": 0.02, "sync_completo": 0.05, "historico_completo": 0.05,
+                  "registros_completo": 0.05}
+
+
+def percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def rss_pico_mb() -> float:
+    # ru_maxrss: KB no Linux, bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Contexto:
+    """IDs reais usados para montar as requisições (obtidos pela própria API)."""
+
+    def __init__(self):
+        self.registros: list[int] = []
+        self.veiculos: list[int] = []
+        self.anexos: list[int] = []
+        # Criados durante o benchmark: consumidos pelos endpoints de exclusão
+        self.criados: list[int] = []
+        self.veiculos_criados: list[int] = []
+        self.anexos_criados: list[int] = []
+        self.refresh_tokens: list[str] = []
+        self.sessoes: list[tuple[str, str]] = []
+        self.token_sync = 0
+        self.sequencia = 0
+        self.rng = random.Random(42)
+
+    def registro(self) -> int:
+        return self.rng.choice(self.registros)
+
+    def veiculo(self) -> int:
+        return self.rng.choice(self.veiculos)
+
+    def anexo(self) -> int:
+        return self.rng.choice(self.anexos)
+
+    def placa(self) -> str:
+        # Prefixo fora do alfabeto do semear.py: não colide com a frota semeada
+        self.sequencia += 1
+        return f"ZZ{self.sequencia:05d}"
+
+
+def corpo_registro(ctx: Contexto) -> dict:
+    km = ctx.rng.randint(10_000, 200_000)
+    return {
+        "titulo": f"Gol - BEN{ctx.rng.randint(1000, 9999)}",
+        "quilometragem": km,
+        "proxima_troca": km + 10_000,
+        "data_proxima_troca": "2030-01-01",
+        "filtro_trocado": True,
+        "dados": {"Óleo": "Mobil Super", "Viscosidade": "5W30"},
+    }
+
+
+def endpoints(ctx: Contexto) -> list[tuple]:
+    """
+    (nome, montar) para cada rota. montar() retorna os kwargs de httpx.request,
+    mais "auth" (False para rotas públicas, ou outro access token) e "guardar" (callback com o JSON da
+    resposta), ou None quando não há mais nada a consumir.
+    """
+    def consumir(lista: list, montar):
+        return lambda: montar(lista.pop()) if lista else None
+
+    def guardar_sessao(corpo):
+        ctx.refresh_tokens.append(corpo["refresh_token"])
+        ctx.sessoes.append((corpo["access_token"], corpo["refresh_token"]))
+
+    def upload():
+        return {"method": "POST", "url": f"/api/registros/{ctx.registro()}/anexos",
+                "files": {"arquivo": ("nota.jpg", os.urandom(32 * 1024), "image/jpeg")},
+                "guardar": lambda corpo: ctx.anexos_criados.append(corpo["id"])}
+
+    return [
+        ("login", lambda: {"method": "POST", "url": "/api/login", "json": {"senha": SENHA}, "auth": False,
+                           "guardar": guardar_sessao}),
+        ("refresh", consumir(ctx.refresh_tokens, lambda token: {
+            "method": "POST", "url": "/api/refresh", "json": {"refresh_token": token}, "auth": False})),
+        ("verificar_auth", lambda: {"method": "GET", "url": "/api/verificar-auth"}),
+        ("registros_completo", lambda: {"method": "GET", "url": "/api/registros"}),
+        ("registros_pagina", lambda: {"method": "GET", "url": "/api/registros", "params": {"limite": 50}}),
+        ("registros_busca", lambda: {"method": "GET", "url": "/api/registros",
+                                     "params": {"busca": "Castrol", "limite": 50}}),
+        ("registros_resumo", lambda: {"method": "GET", "url": "/api/registros",
+                                      "params": {"limite": 50, "campos": "resumo"}}),
+        ("registro_obter", lambda: {"method": "GET", "url": f"/api/registros/{ctx.registro()}"}),
+        ("registro_criar", lambda: {"method": "POST", "url": "/api/registros", "json": corpo_registro(ctx),
+                                    "guardar": lambda corpo: ctx.criados.append(corpo["id"])}),
+        ("registro_atualizar", lambda: {"method": "PUT", "url": f"/api/registros/{ctx.registro()}",
+                                        "json": corpo_registro(ctx)}),
+        ("registro_excluir", consumir(ctx.criados, lambda id_: {
+            "method": "DELETE", "url": f"/api/registros/{id_}"})),
+        ("data_padrao", lambda: {"method": "GET", "url": "/api/data-padrao-proxima-troca"}),
+        ("historico_completo", lambda: {"method": "GET", "url": "/api/historico"}),
+        ("historico_pagina", lambda: {"method": "GET", "url": "/api/historico", "params": {"limite": 50}}),
+        ("historico_busca", lambda: {"method": "GET", "url": "/api/historico",
+                                     "params": {"busca": "freios", "limite": 50}}),
+        ("historico_resumo", lambda: {"method": "GET", "url": "/api/historico",
+                                      "params": {"limite": 50, "campos": "resumo"}}),
+        ("sync_completo", lambda: {"method": "GET", "url": "/api/sync", "params": {"desde": 0}}),
+        ("sync_delta", lambda: {"method": "GET", "url": "/api/sync", "params": {"desde": ctx.token_sync}}),
+        ("anexos_listar", lambda: {"method": "GET", "url": f"/api/registros/{ctx.registro()}/anexos"}),
+        ("anexo_obter", lambda: {"method": "GET", "url": f"/api/anexos/{ctx.anexo()}"}),
+        ("anexo_download", lambda: {"method": "GET", "url": f"/api/anexos/{ctx.anexo()}/download"}),
+        ("anexo_upload", upload),
+        ("anexo_excluir", consumir(ctx.anexos_criados, lambda id_: {
+            "method": "DELETE", "url": f"/api/anexos/{id_}"})),
+        ("veiculos_listar", lambda: {"method": "GET", "url": "/api/veiculos"}),
+        ("veiculo_obter", lambda: {"method": "GET", "url": f"/api/veiculos/{ctx.veiculo()}"}),
+        ("veiculos_autocompletar", lambda: {"method": "GET", "url": "/api/veiculos/autocomplete",
+                                            "params": {"q": ctx.rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") * 2}}),
+        ("veiculo_criar", lambda: {"method": "POST", "url": "/api/veiculos",
+                                   "json": {"placa": ctx.placa(), "modelo": "Gol", "ano": 2020},
+                                   "guardar": lambda corpo: ctx.veiculos_criados.append(corpo["id"])}),
+        ("veiculo_atualizar", lambda: {"method": "PUT", "url": f"/api/veiculos/{ctx.rng.choice(ctx.veiculos_criados)}",
+                                       "json": {"placa": ctx.placa(), "modelo": "Gol", "ano": 2021}}
+         if ctx.veiculos_criados else None),
+        ("veiculo_excluir", consumir(ctx.veiculos_criados, lambda id_: {
+            "method": "DELETE", "url": f"/api/veiculos/{id_}"})),
+        ("exportar_pdf_registro", lambda: {"method": "GET", "url": f"/api/registros/{ctx.registro()}/pdf"}),
+        ("exportar_pdf_todos", lambda: {"method": "GET", "url": "/api/exportar/pdf"}),
+        ("metrics", lambda: {"method": "GET", "url": "/metrics", "auth": False}),
+        # Por último: revoga sessões criadas pelo endpoint de login, nunca a do benchmark
+        ("logout", consumir(ctx.sessoes, lambda sessao: {
+            "method": "POST", "url": "/api/logout", "json": {"refresh_token": sessao[1]}, "auth": sessao[0]})),
+    ]
+
+
+async def preparar(cliente: httpx.AsyncClient) -> tuple[str, Contexto]:
+    """Faz login e coleta IDs existentes; garante ao menos um registro, anexo e veículo."""
+    resposta = await cliente.post("/api/login", json={"senha": SENHA})
+    resposta.raise_for_status()
+    token = resposta.json()["access_token"]
+    cabecalhos = {"Authorization": f"Bearer {token}"}
+    ctx = Contexto()
+
+    pagina = await cliente.get("/api/historico", params={"limite": 500}, headers=cabecalhos)
+    ctx.registros = [r["id"] for r in pagina.json()]
+    if not ctx.registros:
+        criado = await cliente.post("/api/registros", json=corpo_registro(ctx), headers=cabecalhos)
+        ctx.registros = [criado.json()["id"]]
+
+    veiculos = await cliente.get("/api/veiculos", headers=cabecalhos)
+    ctx.veiculos = [v["id"] for v in veiculos.json()][:500]
+    if not ctx.veiculos:
+        criado = await cliente.post("/api/veiculos", json={"placa": "BEN0A00", "modelo": "Gol"}, headers=cabecalhos)
+        ctx.veiculos = [criado.json()["id"]]
+
+    for registro_id in ctx.registros[:50]:
+        anexos = await cliente.get(f"/api/registros/{registro_id}/anexos", headers=cabecalhos)
+        ctx.anexos.extend(a["id"] for a in anexos.json())
+    if not ctx.anexos:
+        enviado = await cliente.post(
+            f"/api/registros/{ctx.registros[0]}/anexos",
+            files={"arquivo": ("nota.jpg", os.urandom(1024), "image/jpeg")},
+            headers=cabecalhos
+        )
+        ctx.anexos = [enviado.json()["id"]]
+
+    sync = await cliente.get("/api/sync", params={"desde": 0}, headers=cabecalhos)
+    ctx.token_sync = sync.json()["token"]
+    return token, ctx
+
+
+async def medir_endpoint(cliente, token, montar, requisicoes: int, concorrencia: int) -> dict:
+    latencias: list[float] = []
+    erros = 0
+    bytes_total = 0
+    fila = iter(range(requisicoes))
+
+    async def trabalhador():
+        nonlocal erros, bytes_total
+        for _ in fila:
+            pedido = montar()
+            if pedido is None:
+                return
+            guardar = pedido.pop("guardar", None)
+            auth = pedido.pop("auth", True)
+            cabecalhos = {} if auth is False else {"Authorization": f"Bearer {token if auth is True else auth}"}
+            inicio = time.perf_counter()
+            try:
+                resposta = await cliente.request(headers=cabecalhos, **pedido)
+            except httpx.HTTPError:
+                erros += 1
+                continue
+            latencias.append(time.perf_counter() - inicio)
+            bytes_total += len(resposta.content)
+            if resposta.status_code >= 400:
+                erros += 1
+            elif guardar is not None:
+                guardar(resposta.json())
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+
+    ms = [v * 1000 for v in latencias]
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "duracao_s": round(duracao, 3),
+        "vazao_rps": round(len(latencias) / duracao, 1) if duracao else 0,
+        "latencia_ms": {
+            "p50": round(percentil(ms, 50), 2),
+            "p90": round(percentil(ms, 90), 2),
+            "p99": round(percentil(ms, 99), 2),
+            "max": round(max(ms), 2) if ms else 0,
+        },
+        "bytes_resposta_media": round(bytes_total / len(latencias)) if latencias else 0,
+    }
+
+
+async def executar(args) -> dict:
+    if args.url:
+        transporte = None
+        base_url = args.url.rstrip("/")
+    else:
+        # Em processo: aponta a aplicação para o banco semeado antes de importá-la
+        os.environ["DB_PATH"] = str(args.dados / "dados.db")
+        os.environ["UPLOADS_DIR"] = str(args.dados / "uploads")
+        os.environ.setdefault("METRICAS_DIR", str(args.dados / "metricas"))
+        # O benchmark faz muitos logins seguidos: afrouxa o limite de taxa
+        os.environ.setdefault("LOGIN_POR_IP_CAPACIDADE", "1000000")
+        os.environ.setdefault("LOGIN_GLOBAL_CAPACIDADE", "1000000")
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+        from main import app
+        transporte = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+
+    filtro = set(args.endpoints.split(",")) if args.endpoints else None
+    resultados = {}
+
+    async with httpx.AsyncClient(transport=transporte, base_url=base_url, timeout=300) as cliente:
+        token, ctx = await preparar(cliente)
+        for nome, montar in endpoints(ctx):
+            if filtro and nome not in filtro:
+                continue
+            n = max(1, int(args.requisicoes * FRACAO_PESADOS.get(nome, 1)))
+            resultado = await medir_endpoint(cliente, token, montar, n, args.concorrencia)
+            if not args.url:
+                resultado["rss_pico_mb"] = rss_pico_mb()
+            resultados[nome] = resultado
+            print(f"{nome:24} {resultado['vazao_rps']:>9} req/s  p50 {resultado['latencia_ms']['p50']:>8} ms  "
+                  f"p99 {resultado['latencia_ms']['p99']:>8} ms  erros {resultado['erros']}", file=sys.stderr)
+
+    return {
+        "modo": "http" if args.url else "asgi",
+        "alvo": args.url or str(args.dados),
+        "requisicoes": args.requisicoes,
+        "concorrencia": args.concorrencia,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "executado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "endpoints": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    alvo = parser.add_mutually_exclusive_group(required=True)
+    alvo.add_argument("--dados", type=Path, help="pasta criada por semear.py (modo em processo)")
+    alvo.add_argument("--url", help="URL base de um servidor em execução (modo HTTP)")
+    parser.add_argument("--requisicoes", type=int, default=200, help="requisições por endpoint")
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--endpoints", help="lista separada por vírgula (padrão: todos)")
+    parser.add_argument("--saida", type=Path, help="arquivo JSON de resultado (padrão: stdout)")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(executar(args))
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        args.saida.write_text(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
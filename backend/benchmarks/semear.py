@@ -0,0 +1,184 @@
+"""
+Popula um banco SQLite de benchmark com volumes configuráveis.
+
+Gera veículos, registros (com "dados" realistas: óleo, viscosidade, filtros,
+observações) e anexos com arquivos reais no disco. A geração é determinística
+para um mesmo --semente, então execuções diferentes são comparáveis.
+
+Uso (a partir de backend/):
+    python benchmarks/semear.py --volume pequeno --destino /tmp/bench
+    python benchmarks/semear.py --registros 100000 --veiculos 2000 --destino /tmp/bench
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Volumes pré-definidos: (registros, veículos, fração de registros com anexo)
+VOLUMES = {
+    "pequeno": (1_000, 50, 0.3),
+    "medio": (100_000, 2_000, 0.2),
+    "grande": (1_000_000, 20_000, 0.05),
+}
+
+MODELOS = ["Gol", "Onix", "HB20", "Strada", "Hilux", "Corolla", "Civic", "Saveiro", "S10", "Kwid"]
+CORES = ["Prata", "Branco", "Preto", "Vermelho", "Cinza", "Azul"]
+OLEOS = ["Mobil Super", "Castrol Magnatec", "Shell Helix", "Lubrax Essencial", "Ipiranga F1"]
+VISCOSIDADES = ["5W30", "5W40", "10W40", "15W40", "0W20"]
+OBSERVACOES = [
+    "Troca realizada sem intercorrências",
+    "Cliente pediu revisão dos freios na próxima visita",
+    "Vazamento leve no cárter, monitorar",
+    "Filtro de ar também substituído",
+    "",
+]
+
+TAMANHO_LOTE = 10_000
+
+
+def gerar_placa(rng: random.Random, mercosul: bool) -> str:
+    letras = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3))
+    if mercosul:
+        return f"{letras}{rng.randint(0, 9)}{rng.choice('ABCDEFGHIJ')}{rng.randint(10, 99)}"
+    return f"{letras}{rng.randint(1000, 9999)}"
+
+
+def semear(destino: Path, registros: int, veiculos: int, fracao_anexos: float,
+           tamanho_anexo: int, semente: int) -> dict:
+    """Cria destino/dados.db e destino/uploads com o volume pedido."""
+    destino.mkdir(parents=True, exist_ok=True)
+    uploads = destino / "uploads"
+    uploads.mkdir(exist_ok=True)
+    db_path = destino / "dados.db"
+    if db_path.exists():
+        db_path.unlink()
+
+    # O schema é o da aplicação: init_db roda contra o banco de destino
+    os.environ["DB_PATH"] = str(db_path)
+    os.environ["UPLOADS_DIR"] = str(uploads)
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import database
+    database.init_db()
+
+    rng = random.Random(semente)
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+
+    # Veículos
+    frota = []
+    placas = set()
+    while len(frota) < veiculos:
+        placa = gerar_placa(rng, mercosul=rng.random() < 0.4)
+        if placa in placas:
+            continue
+        placas.add(placa)
+        frota.append((placa, rng.choice(MODELOS), rng.randint(2005, 2025), rng.choice(CORES)))
+    conn.executemany(
+        """INSERT INTO veiculos (placa, modelo, ano, cor, placa_normalizada, modelo_normalizado)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        [(*veiculo, database.normalizar_placa(veiculo[0]), database.normalizar_modelo(veiculo[1]))
+         for veiculo in frota]
+    )
+
+    # Registros: cada veículo acumula trocas a cada ~5.000-10.000 km ao longo de ~5 anos
+    km_atual = {placa: rng.randint(0, 80_000) for placa, *_ in frota}
+    data_base = datetime(2021, 1, 1)
+    periodo_segundos = 5 * 365 * 86400
+    anexos_total = 0
+    conteudo_anexo = rng.randbytes(tamanho_anexo)
+
+    for lote_inicio in range(0, registros, TAMANHO_LOTE):
+        linhas = []
+        for i in range(lote_inicio, min(lote_inicio + TAMANHO_LOTE, registros)):
+            placa, modelo, *_ = frota[rng.randrange(len(frota))]
+            km_atual[placa] += rng.randint(5_000, 10_000)
+            criado = data_base + timedelta(seconds=periodo_segundos * i // max(registros, 1))
+            dados = {"Óleo": rng.choice(OLEOS), "Viscosidade": rng.choice(VISCOSIDADES)}
+            observacao = rng.choice(OBSERVACOES)
+            if observacao:
+                dados["Observações"] = observacao
+            linhas.append((
+                f"{modelo} - {placa}",
+                km_atual[placa],
+                km_atual[placa] + 10_000,
+                (criado + timedelta(days=180)).date().isoformat(),
+                rng.random() < 0.7,
+                json.dumps(dados, ensure_ascii=False),
+                criado.strftime("%Y-%m-%d %H:%M:%S"),
+                criado.strftime("%Y-%m-%d %H:%M:%S"),
+            ))
+        conn.executemany(
+            """INSERT INTO registros
+               (titulo, quilometragem, proxima_troca, data_proxima_troca, filtro_trocado,
+                dados, criado_em, atualizado_em)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            linhas
+        )
+
+        # Anexos do lote (ids sequenciais: o lote acabou de ser inserido)
+        ultimo_id = conn.execute("SELECT MAX(id) FROM registros").fetchone()[0]
+        primeiro_id = ultimo_id - len(linhas) + 1
+        anexos = []
+        for registro_id in range(primeiro_id, ultimo_id + 1):
+            if rng.random() >= fracao_anexos:
+                continue
+            nome_arquivo = f"{uuid.UUID(int=rng.getrandbits(128)).hex}.jpg"
+            (uploads / nome_arquivo).write_bytes(conteudo_anexo)
+            anexos.append((registro_id, f"nota_{registro_id}.jpg", nome_arquivo, "image/jpeg", tamanho_anexo))
+        conn.executemany(
+            """INSERT INTO anexos (registro_id, nome_original, nome_arquivo, tipo, tamanho)
+               VALUES (?, ?, ?, ?, ?)""",
+            anexos
+        )
+        anexos_total += len(anexos)
+        conn.commit()
+
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+    return {
+        "db_path": str(db_path),
+        "uploads_dir": str(uploads),
+        "registros": registros,
+        "veiculos": veiculos,
+        "anexos": anexos_total,
+        "segundos": round(time.perf_counter() - inicio, 2),
+        "tamanho_db_mb": round(db_path.stat().st_size / 1024 / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--destino", type=Path, required=True, help="pasta onde criar dados.db e uploads/")
+    parser.add_argument("--volume", choices=VOLUMES, default="pequeno")
+    parser.add_argument("--registros", type=int, help="sobrescreve o volume pré-definido")
+    parser.add_argument("--veiculos", type=int, help="sobrescreve o volume pré-definido")
+    parser.add_argument("--fracao-anexos", type=float, help="fração de registros com um anexo")
+    parser.add_argument("--tamanho-anexo", type=int, default=32 * 1024, help="bytes por anexo")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    registros, veiculos, fracao = VOLUMES[args.volume]
+    resumo = semear(
+        args.destino,
+        registros=args.registros if args.registros is not None else registros,
+        veiculos=args.veiculos if args.veiculos is not None else veiculos,
+        fracao_anexos=args.fracao_anexos if args.fracao_anexos is not None else fracao,
+        tamanho_anexo=args.tamanho_anexo,
+        semente=args.semente,
+    )
+    print(json.dumps(resumo, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Módulo de coalescência - requisições idênticas simultâneas compartilham uma execução
+
+No início de um turno muitos usuários abrem o mesmo histórico e exportam o
+mesmo PDF ao mesmo tempo. Aqui a primeira requisição de uma chave (rota,
+parâmetros, inquilino e versão dos dados) executa o trabalho em uma thread;
+as idênticas que chegam enquanto ele roda aguardam o mesmo resultado, e as
+que chegam até COALESCENCIA_TTL_SEGUNDOS depois recebem o resultado pronto.
+Assim a carga de pico acompanha o número de consultas distintas, não o de
+usuários.
+
+A versão dos dados é o token de alterações (ver database.listar_alteracoes):
+qualquer escrita muda a chave, então o TTL não devolve dados anteriores a uma
+gravação, só limita por quanto tempo o resultado fica na memória.
+
+Vale por worker: com N workers do gunicorn, cada consulta distinta roda no
+máximo N vezes ao mesmo tempo.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import database
+import inquilinos
+import metricas
+
+# Por quanto tempo um resultado pronto é reaproveitado (0 = só enquanto roda)
+COALESCENCIA_TTL_SEGUNDOS = float(os.getenv("COALESCENCIA_TTL_SEGUNDOS", "2"))
+# Resultados guardados por worker; os mais antigos saem primeiro (PDFs inteiros entram aqui)
+COALESCENCIA_MAX_RESULTADOS = int(os.getenv("COALESCENCIA_MAX_RESULTADOS", "32"))
+
+_em_andamento: dict[tuple, asyncio.Task] = {}
+_resultados: "OrderedDict[tuple, tuple[float, Any]]" = OrderedDict()
+
+
+async def executar(rota: str, parametros: tuple[Hashable, ...], funcao: Callable[[], Any]) -> Any:
+    """
+    Executa `funcao()` (síncrona, em uma thread) uma vez para todas as
+    requisições idênticas e devolve o mesmo resultado a cada uma. O resultado
+    é compartilhado: quem o recebe não deve alterá-lo. Exceções também são
+    repassadas a todas, mas não ficam guardadas.
+    """
+    versao = await asyncio.to_thread(database.obter_token_alteracoes)
+    chave = (rota, inquilinos.atual(), versao, parametros)
+
+    guardado = _resultados.get(chave)
+    if guardado is not None:
+        expira_em, valor = guardado
+        if expira_em > time.monotonic():
+            metricas.incrementar("coalescencia_total", rota=rota, resultado="guardado")
+            return valor
+        del _resultados[chave]
+
+    tarefa = _em_andamento.get(chave)
+    if tarefa is None:
+        # A tarefa copia o contexto (inquilino) de quem a criou
+        tarefa = _em_andamento[chave] = asyncio.create_task(_executar(chave, funcao))
+        metricas.incrementar("coalescencia_total", rota=rota, resultado="executado")
+    else:
+        metricas.incrementar("coalescencia_total", rota=rota, resultado="compartilhado")
+
+    # Se quem iniciou desconectar, a execução continua para as demais
+    return await asyncio.shield(tarefa)
+
+
+async def _executar(chave: tuple, funcao: Callable[[], Any]) -> Any:
+    try:
+        valor = await asyncio.to_thread(funcao)
+    finally:
+        del _em_andamento[chave]
+
+    if COALESCENCIA_TTL_SEGUNDOS > 0:
+        _resultados[chave] = (time.monotonic() + COALESCENCIA_TTL_SEGUNDOS, valor)
+        while len(_resultados) > COALESCENCIA_MAX_RESULTADOS:
+            _resultados.popitem(last=False)
+    return valor
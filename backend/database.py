@@ -1,39 +1,245 @@
 """
 Módulo de banco de dados - SQLite com modelo de registros
 Reutiliza o mesmo banco de dados da v1
+
+Com DB_BACKEND=postgres as mesmas funções rodam sobre PostgreSQL (ver
+banco_postgres.py); o SQL daqui é escrito no subconjunto comum aos dois.
 """
 
 import sqlite3
 import json
 import os
-import uuid
-from datetime import datetime
+import threading
+import time
+import unicodedata
+import zlib
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional
+
+import inquilinos
+from armazenamento import gerar_nome_arquivo, obter_armazenamento
+from metricas import medir_consulta
+from previsao import DESVIO_MINIMO_DIAS, dia_do_timestamp, placa_do_titulo
 
 # Caminho do banco de dados
 # Em produção (Render), usa pasta local; em desenvolvimento, usa pasta da v1
+# DB_PATH pode ser sobrescrito por variável de ambiente (ex.: benchmarks)
+# Os arquivos dos anexos ficam no armazenamento configurado (ver armazenamento.py)
 DATA_DIR = Path(__file__).parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
-DB_PATH = DATA_DIR / "dados.db"
+DB_PATH = Path(os.getenv("DB_PATH", DATA_DIR / "dados.db"))
+
+# Backend do banco: "sqlite" (padrão, arquivo DB_PATH) ou "postgres" (DATABASE_URL)
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")
+
+# Registros criados e alterados há mais que isso vão para o arquivo (0 = não arquivar)
+ARQUIVO_HORIZONTE_DIAS = int(os.getenv("ARQUIVO_HORIZONTE_DIAS", "730"))
+# Registros movidos por transação, para não segurar o lock de escrita
+ARQUIVO_LOTE = int(os.getenv("ARQUIVO_LOTE", "500"))
+
+if DB_BACKEND == "postgres":
+    import banco_postgres
+    # Violação de restrição (ex.: placa duplicada) em qualquer backend
+    ErroIntegridade = (sqlite3.IntegrityError, banco_postgres.ErroIntegridade)
+else:
+    ErroIntegridade = (sqlite3.IntegrityError,)
+
+
+# Inquilinos cujo banco já foi criado/migrado neste processo
+_inquilinos_prontos: set[str] = set()
+_inquilinos_preparando: set[str] = set()
+_inquilinos_lock = threading.RLock()
+
 
-# Pasta para uploads
-UPLOADS_DIR = Path(__file__).parent / "uploads"
-UPLOADS_DIR.mkdir(exist_ok=True)
+def caminho_banco() -> Path:
+    """Arquivo SQLite do inquilino atual (DB_PATH no banco principal)."""
+    inquilino = inquilinos.atual()
+    return DB_PATH if inquilino is None else inquilinos.caminho_banco(inquilino)
+
+
+def _preparar_inquilino(inquilino: str):
+    """Cria/migra o banco do inquilino no primeiro uso neste processo."""
+    with _inquilinos_lock:
+        # A própria init_db abre conexões: a thread que prepara passa direto
+        if inquilino in _inquilinos_prontos or inquilino in _inquilinos_preparando:
+            return
+        _inquilinos_preparando.add(inquilino)
+        try:
+            inquilinos.INQUILINOS_DIR.mkdir(parents=True, exist_ok=True)
+            init_db()
+            _inquilinos_prontos.add(inquilino)
+        finally:
+            _inquilinos_preparando.discard(inquilino)
 
 
 def get_connection() -> sqlite3.Connection:
-    """Retorna uma conexão com o banco de dados."""
-    conn = sqlite3.connect(DB_PATH)
+    """Retorna uma conexão com o banco do inquilino atual."""
+    inquilino = inquilinos.atual()
+    if inquilino is not None and inquilino not in _inquilinos_prontos:
+        _preparar_inquilino(inquilino)
+    if DB_BACKEND == "postgres":
+        return banco_postgres.get_connection(inquilinos.esquema(inquilino) if inquilino else None)
+    conn = sqlite3.connect(caminho_banco())
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def fechar_conexoes():
+    """Fecha as conexões mantidas pelo processo (só os pools do PostgreSQL; o SQLite não mantém)."""
+    if DB_BACKEND == "postgres":
+        banco_postgres.fechar_pools()
+
+
+def _conexao_principal() -> sqlite3.Connection:
+    """Conexão com o banco principal (cadastro de inquilinos, tokens revogados), em qualquer contexto."""
+    with inquilinos.usar(None):
+        return get_connection()
+
+
+# ============ CONVERSÃO DE LINHAS ============
+
+# Colunas que as listagens podem devolver (?campos=) e as projeções nomeadas;
+# "resumo" é o que uma linha de lista exibe (a timeline do frontend o usa)
+CAMPOS_REGISTRO = (
+    "id", "titulo", "quilometragem", "proxima_troca", "data_proxima_troca",
+    "filtro_trocado", "dados", "criado_em", "atualizado_em"
+)
+PROJECOES_REGISTRO = {
+    "completo": CAMPOS_REGISTRO,
+    "resumo": ("id", "titulo", "criado_em", "atualizado_em"),
+}
+CAMPOS_VEICULO = ("id", "placa", "modelo", "ano", "cor", "criado_em", "atualizado_em")
+PROJECOES_VEICULO = {
+    "completo": CAMPOS_VEICULO,
+    "resumo": ("id", "placa", "modelo"),
+}
+
+
+def resolver_campos(campos: Optional[str], projecoes: dict[str, tuple[str, ...]]) -> tuple[str, ...]:
+    """
+    Converte o parâmetro ?campos= (nome de uma projeção ou colunas separadas
+    por vírgula) nas colunas a devolver, na ordem da tabela. O "id" sempre
+    vem; sem o parâmetro, todas as colunas.
+    """
+    if not campos:
+        return projecoes["completo"]
+    if campos in projecoes:
+        return projecoes[campos]
+
+    pedidos = {campo.strip() for campo in campos.split(",") if campo.strip()}
+    invalidos = pedidos - set(projecoes["completo"])
+    if invalidos:
+        raise ValueError(f"Campos inválidos: {', '.join(sorted(invalidos))}")
+    return tuple(campo for campo in projecoes["completo"] if campo == "id" or campo in pedidos)
+
+
+def _registro_de_row(row: sqlite3.Row, campos: tuple[str, ...] = CAMPOS_REGISTRO) -> dict:
+    """Converte uma linha da tabela registros em dicionário (só com os `campos` pedidos)."""
+    registro = {campo: row[campo] for campo in campos}
+    if "filtro_trocado" in registro:
+        registro["filtro_trocado"] = bool(registro["filtro_trocado"])
+    if "dados" in registro:
+        dados = registro["dados"]
+        # No arquivo (registros_arquivo) o JSON fica comprimido
+        if not isinstance(dados, str):
+            dados = zlib.decompress(dados).decode("utf-8")
+        registro["dados"] = json.loads(dados)
+    return registro
+
+
+def _anexo_de_row(row: sqlite3.Row) -> dict:
+    """Converte uma linha da tabela anexos em dicionário."""
+    return {
+        "id": row["id"],
+        "registro_id": row["registro_id"],
+        "nome_original": row["nome_original"],
+        "nome_arquivo": row["nome_arquivo"],
+        "tipo": row["tipo"],
+        "tamanho": row["tamanho"],
+        "criado_em": row["criado_em"]
+    }
+
+
+def _veiculo_de_row(row: sqlite3.Row, campos: tuple[str, ...] = CAMPOS_VEICULO) -> dict:
+    """Converte uma linha da tabela veiculos em dicionário (só com os `campos` pedidos)."""
+    return {campo: row[campo] for campo in campos}
+
+
+def _notificacao_de_row(row: sqlite3.Row) -> dict:
+    """Converte uma linha da tabela notificacoes em dicionário."""
+    return {
+        "id": row["id"],
+        "registro_id": row["registro_id"],
+        "tipo": row["tipo"],
+        "titulo": row["titulo"],
+        "mensagem": row["mensagem"],
+        "data_proxima_troca": row["data_proxima_troca"],
+        "criado_em": row["criado_em"]
+    }
+
+
+def _travar_alteracoes(cursor: sqlite3.Cursor):
+    """
+    Serializa as escritas no log de sincronização até o commit.
+
+    No PostgreSQL o seq é atribuído no INSERT, mas transações concorrentes
+    podem confirmar fora de ordem: um cliente que já leu o seq 11 perderia
+    o 10 confirmado depois. Com a tabela travada até o commit, os seqs
+    ficam visíveis na ordem em que foram atribuídos (o modo EXCLUSIVE ainda
+    permite leituras). Cada escrita registra a alteração logo antes do
+    commit, então a trava dura só o INSERT. No SQLite a escrita já é
+    serializada pelo próprio banco.
+    """
+    if DB_BACKEND == "postgres":
+        cursor.execute("LOCK TABLE alteracoes IN EXCLUSIVE MODE")
+
+
+def _registrar_alteracao(cursor: sqlite3.Cursor, entidade: str, entidade_id: int, operacao: str):
+    """Registra uma alteração no log de sincronização (mesma transação da escrita)."""
+    _travar_alteracoes(cursor)
+    cursor.execute(
+        "INSERT INTO alteracoes (entidade, entidade_id, operacao) VALUES (?, ?, ?)",
+        (entidade, entidade_id, operacao)
+    )
+
+
+def _registrar_alteracoes(cursor: sqlite3.Cursor, entidade: str, entidade_ids: list[int], operacao: str):
+    """Registra várias alterações de uma vez (operações em lote)."""
+    if entidade_ids:
+        _travar_alteracoes(cursor)
+        cursor.executemany(
+            "INSERT INTO alteracoes (entidade, entidade_id, operacao) VALUES (?, ?, ?)",
+            [(entidade, entidade_id, operacao) for entidade_id in entidade_ids]
+        )
+
+
+def _enfileirar(cursor: sqlite3.Cursor, tipo: str, dados: dict, executar_em: Optional[float] = None):
+    """Enfileira uma tarefa de segundo plano (mesma transação da escrita que a originou)."""
+    cursor.execute(
+        "INSERT INTO tarefas (tipo, dados, executar_em) VALUES (?, ?, ?)",
+        (tipo, json.dumps(dados, ensure_ascii=False), executar_em or time.time())
+    )
+
+
 def init_db():
     """Inicializa o banco de dados criando as tabelas necessárias."""
+    inquilino = inquilinos.atual()
+    if DB_BACKEND == "postgres":
+        banco_postgres.init_db(inquilinos.esquema(inquilino) if inquilino else None)
+        _preencher_estatisticas_km()
+        _preencher_chaves_veiculos()
+        _preencher_texto_busca_arquivo()
+        return
+
     conn = get_connection()
     cursor = conn.cursor()
 
+    # Só tem efeito em banco novo; bancos existentes são convertidos por compactar_banco
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # WAL (persistente no arquivo): leitores, como a cópia do backup.py, não bloqueiam as escritas
+    cursor.execute("PRAGMA journal_mode = WAL")
+
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS registros (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -91,15 +297,177 @@ def init_db():
             modelo TEXT NOT NULL,
             ano INTEGER,
             cor TEXT,
+            placa_normalizada TEXT,
+            modelo_normalizado TEXT,
             criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
             atualizado_em DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     """)
 
+    # Chaves do autocompletar (ver autocompletar_veiculos)
+    try:
+        cursor.execute("ALTER TABLE veiculos ADD COLUMN placa_normalizada TEXT")
+    except sqlite3.OperationalError:
+        pass
+
+    try:
+        cursor.execute("ALTER TABLE veiculos ADD COLUMN modelo_normalizado TEXT")
+    except sqlite3.OperationalError:
+        pass
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_veiculos_placa_normalizada ON veiculos (placa_normalizada)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_veiculos_modelo_normalizado ON veiculos (modelo_normalizado, placa_normalizada)"
+    )
+
+    # Índices para listagens ordenadas e paginação por chave
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_registros_criado_em ON registros (criado_em, id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_registros_atualizado_em ON registros (atualizado_em, id)"
+    )
+
+    # Log de alterações para sincronização incremental (inclui exclusões)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entidade TEXT NOT NULL,
+            entidade_id INTEGER NOT NULL,
+            operacao TEXT NOT NULL,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Tokens revogados (logout / rotação de refresh token)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tokens_revogados (
+            jti TEXT PRIMARY KEY,
+            expira_em INTEGER NOT NULL
+        )
+    """)
+
+    # Fila de tarefas de segundo plano (ver tarefas.py); chave identifica as periódicas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tarefas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            dados TEXT DEFAULT '{}',
+            chave TEXT UNIQUE,
+            estado TEXT NOT NULL DEFAULT 'pendente',
+            executar_em REAL NOT NULL,
+            reservada_ate REAL NOT NULL DEFAULT 0,
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            erro TEXT,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tarefas_fila ON tarefas (estado, executar_em)"
+    )
+
+    # Busca de trocas a vencer por data e do registro mais recente de cada veículo
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_registros_data_proxima_troca ON registros (data_proxima_troca)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_registros_titulo ON registros (titulo, criado_em, id)"
+    )
+
+    # Avisos de troca já gerados (um por registro, tipo e data: não repetem)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS notificacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            registro_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL,
+            titulo TEXT NOT NULL,
+            mensagem TEXT NOT NULL,
+            data_proxima_troca DATE NOT NULL,
+            criado_em DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (registro_id, tipo, data_proxima_troca)
+        )
+    """)
+
+    # Somas da regressão km x dia por placa (ver previsao.py), mantidas a cada escrita
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS estatisticas_km (
+            placa TEXT PRIMARY KEY,
+            pontos INTEGER NOT NULL,
+            soma_t REAL NOT NULL,
+            soma_km REAL NOT NULL,
+            soma_tt REAL NOT NULL,
+            soma_tkm REAL NOT NULL,
+            ultimo_registro_id INTEGER NOT NULL,
+            ultimo_dia REAL NOT NULL,
+            ultima_quilometragem INTEGER NOT NULL,
+            proxima_troca INTEGER,
+            data_proxima_troca DATE
+        )
+    """)
+
+    # Arquivo: registros antigos e os seus anexos, fora das tabelas do dia a dia
+    # (ver arquivar_registros); "dados" fica comprimido e "texto_busca" guarda o
+    # JSON original, para a busca usar o mesmo LIKE das tabelas ativas
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS registros_arquivo (
+            id INTEGER PRIMARY KEY,
+            titulo TEXT NOT NULL,
+            quilometragem INTEGER,
+            proxima_troca INTEGER,
+            data_proxima_troca DATE,
+            filtro_trocado INTEGER DEFAULT 0,
+            dados BLOB,
+            texto_busca TEXT,
+            criado_em DATETIME,
+            atualizado_em DATETIME,
+            arquivado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    try:
+        cursor.execute("ALTER TABLE registros_arquivo ADD COLUMN texto_busca TEXT")
+    except sqlite3.OperationalError:
+        pass
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS anexos_arquivo (
+            id INTEGER PRIMARY KEY,
+            registro_id INTEGER NOT NULL,
+            nome_original TEXT NOT NULL,
+            nome_arquivo TEXT NOT NULL,
+            tipo TEXT,
+            tamanho INTEGER,
+            criado_em DATETIME
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_registros_arquivo_criado_em ON registros_arquivo (criado_em, id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_anexos_arquivo_registro_id ON anexos_arquivo (registro_id)"
+    )
+
+    # Cadastro dos inquilinos (só no banco principal; ver inquilinos.py)
+    if inquilino is None:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS inquilinos (
+                id TEXT PRIMARY KEY,
+                nome TEXT NOT NULL,
+                senha_hash TEXT NOT NULL,
+                email_avisos TEXT,
+                criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
     conn.commit()
     conn.close()
 
+    _preencher_estatisticas_km()
+    _preencher_chaves_veiculos()
+    _preencher_texto_busca_arquivo()
 
+
+@medir_consulta
 def criar_registro(
     titulo: str,
     dados: dict,
@@ -115,79 +483,172 @@ def criar_registro(
     cursor.execute(
         """INSERT INTO registros
            (titulo, dados, quilometragem, proxima_troca, data_proxima_troca, filtro_trocado)
-           VALUES (?, ?, ?, ?, ?, ?)""",
+           VALUES (?, ?, ?, ?, ?, ?)
+           RETURNING *""",
         (titulo, json.dumps(dados, ensure_ascii=False), quilometragem, proxima_troca,
          data_proxima_troca, 1 if filtro_trocado else 0)
     )
 
-    registro_id = cursor.lastrowid
+    row = cursor.fetchone()
+    registro_id = row["id"]
+    _incluir_ponto_km(cursor, row)
+    _registrar_alteracao(cursor, "registros", registro_id, "salvo")
     conn.commit()
     conn.close()
 
     return registro_id
 
 
-def listar_registros(busca: Optional[str] = None) -> list[dict]:
-    """Retorna todos os registros, opcionalmente filtrados por busca."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
+def _consultar_registros(
+    ordem: str,
+    busca: Optional[str] = None,
+    limite: Optional[int] = None,
+    cursor_pagina: Optional[str] = None,
+    campos: tuple[str, ...] = CAMPOS_REGISTRO,
+    de: Optional[str] = None,
+    ate: Optional[str] = None
+) -> tuple[list[dict], Optional[str]]:
+    """
+    Consulta registros ordenados (decrescente) pela coluna informada.
+
+    Usa paginação por chave (keyset): o cursor é "<valor da coluna>|<id>" do
+    último item da página anterior, então cada página custa o mesmo
+    independentemente da profundidade. Retorna (registros, próximo cursor).
+
+    Só as colunas em `campos` (mais as do cursor) são lidas: sem "dados", o
+    JSON dos campos dinâmicos nem sai do banco.
+
+    Com um período de criação (`de`/`ate`, datas ISO, inclusivas), o arquivo
+    (ver arquivar_registros) também é consultado e os resultados são
+    intercalados na mesma ordem; sem período, só as tabelas do dia a dia.
+    """
+    if ordem not in ("criado_em", "atualizado_em"):
+        raise ValueError(f"Ordenação inválida: {ordem}")
+
+    condicoes = []
+    params: list = []
+
+    if cursor_pagina:
+        valor, separador, ultimo_id = cursor_pagina.rpartition("|")
+        if not separador or not ultimo_id.isdigit():
+            raise ValueError("Cursor de paginação inválido")
+        condicoes.append(f"({ordem}, id) < (?, ?)")
+        params.extend([valor, int(ultimo_id)])
+
+    if de:
+        condicoes.append("criado_em >= ?")
+        params.append(de)
+    if ate:
+        condicoes.append("criado_em < ?")
+        params.append((date.fromisoformat(ate) + timedelta(days=1)).isoformat())
+
+    colunas = ", ".join(dict.fromkeys((*campos, ordem, "id")))
+    ordenacao = f" ORDER BY {ordem} DESC, id DESC"
+
+    condicoes_ativos = list(condicoes)
+    params_ativos = list(params)
+    condicoes_arquivo = list(condicoes)
+    params_arquivo = list(params)
     if busca:
         busca_param = f"%{busca}%"
-        cursor.execute(
-            """SELECT * FROM registros
-               WHERE titulo LIKE ? OR dados LIKE ?
-               ORDER BY atualizado_em DESC""",
-            (busca_param, busca_param)
-        )
-    else:
-        cursor.execute("SELECT * FROM registros ORDER BY atualizado_em DESC")
+        condicoes_ativos.append("(titulo LIKE ? OR dados LIKE ?)")
+        params_ativos.extend([busca_param, busca_param])
+        condicoes_arquivo.append("(titulo LIKE ? OR texto_busca LIKE ?)")
+        params_arquivo.extend([busca_param, busca_param])
+
+    sql = f"SELECT {colunas} FROM registros"
+    if condicoes_ativos:
+        sql += " WHERE " + " AND ".join(condicoes_ativos)
+    sql += ordenacao
+    if limite:
+        # Um item a mais indica se existe próxima página
+        sql += " LIMIT ?"
+        params_ativos.append(limite + 1)
 
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, params_ativos)
     rows = cursor.fetchall()
-    conn.close()
 
-    registros = []
-    for row in rows:
-        registros.append({
-            "id": row["id"],
-            "titulo": row["titulo"],
-            "quilometragem": row["quilometragem"],
-            "proxima_troca": row["proxima_troca"],
-            "data_proxima_troca": row["data_proxima_troca"],
-            "filtro_trocado": bool(row["filtro_trocado"]),
-            "dados": json.loads(row["dados"]),
-            "criado_em": row["criado_em"],
-            "atualizado_em": row["atualizado_em"]
-        })
+    if de or ate:
+        arquivados = _consultar_arquivo(cursor, colunas, ordenacao, condicoes_arquivo, params_arquivo, limite)
+        if arquivados:
+            rows = sorted([*rows, *arquivados], key=lambda row: (row[ordem], row["id"]), reverse=True)
+            if limite:
+                rows = rows[:limite + 1]
+    conn.close()
 
+    proximo_cursor = None
+    if limite and len(rows) > limite:
+        rows = rows[:limite]
+        proximo_cursor = f"{rows[-1][ordem]}|{rows[-1]['id']}"
+
+    return [_registro_de_row(row, campos) for row in rows], proximo_cursor
+
+
+def _consultar_arquivo(
+    cursor: sqlite3.Cursor,
+    colunas: str,
+    ordenacao: str,
+    condicoes: list[str],
+    params: list,
+    limite: Optional[int]
+) -> list:
+    """
+    Mesma consulta de _consultar_registros em registros_arquivo (a busca já
+    vem nas condições, sobre titulo e texto_busca).
+    """
+    sql = f"SELECT {colunas} FROM registros_arquivo"
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+    sql += ordenacao
+    if limite:
+        sql += " LIMIT ?"
+        params = [*params, limite + 1]
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+@medir_consulta
+def listar_registros(busca: Optional[str] = None, campos: tuple[str, ...] = CAMPOS_REGISTRO) -> list[dict]:
+    """Retorna todos os registros, opcionalmente filtrados por busca."""
+    registros, _ = _consultar_registros("atualizado_em", busca=busca, campos=campos)
     return registros
 
 
-def obter_registro(registro_id: int) -> Optional[dict]:
-    """Retorna um registro pelo ID ou None se não existir."""
+@medir_consulta
+def listar_registros_paginado(
+    busca: Optional[str] = None,
+    limite: int = 50,
+    cursor_pagina: Optional[str] = None,
+    campos: tuple[str, ...] = CAMPOS_REGISTRO
+) -> tuple[list[dict], Optional[str]]:
+    """Retorna uma página de registros (mais recentes primeiro) e o próximo cursor."""
+    return _consultar_registros("atualizado_em", busca, limite, cursor_pagina, campos)
+
+
+@medir_consulta
+def obter_registro(registro_id: int, incluir_arquivados: bool = False) -> Optional[dict]:
+    """Retorna um registro pelo ID ou None se não existir (arquivados só com `incluir_arquivados`)."""
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM registros WHERE id = ?", (registro_id,))
     row = cursor.fetchone()
+    if row is None and incluir_arquivados:
+        cursor.execute(
+            f"SELECT {', '.join(CAMPOS_REGISTRO)} FROM registros_arquivo WHERE id = ?", (registro_id,)
+        )
+        row = cursor.fetchone()
     conn.close()
 
     if row is None:
         return None
 
-    return {
-        "id": row["id"],
-        "titulo": row["titulo"],
-        "quilometragem": row["quilometragem"],
-        "proxima_troca": row["proxima_troca"],
-        "data_proxima_troca": row["data_proxima_troca"],
-        "filtro_trocado": bool(row["filtro_trocado"]),
-        "dados": json.loads(row["dados"]),
-        "criado_em": row["criado_em"],
-        "atualizado_em": row["atualizado_em"]
-    }
+    return _registro_de_row(row)
 
 
+@medir_consulta
 def atualizar_registro(
     registro_id: int,
     titulo: str,
@@ -201,72 +662,263 @@ def atualizar_registro(
     conn = get_connection()
     cursor = conn.cursor()
 
+    cursor.execute("SELECT * FROM registros WHERE id = ?", (registro_id,))
+    anterior = cursor.fetchone()
+
     cursor.execute(
         """
         UPDATE registros
         SET titulo = ?, dados = ?, quilometragem = ?, proxima_troca = ?,
             data_proxima_troca = ?, filtro_trocado = ?, atualizado_em = CURRENT_TIMESTAMP
         WHERE id = ?
+        RETURNING *
         """,
         (titulo, json.dumps(dados, ensure_ascii=False), quilometragem,
          proxima_troca, data_proxima_troca, 1 if filtro_trocado else 0, registro_id)
     )
 
-    atualizado = cursor.rowcount > 0
+    row = cursor.fetchone()
+    atualizado = row is not None
+    if atualizado:
+        if anterior is not None:
+            # Mesma placa: o registro continua sendo o último se já era
+            mesma_placa = _ponto_km(row) is not None and placa_do_titulo(anterior["titulo"]) == placa_do_titulo(titulo)
+            _remover_ponto_km(cursor, anterior, recalcular_ultimo=not mesma_placa)
+        _incluir_ponto_km(cursor, row)
+        _registrar_alteracao(cursor, "registros", registro_id, "salvo")
     conn.commit()
     conn.close()
 
     return atualizado
 
 
+@medir_consulta
 def excluir_registro(registro_id: int) -> bool:
-    """Exclui um registro pelo ID. Retorna True se excluído."""
-    # Primeiro excluir anexos do disco
-    anexos = listar_anexos(registro_id)
-    for anexo in anexos:
-        arquivo_path = UPLOADS_DIR / anexo["nome_arquivo"]
-        if arquivo_path.exists():
-            arquivo_path.unlink()
+    """Exclui um registro pelo ID (com os anexos). Retorna True se excluído."""
+    resultado, = excluir_registros_em_lote(ids=[registro_id])
+    return resultado["status"] == "excluido"
+
+
+# ============ ESTATÍSTICAS DE QUILOMETRAGEM ============
+
+def _ponto_km(row) -> Optional[tuple[str, float, int]]:
+    """(placa, dia, km) de um registro, ou None se não entra na previsão."""
+    placa = placa_do_titulo(row["titulo"])
+    if placa is None or row["quilometragem"] is None or not row["criado_em"]:
+        return None
+    return placa, dia_do_timestamp(str(row["criado_em"])), row["quilometragem"]
+
+
+def _incluir_ponto_km(cursor: sqlite3.Cursor, row):
+    """Soma o ponto do registro às estatísticas da placa e o torna o último se for o mais recente."""
+    ponto = _ponto_km(row)
+    if ponto is None:
+        return
+    placa, dia, km = ponto
+    cursor.execute(
+        """
+        INSERT INTO estatisticas_km
+            (placa, pontos, soma_t, soma_km, soma_tt, soma_tkm, ultimo_registro_id,
+             ultimo_dia, ultima_quilometragem, proxima_troca, data_proxima_troca)
+        VALUES (?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (placa) DO UPDATE SET
+            pontos = estatisticas_km.pontos + 1,
+            soma_t = estatisticas_km.soma_t + excluded.soma_t,
+            soma_km = estatisticas_km.soma_km + excluded.soma_km,
+            soma_tt = estatisticas_km.soma_tt + excluded.soma_tt,
+            soma_tkm = estatisticas_km.soma_tkm + excluded.soma_tkm
+        """,
+        (placa, dia, km, dia * dia, dia * km, row["id"], dia, km,
+         row["proxima_troca"], row["data_proxima_troca"])
+    )
+    cursor.execute(
+        """
+        UPDATE estatisticas_km
+        SET ultimo_registro_id = ?, ultimo_dia = ?, ultima_quilometragem = ?,
+            proxima_troca = ?, data_proxima_troca = ?
+        WHERE placa = ? AND (ultimo_dia, ultimo_registro_id) <= (?, ?)
+        """,
+        (row["id"], dia, km, row["proxima_troca"], row["data_proxima_troca"], placa, dia, row["id"])
+    )
+
+
+def _remover_ponto_km(cursor: sqlite3.Cursor, row, recalcular_ultimo: bool = True):
+    """
+    Subtrai o ponto do registro das estatísticas da placa.
+
+    Se ele era o último registro da placa, procura o novo último (só nesse
+    caso a consulta passa pelos registros).
+    """
+    ponto = _ponto_km(row)
+    if ponto is None:
+        return
+    placa, dia, km = ponto
+    cursor.execute(
+        """
+        UPDATE estatisticas_km
+        SET pontos = pontos - 1, soma_t = soma_t - ?, soma_km = soma_km - ?,
+            soma_tt = soma_tt - ?, soma_tkm = soma_tkm - ?
+        WHERE placa = ?
+        RETURNING pontos, ultimo_registro_id
+        """,
+        (dia, km, dia * dia, dia * km, placa)
+    )
+    estatistica = cursor.fetchone()
+    if estatistica is None:
+        return
+
+    if estatistica["pontos"] <= 0:
+        cursor.execute("DELETE FROM estatisticas_km WHERE placa = ?", (placa,))
+    elif recalcular_ultimo and estatistica["ultimo_registro_id"] == row["id"]:
+        _definir_ultimo_km(cursor, placa, ignorar_id=row["id"])
 
+
+def _definir_ultimo_km(cursor: sqlite3.Cursor, placa: str, ignorar_id: Optional[int] = None):
+    """Procura o registro mais recente da placa e o torna o último nas estatísticas."""
+    cursor.execute(
+        """SELECT * FROM registros
+           WHERE titulo LIKE ? AND quilometragem IS NOT NULL AND id <> ?
+           ORDER BY criado_em DESC, id DESC""",
+        (f"%{placa}%", ignorar_id or 0)
+    )
+    for candidato in cursor.fetchall():
+        if placa_do_titulo(candidato["titulo"]) == placa:
+            cursor.execute(
+                """
+                UPDATE estatisticas_km
+                SET ultimo_registro_id = ?, ultimo_dia = ?, ultima_quilometragem = ?,
+                    proxima_troca = ?, data_proxima_troca = ?
+                WHERE placa = ?
+                """,
+                (candidato["id"], _ponto_km(candidato)[1], candidato["quilometragem"],
+                 candidato["proxima_troca"], candidato["data_proxima_troca"], placa)
+            )
+            break
+
+
+def _remover_pontos_km(cursor: sqlite3.Cursor, rows: list):
+    """
+    Subtrai os pontos de vários registros excluídos de uma vez: uma
+    atualização por placa, e o novo último só é procurado (uma vez) nas
+    placas que perderam o seu.
+    """
+    por_placa: dict[str, list[tuple[float, int]]] = {}
+    for row in rows:
+        ponto = _ponto_km(row)
+        if ponto is not None:
+            por_placa.setdefault(ponto[0], []).append(ponto[1:])
+    excluidos = {row["id"] for row in rows}
+
+    for placa, pontos in por_placa.items():
+        cursor.execute(
+            """
+            UPDATE estatisticas_km
+            SET pontos = pontos - ?, soma_t = soma_t - ?, soma_km = soma_km - ?,
+                soma_tt = soma_tt - ?, soma_tkm = soma_tkm - ?
+            WHERE placa = ?
+            RETURNING pontos, ultimo_registro_id
+            """,
+            (len(pontos), sum(dia for dia, _ in pontos), sum(km for _, km in pontos),
+             sum(dia * dia for dia, _ in pontos), sum(dia * km for dia, km in pontos), placa)
+        )
+        estatistica = cursor.fetchone()
+        if estatistica is None:
+            continue
+        if estatistica["pontos"] <= 0:
+            cursor.execute("DELETE FROM estatisticas_km WHERE placa = ?", (placa,))
+        elif estatistica["ultimo_registro_id"] in excluidos:
+            _definir_ultimo_km(cursor, placa)
+
+
+@medir_consulta
+def recalcular_estatisticas_km():
+    """Reconstrói estatisticas_km a partir de todos os registros."""
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Excluir anexos do banco
-    cursor.execute("DELETE FROM anexos WHERE registro_id = ?", (registro_id,))
-    # Excluir registro
-    cursor.execute("DELETE FROM registros WHERE id = ?", (registro_id,))
+    cursor.execute(
+        """SELECT * FROM registros WHERE quilometragem IS NOT NULL
+           ORDER BY criado_em, id"""
+    )
+    rows = cursor.fetchall()
 
-    excluido = cursor.rowcount > 0
+    cursor.execute("DELETE FROM estatisticas_km")
+    for row in rows:
+        _incluir_ponto_km(cursor, row)
     conn.commit()
     conn.close()
 
-    return excluido
+
+def _preencher_estatisticas_km():
+    """Preenche estatisticas_km em bancos anteriores a ela (uma vez)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT NOT EXISTS (SELECT 1 FROM estatisticas_km)
+                  AND EXISTS (SELECT 1 FROM registros WHERE quilometragem IS NOT NULL) AS vazia"""
+    )
+    vazia = cursor.fetchone()["vazia"]
+    conn.close()
+
+    if vazia:
+        recalcular_estatisticas_km()
+
+
+@medir_consulta
+def listar_estatisticas_km(placa: Optional[str] = None) -> list[dict]:
+    """
+    Estatísticas por placa com a taxa de km/dia (inclinação da regressão),
+    calculada para todas as placas na mesma consulta.
+    """
+    sql = """
+        SELECT e.*, v.id AS veiculo_id, v.modelo,
+               CASE WHEN e.pontos >= 2
+                         AND e.pontos * e.soma_tt - e.soma_t * e.soma_t >= e.pontos * e.pontos * ?
+                    THEN (e.pontos * e.soma_tkm - e.soma_t * e.soma_km)
+                         / (e.pontos * e.soma_tt - e.soma_t * e.soma_t)
+               END AS km_por_dia
+        FROM estatisticas_km e
+        LEFT JOIN veiculos v ON v.placa = e.placa
+    """
+    params: list = [DESVIO_MINIMO_DIAS ** 2]
+    if placa is not None:
+        sql += " WHERE e.placa = ?"
+        params.append(placa.upper())
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [dict(row) for row in rows]
 
 
 # ============ FUNÇÕES DE ANEXOS ============
 
+@medir_consulta
 def salvar_anexo(registro_id: int, nome_original: str, conteudo: bytes, tipo: str) -> dict:
-    """Salva um anexo no disco e registra no banco."""
-    # Gerar nome único para o arquivo
-    extensao = Path(nome_original).suffix
-    nome_arquivo = f"{uuid.uuid4().hex}{extensao}"
+    """Salva um anexo no armazenamento e registra no banco."""
+    nome_arquivo = gerar_nome_arquivo(nome_original)
+    obter_armazenamento().salvar(nome_arquivo, conteudo, tipo)
+    return registrar_anexo(registro_id, nome_original, nome_arquivo, tipo, len(conteudo))
 
-    # Salvar arquivo no disco
-    arquivo_path = UPLOADS_DIR / nome_arquivo
-    with open(arquivo_path, "wb") as f:
-        f.write(conteudo)
 
-    # Registrar no banco
+@medir_consulta
+def registrar_anexo(registro_id: int, nome_original: str, nome_arquivo: str, tipo: str, tamanho: int) -> dict:
+    """Registra no banco um anexo cujo arquivo já está no armazenamento (ex.: upload direto)."""
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute(
         """INSERT INTO anexos (registro_id, nome_original, nome_arquivo, tipo, tamanho)
-           VALUES (?, ?, ?, ?, ?)""",
-        (registro_id, nome_original, nome_arquivo, tipo, len(conteudo))
+           VALUES (?, ?, ?, ?, ?)
+           RETURNING id""",
+        (registro_id, nome_original, nome_arquivo, tipo, tamanho)
     )
 
-    anexo_id = cursor.lastrowid
+    anexo_id = cursor.fetchone()["id"]
+    _registrar_alteracao(cursor, "anexos", anexo_id, "salvo")
     conn.commit()
     conn.close()
 
@@ -276,12 +928,13 @@ def salvar_anexo(registro_id: int, nome_original: str, conteudo: bytes, tipo: st
         "nome_original": nome_original,
         "nome_arquivo": nome_arquivo,
         "tipo": tipo,
-        "tamanho": len(conteudo)
+        "tamanho": tamanho
     }
 
 
-def listar_anexos(registro_id: int) -> list[dict]:
-    """Lista todos os anexos de um registro."""
+@medir_consulta
+def listar_anexos(registro_id: int, incluir_arquivados: bool = False) -> list[dict]:
+    """Lista todos os anexos de um registro (de um arquivado, só com `incluir_arquivados`)."""
     conn = get_connection()
     cursor = conn.cursor()
 
@@ -291,149 +944,432 @@ def listar_anexos(registro_id: int) -> list[dict]:
     )
 
     rows = cursor.fetchall()
+    if not rows and incluir_arquivados:
+        cursor.execute(
+            "SELECT * FROM anexos_arquivo WHERE registro_id = ? ORDER BY criado_em DESC",
+            (registro_id,)
+        )
+        rows = cursor.fetchall()
     conn.close()
 
-    anexos = []
-    for row in rows:
-        anexos.append({
-            "id": row["id"],
-            "registro_id": row["registro_id"],
-            "nome_original": row["nome_original"],
-            "nome_arquivo": row["nome_arquivo"],
-            "tipo": row["tipo"],
-            "tamanho": row["tamanho"],
-            "criado_em": row["criado_em"]
-        })
-
-    return anexos
+    return [_anexo_de_row(row) for row in rows]
 
 
-def obter_anexo(anexo_id: int) -> Optional[dict]:
-    """Retorna um anexo pelo ID."""
+@medir_consulta
+def obter_anexo(anexo_id: int, incluir_arquivados: bool = False) -> Optional[dict]:
+    """Retorna um anexo pelo ID (arquivados só com `incluir_arquivados`)."""
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute("SELECT * FROM anexos WHERE id = ?", (anexo_id,))
     row = cursor.fetchone()
+    if row is None and incluir_arquivados:
+        cursor.execute("SELECT * FROM anexos_arquivo WHERE id = ?", (anexo_id,))
+        row = cursor.fetchone()
     conn.close()
 
     if row is None:
         return None
 
-    return {
-        "id": row["id"],
-        "registro_id": row["registro_id"],
-        "nome_original": row["nome_original"],
-        "nome_arquivo": row["nome_arquivo"],
-        "tipo": row["tipo"],
-        "tamanho": row["tamanho"],
-        "criado_em": row["criado_em"]
-    }
+    return _anexo_de_row(row)
 
 
+@medir_consulta
 def excluir_anexo(anexo_id: int) -> bool:
-    """Exclui um anexo pelo ID."""
-    anexo = obter_anexo(anexo_id)
-    if not anexo:
-        return False
-
-    # Excluir arquivo do disco
-    arquivo_path = UPLOADS_DIR / anexo["nome_arquivo"]
-    if arquivo_path.exists():
-        arquivo_path.unlink()
+    """Exclui um anexo pelo ID. Retorna True se excluído."""
+    resultado, = excluir_anexos_em_lote(ids=[anexo_id])
+    return resultado["status"] == "excluido"
+
+
+def obter_caminho_anexo(nome_arquivo: str) -> Optional[Path]:
+    """Retorna o caminho local de um anexo (None se o armazenamento não for local)."""
+    return obter_armazenamento().caminho_local(nome_arquivo)
+
+
+# ============ FUNÇÕES EM LOTE ============
+
+# Critérios aceitos no filtro das operações em lote: chave -> (condição, parâmetros)
+_CRITERIOS_REGISTROS: dict[str, Callable[[Any], tuple[str, list]]] = {
+    "busca": lambda valor: ("(titulo LIKE ? OR dados LIKE ?)", [f"%{valor}%"] * 2),
+    "criado_antes": lambda valor: ("criado_em < ?", [valor]),
+    "data_proxima_troca_antes": lambda valor: ("data_proxima_troca < ?", [valor]),
+    "filtro_trocado": lambda valor: ("filtro_trocado = ?", [1 if valor else 0]),
+}
+_CRITERIOS_ANEXOS: dict[str, Callable[[Any], tuple[str, list]]] = {
+    "registro_id": lambda valor: ("registro_id = ?", [valor]),
+    # Prefixo do tipo MIME, ex.: "image/"
+    "tipo": lambda valor: ("tipo LIKE ?", [f"{valor}%"]),
+    "criado_antes": lambda valor: ("criado_em < ?", [valor]),
+}
+
+
+def _selecao_lote(
+    ids: Optional[list[int]],
+    filtro: Optional[dict],
+    criterios: dict[str, Callable[[Any], tuple[str, list]]]
+) -> tuple[str, list]:
+    """
+    Condição (WHERE) e parâmetros de uma operação em lote: os IDs informados
+    ou os critérios do filtro, combinados com E. Filtro vazio é recusado para
+    que um pedido malformado não alcance a tabela inteira.
+    """
+    if (ids is None) == (filtro is None):
+        raise ValueError("Informe os IDs ou um filtro (apenas um dos dois)")
+    if ids is not None:
+        if not ids:
+            raise ValueError("Lista de IDs vazia")
+        return f"id IN ({', '.join('?' * len(ids))})", list(ids)
+
+    desconhecidos = set(filtro) - set(criterios)
+    if desconhecidos:
+        raise ValueError(f"Critérios de filtro inválidos: {', '.join(sorted(desconhecidos))}")
+    condicoes, params = [], []
+    for chave, valor in filtro.items():
+        if valor is not None:
+            condicao, valores = criterios[chave](valor)
+            condicoes.append(condicao)
+            params.extend(valores)
+    if not condicoes:
+        raise ValueError("O filtro precisa de ao menos um critério")
+    return " AND ".join(condicoes), params
+
+
+def _resultados_lote(ids: Optional[list[int]], status_por_id: dict[int, str]) -> list[dict]:
+    """Resultado por ID; os IDs pedidos que não existem aparecem como nao_encontrado."""
+    if ids is None:
+        return [{"id": item_id, "status": status} for item_id, status in sorted(status_por_id.items())]
+    return [{"id": item_id, "status": status_por_id.get(item_id, "nao_encontrado")} for item_id in dict.fromkeys(ids)]
+
+
+@medir_consulta
+def atualizar_registros_em_lote(
+    ids: Optional[list[int]] = None,
+    filtro: Optional[dict] = None,
+    filtro_trocado: Optional[bool] = None,
+    data_proxima_troca: Optional[str] = None,
+    deslocar_dias: Optional[int] = None
+) -> list[dict]:
+    """
+    Atualiza vários registros em uma transação: define filtro_trocado,
+    define data_proxima_troca ou a desloca em `deslocar_dias` (registros sem
+    data ficam "sem_data"). Retorna o resultado por ID.
+    """
+    if filtro_trocado is None and data_proxima_troca is None and deslocar_dias is None:
+        raise ValueError("Nenhuma alteração informada")
+    if data_proxima_troca is not None and deslocar_dias is not None:
+        raise ValueError("Use data_proxima_troca ou deslocar_dias, não os dois")
+    where, params = _selecao_lote(ids, filtro, _CRITERIOS_REGISTROS)
+
+    atribuicoes, valores = ["atualizado_em = CURRENT_TIMESTAMP"], []
+    if filtro_trocado is not None:
+        atribuicoes.append("filtro_trocado = ?")
+        valores.append(1 if filtro_trocado else 0)
+    if data_proxima_troca is not None:
+        atribuicoes.append("data_proxima_troca = ?")
+        valores.append(data_proxima_troca)
 
-    # Excluir do banco
     conn = get_connection()
     cursor = conn.cursor()
+    try:
+        if deslocar_dias is None:
+            cursor.execute(
+                f"UPDATE registros SET {', '.join(atribuicoes)} WHERE {where} "
+                "RETURNING id, titulo, data_proxima_troca",
+                valores + params
+            )
+            rows = cursor.fetchall()
+            status_por_id = {row["id"]: "atualizado" for row in rows}
+        else:
+            # UPDATE sem efeito só para travar as linhas e ler as datas atuais: os
+            # registros sem data ("sem_data") não podem ser alterados nem entrar no log
+            cursor.execute(
+                f"UPDATE registros SET data_proxima_troca = data_proxima_troca WHERE {where} "
+                "RETURNING id, titulo, data_proxima_troca",
+                params
+            )
+            selecionados = cursor.fetchall()
+            status_por_id, rows = {}, []
+            for row in selecionados:
+                try:
+                    atual = date.fromisoformat(str(row["data_proxima_troca"])[:10])
+                except ValueError:
+                    status_por_id[row["id"]] = "sem_data"
+                    continue
+                status_por_id[row["id"]] = "atualizado"
+                rows.append({**row, "data_proxima_troca": (atual + timedelta(days=deslocar_dias)).isoformat()})
+            cursor.executemany(
+                f"UPDATE registros SET {', '.join(atribuicoes)}, data_proxima_troca = ? WHERE id = ?",
+                [(*valores, row["data_proxima_troca"], row["id"]) for row in rows]
+            )
+
+        if rows and (data_proxima_troca is not None or deslocar_dias is not None):
+            # A estatística da placa guarda a data do último registro dela
+            novas_datas = {row["id"]: row["data_proxima_troca"] for row in rows}
+            placas = sorted({placa_do_titulo(row["titulo"]) for row in rows} - {None})
+            estatisticas = []
+            for inicio in range(0, len(placas), 500):
+                bloco = placas[inicio:inicio + 500]
+                cursor.execute(
+                    f"SELECT placa, ultimo_registro_id FROM estatisticas_km "
+                    f"WHERE placa IN ({', '.join('?' for _ in bloco)})",
+                    bloco
+                )
+                estatisticas.extend(cursor.fetchall())
+            cursor.executemany(
+                "UPDATE estatisticas_km SET data_proxima_troca = ? WHERE placa = ?",
+                [(novas_datas[e["ultimo_registro_id"]], e["placa"])
+                 for e in estatisticas if e["ultimo_registro_id"] in novas_datas]
+            )
+
+        _registrar_alteracoes(cursor, "registros", [row["id"] for row in rows], "salvo")
+        conn.commit()
+    finally:
+        conn.close()
+
+    return _resultados_lote(ids, status_por_id)
+
+
+@medir_consulta
+def excluir_registros_em_lote(ids: Optional[list[int]] = None, filtro: Optional[dict] = None) -> list[dict]:
+    """
+    Exclui vários registros e os seus anexos em uma transação. Os arquivos
+    são removidos em segundo plano, por uma única tarefa. Retorna o resultado por ID.
+    """
+    where, params = _selecao_lote(ids, filtro, _CRITERIOS_REGISTROS)
 
-    cursor.execute("DELETE FROM anexos WHERE id = ?", (anexo_id,))
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"DELETE FROM anexos WHERE registro_id IN (SELECT id FROM registros WHERE {where}) "
+            "RETURNING id, nome_arquivo",
+            params
+        )
+        anexos = cursor.fetchall()
+        cursor.execute(f"DELETE FROM registros WHERE {where} RETURNING *", params)
+        rows = cursor.fetchall()
+
+        _remover_pontos_km(cursor, rows)
+        _registrar_alteracoes(cursor, "anexos", [anexo["id"] for anexo in anexos], "excluido")
+        _registrar_alteracoes(cursor, "registros", [row["id"] for row in rows], "excluido")
+        if anexos:
+            _enfileirar(cursor, "excluir_arquivos", {"nomes_arquivos": [anexo["nome_arquivo"] for anexo in anexos]})
+        conn.commit()
+    finally:
+        conn.close()
+
+    return _resultados_lote(ids, {row["id"]: "excluido" for row in rows})
+
+
+@medir_consulta
+def excluir_anexos_em_lote(ids: Optional[list[int]] = None, filtro: Optional[dict] = None) -> list[dict]:
+    """
+    Exclui vários anexos em uma transação; os arquivos são removidos em
+    segundo plano, por uma única tarefa. Retorna o resultado por ID.
+    """
+    where, params = _selecao_lote(ids, filtro, _CRITERIOS_ANEXOS)
 
-    excluido = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DELETE FROM anexos WHERE {where} RETURNING id, nome_arquivo", params)
+        anexos = cursor.fetchall()
 
-    return excluido
+        _registrar_alteracoes(cursor, "anexos", [anexo["id"] for anexo in anexos], "excluido")
+        if anexos:
+            _enfileirar(cursor, "excluir_arquivos", {"nomes_arquivos": [anexo["nome_arquivo"] for anexo in anexos]})
+        conn.commit()
+    finally:
+        conn.close()
 
+    return _resultados_lote(ids, {anexo["id"]: "excluido" for anexo in anexos})
 
-def obter_caminho_anexo(nome_arquivo: str) -> Path:
-    """Retorna o caminho completo de um anexo."""
-    return UPLOADS_DIR / nome_arquivo
 
+# ============ FUNÇÕES DE ARQUIVO ============
 
-# ============ FUNÇÕES DE HISTÓRICO/TIMELINE ============
+@medir_consulta
+def arquivar_registros(antes_de: str, lote: int = ARQUIVO_LOTE) -> int:
+    """
+    Move para o arquivo um lote de registros criados e alterados antes de
+    `antes_de` ("YYYY-MM-DD HH:MM:SS", UTC), com os seus anexos (só os
+    metadados; os arquivos continuam no armazenamento). Retorna quantos moveu.
 
-def listar_historico() -> list[dict]:
-    """Retorna todos os registros ordenados por data de criação (timeline)."""
+    Para os clientes o registro sai como excluído (o cache local e as listas
+    ficam só com os ativos); ele continua acessível pelo ID e pelas consultas
+    por período. Os pontos saem das estatísticas de km.
+    """
     conn = get_connection()
     cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """SELECT id FROM registros
+               WHERE criado_em < ? AND atualizado_em < ?
+               ORDER BY criado_em, id LIMIT ?""",
+            (antes_de, antes_de, lote)
+        )
+        ids = [row["id"] for row in cursor.fetchall()]
+        if not ids:
+            return 0
+        marcadores = ", ".join("?" * len(ids))
+
+        # Anexos antes: no PostgreSQL a exclusão do registro os levaria junto (ON DELETE CASCADE)
+        cursor.execute(f"DELETE FROM anexos WHERE registro_id IN ({marcadores}) RETURNING *", ids)
+        anexos = cursor.fetchall()
+        cursor.execute(f"DELETE FROM registros WHERE id IN ({marcadores}) RETURNING *", ids)
+        rows = cursor.fetchall()
+
+        cursor.executemany(
+            """INSERT INTO registros_arquivo
+               (id, titulo, quilometragem, proxima_troca, data_proxima_troca, filtro_trocado,
+                dados, texto_busca, criado_em, atualizado_em)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(row["id"], row["titulo"], row["quilometragem"], row["proxima_troca"], row["data_proxima_troca"],
+              row["filtro_trocado"], zlib.compress(row["dados"].encode("utf-8")), row["dados"],
+              row["criado_em"], row["atualizado_em"]) for row in rows]
+        )
+        if anexos:
+            cursor.executemany(
+                """INSERT INTO anexos_arquivo
+                   (id, registro_id, nome_original, nome_arquivo, tipo, tamanho, criado_em)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [(anexo["id"], anexo["registro_id"], anexo["nome_original"], anexo["nome_arquivo"],
+                  anexo["tipo"], anexo["tamanho"], anexo["criado_em"]) for anexo in anexos]
+            )
 
-    cursor.execute("SELECT * FROM registros ORDER BY criado_em DESC")
+        _remover_pontos_km(cursor, rows)
+        _registrar_alteracoes(cursor, "anexos", [anexo["id"] for anexo in anexos], "excluido")
+        _registrar_alteracoes(cursor, "registros", [row["id"] for row in rows], "excluido")
+        conn.commit()
+    finally:
+        conn.close()
 
-    rows = cursor.fetchall()
-    conn.close()
+    return len(rows)
 
-    registros = []
-    for row in rows:
-        registros.append({
-            "id": row["id"],
-            "titulo": row["titulo"],
-            "quilometragem": row["quilometragem"],
-            "proxima_troca": row["proxima_troca"],
-            "data_proxima_troca": row["data_proxima_troca"],
-            "filtro_trocado": bool(row["filtro_trocado"]),
-            "dados": json.loads(row["dados"]),
-            "criado_em": row["criado_em"],
-            "atualizado_em": row["atualizado_em"]
-        })
 
-    return registros
+# ============ FUNÇÕES DE HISTÓRICO/TIMELINE ============
 
+@medir_consulta
+def listar_historico(
+    campos: tuple[str, ...] = CAMPOS_REGISTRO,
+    de: Optional[str] = None,
+    ate: Optional[str] = None
+) -> list[dict]:
+    """
+    Retorna os registros ordenados por data de criação (timeline). Com um
+    período (`de`/`ate`), inclui os arquivados nele.
+    """
+    registros, _ = _consultar_registros("criado_em", campos=campos, de=de, ate=ate)
+    return registros
 
-# ============ FUNÇÕES DE VEÍCULOS ============
 
-def criar_veiculo(placa: str, modelo: str, ano: Optional[int] = None, cor: Optional[str] = None) -> int:
-    """Cria um novo veículo e retorna o ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
+@medir_consulta
+def listar_historico_paginado(
+    busca: Optional[str] = None,
+    limite: int = 50,
+    cursor_pagina: Optional[str] = None,
+    campos: tuple[str, ...] = CAMPOS_REGISTRO,
+    de: Optional[str] = None,
+    ate: Optional[str] = None
+) -> tuple[list[dict], Optional[str]]:
+    """Retorna uma página da timeline (por data de criação) e o próximo cursor."""
+    return _consultar_registros("criado_em", busca, limite, cursor_pagina, campos, de, ate)
 
-    cursor.execute(
-        """INSERT INTO veiculos (placa, modelo, ano, cor)
-           VALUES (?, ?, ?, ?)""",
-        (placa.upper(), modelo, ano, cor)
-    )
 
-    veiculo_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+# ============ FUNÇÕES DE RELATÓRIOS ============
 
-    return veiculo_id
+def _registros_com_arquivados(cursor: sqlite3.Cursor, condicao: str, params: list) -> list[dict]:
+    """Registros ativos e arquivados que atendem à condição, do mais antigo ao mais recente."""
+    registros = []
+    # Duas consultas: "dados" é texto em registros e binário no arquivo
+    for tabela in ("registros", "registros_arquivo"):
+        cursor.execute(f"SELECT {', '.join(CAMPOS_REGISTRO)} FROM {tabela} WHERE {condicao}", params)
+        registros.extend(_registro_de_row(row) for row in cursor.fetchall())
+    return sorted(registros, key=lambda registro: (registro["criado_em"], registro["id"]))
 
 
-def listar_veiculos() -> list[dict]:
-    """Retorna todos os veículos ordenados por modelo."""
+@medir_consulta
+def obter_registros(ids: list[int]) -> list[dict]:
+    """Registros pelos IDs (inclusive arquivados), por data de criação; IDs inexistentes são ignorados."""
     conn = get_connection()
     cursor = conn.cursor()
+    registros = _registros_com_arquivados(cursor, f"id IN ({', '.join('?' * len(ids))})", list(ids))
+    conn.close()
+    return registros
 
-    cursor.execute("SELECT * FROM veiculos ORDER BY modelo ASC")
 
-    rows = cursor.fetchall()
+@medir_consulta
+def listar_registros_da_placa(placa: str) -> list[dict]:
+    """Histórico completo (inclusive arquivado) dos registros da placa, do mais antigo ao mais recente."""
+    placa = placa.upper()
+    conn = get_connection()
+    cursor = conn.cursor()
+    # O LIKE só pré-filtra; a placa exata é conferida abaixo
+    candidatos = _registros_com_arquivados(cursor, "titulo LIKE ?", [f"%{placa}%"])
     conn.close()
+    return [registro for registro in candidatos if placa_do_titulo(registro["titulo"]) == placa]
 
-    veiculos = []
-    for row in rows:
-        veiculos.append({
-            "id": row["id"],
-            "placa": row["placa"],
-            "modelo": row["modelo"],
-            "ano": row["ano"],
-            "cor": row["cor"],
-            "criado_em": row["criado_em"],
-            "atualizado_em": row["atualizado_em"]
-        })
 
-    return veiculos
+@medir_consulta
+def listar_anexos_de_registros(registro_ids: list[int]) -> dict[int, list[dict]]:
+    """Anexos (inclusive arquivados) de vários registros: registro_id -> anexos, do mais antigo ao mais recente."""
+    if not registro_ids:
+        return {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    marcadores = ", ".join("?" * len(registro_ids))
+    por_registro: dict[int, list[dict]] = {}
+    for tabela in ("anexos", "anexos_arquivo"):
+        cursor.execute(
+            f"SELECT * FROM {tabela} WHERE registro_id IN ({marcadores}) ORDER BY criado_em, id",
+            list(registro_ids)
+        )
+        for row in cursor.fetchall():
+            por_registro.setdefault(row["registro_id"], []).append(_anexo_de_row(row))
+    conn.close()
+    return por_registro
+
 
+# ============ FUNÇÕES DE VEÍCULOS ============
+
+@medir_consulta
+def criar_veiculo(placa: str, modelo: str, ano: Optional[int] = None, cor: Optional[str] = None) -> int:
+    """Cria um novo veículo e retorna o ID."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # Placa duplicada levanta ErroIntegridade: a conexão (e o lock de escrita) é liberada mesmo assim
+    try:
+        cursor.execute(
+            """INSERT INTO veiculos (placa, modelo, ano, cor, placa_normalizada, modelo_normalizado)
+               VALUES (?, ?, ?, ?, ?, ?)
+               RETURNING id""",
+            (placa.upper(), modelo, ano, cor, normalizar_placa(placa), normalizar_modelo(modelo))
+        )
 
+        veiculo_id = cursor.fetchone()["id"]
+        _registrar_alteracao(cursor, "veiculos", veiculo_id, "salvo")
+        conn.commit()
+    finally:
+        conn.close()
+
+    return veiculo_id
+
+
+@medir_consulta
+def listar_veiculos(campos: tuple[str, ...] = CAMPOS_VEICULO) -> list[dict]:
+    """Retorna todos os veículos ordenados por modelo (só com os `campos` pedidos)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(f"SELECT {', '.join(campos)} FROM veiculos ORDER BY modelo ASC")
+
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [_veiculo_de_row(row, campos) for row in rows]
+
+
+@medir_consulta
 def obter_veiculo(veiculo_id: int) -> Optional[dict]:
     """Retorna um veículo pelo ID ou None se não existir."""
     conn = get_connection()
@@ -446,47 +1382,647 @@ def obter_veiculo(veiculo_id: int) -> Optional[dict]:
     if row is None:
         return None
 
+    return _veiculo_de_row(row)
+
+
+@medir_consulta
+def atualizar_veiculo(veiculo_id: int, placa: str, modelo: str, ano: Optional[int] = None, cor: Optional[str] = None) -> bool:
+    """Atualiza um veículo existente. Retorna True se atualizado."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """
+            UPDATE veiculos
+            SET placa = ?, modelo = ?, ano = ?, cor = ?, placa_normalizada = ?, modelo_normalizado = ?,
+                atualizado_em = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (placa.upper(), modelo, ano, cor, normalizar_placa(placa), normalizar_modelo(modelo), veiculo_id)
+        )
+
+        atualizado = cursor.rowcount > 0
+        if atualizado:
+            _registrar_alteracao(cursor, "veiculos", veiculo_id, "salvo")
+        conn.commit()
+    finally:
+        conn.close()
+
+    return atualizado
+
+
+@medir_consulta
+def excluir_veiculo(veiculo_id: int) -> bool:
+    """Exclui um veículo pelo ID. Retorna True se excluído."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM veiculos WHERE id = ?", (veiculo_id,))
+
+    excluido = cursor.rowcount > 0
+    if excluido:
+        _registrar_alteracao(cursor, "veiculos", veiculo_id, "excluido")
+    conn.commit()
+    conn.close()
+
+    return excluido
+
+
+def normalizar_placa(placa: str) -> str:
+    """
+    Chave de busca da placa: só letras e dígitos, em maiúsculas, e no padrão
+    antigo (a 5ª posição da placa Mercosul, A-J, vira o dígito 0-9), para
+    "ABC-1234", "abc1234" e "ABC1C34" serem a mesma. Vale também para prefixos.
+    """
+    chave = "".join(c for c in placa.upper() if c.isascii() and c.isalnum())
+    if len(chave) >= 5 and chave[:3].isalpha() and chave[3].isdigit() and "A" <= chave[4] <= "J":
+        chave = chave[:4] + str(ord(chave[4]) - ord("A")) + chave[5:]
+    return chave
+
+
+def normalizar_modelo(modelo: str) -> str:
+    """Chave de busca do modelo: minúsculas, sem acentos e com um espaço entre as palavras."""
+    sem_acentos = unicodedata.normalize("NFKD", modelo).encode("ascii", "ignore").decode("ascii")
+    return " ".join("".join(c if c.isalnum() else " " for c in sem_acentos.casefold()).split())
+
+
+def _fim_do_prefixo(prefixo: str) -> str:
+    """Menor texto maior que todos os que começam com `prefixo` (as chaves são ASCII)."""
+    return prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+
+
+@medir_consulta
+def autocompletar_veiculos(termo: str, limite: int = 10) -> list[dict]:
+    """
+    Veículos cuja placa ou modelo começa com `termo` (placas primeiro), só
+    com os campos do resumo. Cada busca é um intervalo no índice da chave
+    normalizada (`chave >= prefixo AND chave < fim`), então o custo depende
+    de `limite`, não do tamanho da frota.
+    """
+    colunas = ", ".join(PROJECOES_VEICULO["resumo"])
+    consultas = (
+        ("placa_normalizada", normalizar_placa(termo), "placa_normalizada"),
+        ("modelo_normalizado", normalizar_modelo(termo), "modelo_normalizado, placa_normalizada"),
+    )
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    encontrados: dict[int, dict] = {}
+    for coluna, prefixo, ordem in consultas:
+        if not prefixo or len(encontrados) >= limite:
+            continue
+        cursor.execute(
+            f"""SELECT {colunas} FROM veiculos
+                WHERE {coluna} >= ? AND {coluna} < ?
+                ORDER BY {ordem} LIMIT ?""",
+            (prefixo, _fim_do_prefixo(prefixo), limite)
+        )
+        for row in cursor.fetchall():
+            encontrados.setdefault(row["id"], _veiculo_de_row(row, PROJECOES_VEICULO["resumo"]))
+    conn.close()
+
+    return list(encontrados.values())[:limite]
+
+
+def _preencher_chaves_veiculos():
+    """Preenche as chaves do autocompletar em veículos anteriores a elas (uma vez)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, placa, modelo FROM veiculos WHERE placa_normalizada IS NULL")
+    rows = cursor.fetchall()
+    if rows:
+        cursor.executemany(
+            "UPDATE veiculos SET placa_normalizada = ?, modelo_normalizado = ? WHERE id = ?",
+            [(normalizar_placa(row["placa"]), normalizar_modelo(row["modelo"]), row["id"]) for row in rows]
+        )
+        conn.commit()
+    conn.close()
+
+
+def _preencher_texto_busca_arquivo():
+    """Preenche o texto de busca dos registros arquivados antes dessa coluna existir (uma vez)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, dados FROM registros_arquivo WHERE texto_busca IS NULL AND dados IS NOT NULL")
+    rows = cursor.fetchall()
+    if rows:
+        cursor.executemany(
+            "UPDATE registros_arquivo SET texto_busca = ? WHERE id = ?",
+            [(zlib.decompress(row["dados"]).decode("utf-8"), row["id"]) for row in rows]
+        )
+        conn.commit()
+    conn.close()
+
+
+# ============ FUNÇÕES DE SINCRONIZAÇÃO ============
+
+@medir_consulta
+def obter_token_alteracoes() -> int:
+    """Retorna o token atual de alterações (último número de sequência)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) AS token FROM alteracoes")
+    token = cursor.fetchone()["token"]
+    conn.close()
+
+    return token
+
+
+@medir_consulta
+def listar_alteracoes(desde: int = 0) -> dict:
+    """
+    Retorna registros, veículos e anexos alterados ou excluídos desde o token.
+
+    Com desde=0 (ou um token desconhecido, maior que o atual) retorna um
+    snapshot completo com "completo": True, e o cliente deve descartar o cache.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # O token é lido antes das linhas: uma escrita concorrente pode ser
+    # reenviada na próxima sincronização, mas nunca perdida (os seqs ficam
+    # visíveis em ordem, ver _travar_alteracoes).
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) AS token FROM alteracoes")
+    token = cursor.fetchone()["token"]
+
+    resultado = {
+        "token": token,
+        "completo": desde <= 0 or desde > token,
+        "registros": [],
+        "veiculos": [],
+        "anexos": [],
+        "excluidos": {"registros": [], "veiculos": [], "anexos": []}
+    }
+
+    if resultado["completo"]:
+        cursor.execute("SELECT * FROM registros ORDER BY id")
+        resultado["registros"] = [_registro_de_row(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT * FROM veiculos ORDER BY id")
+        resultado["veiculos"] = [_veiculo_de_row(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT * FROM anexos ORDER BY id")
+        resultado["anexos"] = [_anexo_de_row(row) for row in cursor.fetchall()]
+        conn.close()
+        return resultado
+
+    # Última operação de cada entidade alterada desde o token
+    cursor.execute(
+        """SELECT entidade, entidade_id, operacao
+           FROM alteracoes
+           WHERE seq IN (
+               SELECT MAX(seq) FROM alteracoes
+               WHERE seq > ?
+               GROUP BY entidade, entidade_id
+           )""",
+        (desde,)
+    )
+    salvos = {"registros": [], "veiculos": [], "anexos": []}
+    for row in cursor.fetchall():
+        if row["entidade"] not in salvos:
+            continue
+        if row["operacao"] == "excluido":
+            resultado["excluidos"][row["entidade"]].append(row["entidade_id"])
+        else:
+            salvos[row["entidade"]].append(row["entidade_id"])
+
+    conversores = {
+        "registros": _registro_de_row,
+        "veiculos": _veiculo_de_row,
+        "anexos": _anexo_de_row
+    }
+    for entidade, ids in salvos.items():
+        # Consulta em blocos para respeitar o limite de parâmetros do SQLite
+        for inicio in range(0, len(ids), 500):
+            bloco = ids[inicio:inicio + 500]
+            marcadores = ", ".join("?" for _ in bloco)
+            cursor.execute(
+                f"SELECT * FROM {entidade} WHERE id IN ({marcadores}) ORDER BY id",
+                bloco
+            )
+            resultado[entidade].extend(conversores[entidade](row) for row in cursor.fetchall())
+
+    conn.close()
+
+    return resultado
+
+
+# ============ FUNÇÕES DE TOKENS REVOGADOS ============
+
+@medir_consulta
+def revogar_token(jti: str, expira_em: int):
+    """Registra um token como revogado até sua expiração (timestamp Unix)."""
+    conn = _conexao_principal()
+    cursor = conn.cursor()
+
+    # Tokens já expirados não precisam mais constar da lista
+    cursor.execute("DELETE FROM tokens_revogados WHERE expira_em < ?", (int(time.time()),))
+    cursor.execute(
+        "INSERT INTO tokens_revogados (jti, expira_em) VALUES (?, ?) ON CONFLICT (jti) DO NOTHING",
+        (jti, expira_em)
+    )
+
+    conn.commit()
+    conn.close()
+
+
+@medir_consulta
+def listar_tokens_revogados() -> set[str]:
+    """Retorna os identificadores (jti) dos tokens revogados ainda não expirados."""
+    conn = _conexao_principal()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT jti FROM tokens_revogados WHERE expira_em >= ?", (int(time.time()),))
+    rows = cursor.fetchall()
+    conn.close()
+
+    return {row["jti"] for row in rows}
+
+
+# ============ FUNÇÕES DE INQUILINOS ============
+
+@medir_consulta
+def criar_inquilino(inquilino_id: str, nome: str, senha_hash: str, email_avisos: Optional[str] = None):
+    """Cadastra um inquilino no banco principal e cria o seu banco."""
+    conn = _conexao_principal()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "INSERT INTO inquilinos (id, nome, senha_hash, email_avisos) VALUES (?, ?, ?, ?)",
+        (inquilino_id, nome, senha_hash, email_avisos)
+    )
+
+    conn.commit()
+    conn.close()
+
+    with inquilinos.usar(inquilino_id):
+        _preparar_inquilino(inquilino_id)
+
+
+@medir_consulta
+def obter_inquilino(inquilino_id: str) -> Optional[dict]:
+    """Obtém o cadastro de um inquilino (com o hash da senha)."""
+    conn = _conexao_principal()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT * FROM inquilinos WHERE id = ?", (inquilino_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    if row is None:
+        return None
     return {
         "id": row["id"],
-        "placa": row["placa"],
-        "modelo": row["modelo"],
-        "ano": row["ano"],
-        "cor": row["cor"],
-        "criado_em": row["criado_em"],
-        "atualizado_em": row["atualizado_em"]
+        "nome": row["nome"],
+        "senha_hash": row["senha_hash"],
+        "email_avisos": row["email_avisos"],
+        "criado_em": row["criado_em"]
     }
 
 
-def atualizar_veiculo(veiculo_id: int, placa: str, modelo: str, ano: Optional[int] = None, cor: Optional[str] = None) -> bool:
-    """Atualiza um veículo existente. Retorna True se atualizado."""
+@medir_consulta
+def listar_inquilinos() -> list[str]:
+    """Retorna os IDs dos inquilinos cadastrados."""
+    conn = _conexao_principal()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT id FROM inquilinos ORDER BY id")
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [row["id"] for row in rows]
+
+
+# ============ FUNÇÕES DE NOTIFICAÇÕES ============
+
+@medir_consulta
+def listar_trocas_a_vencer(hoje: str, inicio: str, fim: str, limite: int = 500) -> list[dict]:
+    """
+    Trocas com data_proxima_troca entre `inicio` e `fim` que ainda não têm
+    aviso do tipo correspondente ("vencida" antes de `hoje`, senão "proxima").
+
+    Considera só o registro mais recente de cada veículo (mesmo título): uma
+    troca já feita tem um registro mais novo. Usa os índices de
+    data_proxima_troca, título e notificacoes, então o custo depende de
+    quantas trocas caem na janela, não do tamanho do histórico.
+    """
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute(
         """
-        UPDATE veiculos
-        SET placa = ?, modelo = ?, ano = ?, cor = ?, atualizado_em = CURRENT_TIMESTAMP
-        WHERE id = ?
+        SELECT r.id, r.titulo, r.quilometragem, r.proxima_troca, r.data_proxima_troca,
+               CASE WHEN r.data_proxima_troca < ? THEN 'vencida' ELSE 'proxima' END AS tipo
+        FROM registros r
+        WHERE r.data_proxima_troca BETWEEN ? AND ?
+          AND NOT EXISTS (
+              SELECT 1 FROM registros n
+              WHERE n.titulo = r.titulo AND (n.criado_em, n.id) > (r.criado_em, r.id)
+          )
+          AND NOT EXISTS (
+              SELECT 1 FROM notificacoes x
+              WHERE x.registro_id = r.id AND x.data_proxima_troca = r.data_proxima_troca
+                AND x.tipo = CASE WHEN r.data_proxima_troca < ? THEN 'vencida' ELSE 'proxima' END
+          )
+        ORDER BY r.data_proxima_troca, r.id
+        LIMIT ?
         """,
-        (placa.upper(), modelo, ano, cor, veiculo_id)
+        (hoje, inicio, fim, hoje, limite)
     )
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [dict(row) for row in rows]
 
-    atualizado = cursor.rowcount > 0
+
+@medir_consulta
+def criar_notificacoes(avisos: list[dict], canais: list[str]) -> int:
+    """
+    Grava os avisos (ignorando os já existentes) e enfileira a entrega de cada
+    aviso novo em cada canal, na mesma transação. Retorna quantos eram novos.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    novos = 0
+    for aviso in avisos:
+        cursor.execute(
+            """INSERT INTO notificacoes (registro_id, tipo, titulo, mensagem, data_proxima_troca)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (registro_id, tipo, data_proxima_troca) DO NOTHING
+               RETURNING id""",
+            (aviso["registro_id"], aviso["tipo"], aviso["titulo"], aviso["mensagem"],
+             aviso["data_proxima_troca"])
+        )
+        row = cursor.fetchone()
+        if row is None:
+            continue
+        novos += 1
+        for canal in canais:
+            _enfileirar(cursor, "entregar_notificacao", {"notificacao_id": row["id"], "canal": canal})
     conn.commit()
     conn.close()
 
-    return atualizado
+    return novos
 
 
-def excluir_veiculo(veiculo_id: int) -> bool:
-    """Exclui um veículo pelo ID. Retorna True se excluído."""
+@medir_consulta
+def obter_notificacao(notificacao_id: int) -> Optional[dict]:
+    """Retorna uma notificação pelo ID."""
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute("DELETE FROM veiculos WHERE id = ?", (veiculo_id,))
+    cursor.execute("SELECT * FROM notificacoes WHERE id = ?", (notificacao_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    if row is None:
+        return None
+
+    return _notificacao_de_row(row)
+
+
+@medir_consulta
+def listar_notificacoes(desde: int = 0, limite: int = 100) -> list[dict]:
+    """Notificações com ID maior que `desde`, em ordem de criação."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "SELECT * FROM notificacoes WHERE id > ? ORDER BY id LIMIT ?",
+        (desde, limite)
+    )
+    rows = cursor.fetchall()
+    conn.close()
+
+    return [_notificacao_de_row(row) for row in rows]
+
+
+@medir_consulta
+def obter_ultima_notificacao_id() -> int:
+    """ID da notificação mais recente (0 se não houver)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT COALESCE(MAX(id), 0) AS ultimo FROM notificacoes")
+    ultimo = cursor.fetchone()["ultimo"]
+    conn.close()
+
+    return ultimo
+
+
+# ============ FUNÇÕES DA FILA DE TAREFAS ============
+
+@medir_consulta
+def enfileirar_tarefa(tipo: str, dados: Optional[dict] = None, atraso: float = 0):
+    """Enfileira uma tarefa de segundo plano para daqui a `atraso` segundos."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    _enfileirar(cursor, tipo, dados or {}, time.time() + atraso)
 
-    excluido = cursor.rowcount > 0
     conn.commit()
     conn.close()
 
-    return excluido
+
+@medir_consulta
+def agendar_tarefa_periodica(tipo: str, atraso: float = 0):
+    """Garante que exista uma tarefa periódica do tipo (uma só, mesmo com vários workers)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """INSERT INTO tarefas (tipo, chave, executar_em) VALUES (?, ?, ?)
+           ON CONFLICT (chave) DO NOTHING""",
+        (tipo, f"periodica:{tipo}", time.time() + atraso)
+    )
+
+    conn.commit()
+    conn.close()
+
+
+@medir_consulta
+def reservar_tarefa(duracao_reserva: float) -> Optional[dict]:
+    """
+    Reserva a próxima tarefa pendente vencida por `duracao_reserva` segundos.
+
+    A reserva é um único UPDATE atômico, então vários workers podem disputar a
+    fila. Se o worker morrer, a reserva expira e outra tentativa é feita.
+    """
+    agora = time.time()
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # A condição de reserva é repetida fora da subconsulta: no PostgreSQL, um
+    # UPDATE concorrente na mesma linha é reavaliado e não reserva duas vezes
+    cursor.execute(
+        """UPDATE tarefas
+           SET reservada_ate = ?, tentativas = tentativas + 1
+           WHERE id = (
+               SELECT id FROM tarefas
+               WHERE estado = 'pendente' AND executar_em <= ? AND reservada_ate <= ?
+               ORDER BY executar_em
+               LIMIT 1
+           ) AND reservada_ate <= ?
+           RETURNING id, tipo, dados, chave, tentativas""",
+        (agora + duracao_reserva, agora, agora, agora)
+    )
+    row = cursor.fetchone()
+    conn.commit()
+    conn.close()
+
+    if row is None:
+        return None
+
+    return {
+        "id": row["id"],
+        "tipo": row["tipo"],
+        "dados": json.loads(row["dados"]),
+        "periodica": row["chave"] is not None,
+        "tentativas": row["tentativas"]
+    }
+
+
+@medir_consulta
+def estender_reserva(tarefa_id: int, duracao_reserva: float):
+    """Estende a reserva de uma tarefa longa (ex.: backup) para `duracao_reserva` segundos a partir de agora."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "UPDATE tarefas SET reservada_ate = ? WHERE id = ?",
+        (time.time() + duracao_reserva, tarefa_id)
+    )
+
+    conn.commit()
+    conn.close()
+
+
+@medir_consulta
+def concluir_tarefa(tarefa_id: int):
+    """Remove uma tarefa concluída."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM tarefas WHERE id = ?", (tarefa_id,))
+
+    conn.commit()
+    conn.close()
+
+
+@medir_consulta
+def reagendar_tarefa(tarefa_id: int, atraso: float, erro: Optional[str] = None, zerar_tentativas: bool = False):
+    """Libera a tarefa para rodar de novo daqui a `atraso` segundos (retentativa ou periódica)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        f"""UPDATE tarefas
+            SET executar_em = ?, reservada_ate = 0, erro = ?
+                {", tentativas = 0" if zerar_tentativas else ""}
+            WHERE id = ?""",
+        (time.time() + atraso, erro, tarefa_id)
+    )
+
+    conn.commit()
+    conn.close()
+
+
+@medir_consulta
+def falhar_tarefa(tarefa_id: int, erro: str):
+    """Marca a tarefa como falha definitiva (fica na tabela para inspeção)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        "UPDATE tarefas SET estado = 'falhou', reservada_ate = 0, erro = ? WHERE id = ?",
+        (erro, tarefa_id)
+    )
+
+    conn.commit()
+    conn.close()
+
+
+@medir_consulta
+def contar_tarefas() -> dict:
+    """Retorna quantas tarefas há em cada estado (para métricas/diagnóstico)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT estado, COUNT(*) AS total FROM tarefas GROUP BY estado")
+    rows = cursor.fetchall()
+    conn.close()
+
+    return {row["estado"]: row["total"] for row in rows}
+
+
+@medir_consulta
+def listar_nomes_arquivos_anexos() -> set[str]:
+    """Retorna os nomes de arquivo referenciados por algum anexo, inclusive arquivado (varredura de órfãos)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT nome_arquivo FROM anexos UNION SELECT nome_arquivo FROM anexos_arquivo")
+    rows = cursor.fetchall()
+    conn.close()
+
+    return {row["nome_arquivo"] for row in rows}
+
+
+@medir_consulta
+def otimizar_banco():
+    """Atualiza as estatísticas do planejador."""
+    conn = get_connection()
+    if DB_BACKEND != "postgres":
+        conn.execute("PRAGMA optimize")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+@medir_consulta
+def compactar_banco(paginas_por_passo: int = 256, pausa: float = 0.05) -> int:
+    """
+    Devolve ao sistema as páginas livres do SQLite, em passos curtos.
+
+    Com auto_vacuum=INCREMENTAL cada passo libera algumas páginas e solta o
+    lock, então as requisições só esperam um passo. Bancos antigos (criados
+    sem auto_vacuum) passam por um único VACUUM completo para a conversão.
+    Retorna quantas páginas foram liberadas (0 no PostgreSQL, onde o
+    autovacuum cuida disso).
+    """
+    if DB_BACKEND == "postgres":
+        return 0
+
+    conn = sqlite3.connect(caminho_banco(), isolation_level=None, timeout=30)
+    try:
+        livres_antes = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return livres_antes
+
+        while True:
+            livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if livres == 0:
+                break
+            # executescript roda o pragma até o fim (execute liberaria só uma página)
+            conn.executescript(f"PRAGMA incremental_vacuum({paginas_por_passo})")
+            time.sleep(pausa)
+        return livres_antes
+    finally:
+        conn.close()
+
+
+@medir_consulta
+def fracao_paginas_livres() -> float:
+    """Fração do arquivo SQLite ocupada por páginas livres (0 no PostgreSQL)."""
+    if DB_BACKEND == "postgres":
+        return 0.0
+
+    conn = get_connection()
+    livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    total = conn.execute("PRAGMA page_count").fetchone()[0]
+    conn.close()
+
+    return livres / total if total else 0.0
@@ -0,0 +1,198 @@
+"""
+Módulo de eventos - streams SSE alimentados pelo banco
+
+Os workers do gunicorn não compartilham memória, mas compartilham o banco:
+as funções de escrita do database.py registram cada alteração (tabela
+alteracoes) e cada aviso (notificacoes) na mesma transação. Em cada worker,
+um único Transmissor por tipo de stream consulta o que há de novo a cada
+poucos segundos e repassa aos streams abertos nele, então a carga no banco
+é uma consulta curta por intervalo e por worker (só enquanto há clientes
+conectados), não por cliente. Cada inquilino (ver inquilinos.py) tem os
+seus Transmissores, que consultam o banco dele.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+import database
+import inquilinos
+
+logger = logging.getLogger("eventos")
+
+# Tamanho da fila de cada cliente; quem não consome perde eventos (e se
+# ressincroniza ao reconectar, pelo Last-Event-ID)
+TAMANHO_FILA = 100
+# Comentário SSE periódico para manter a conexão aberta através de proxies
+INTERVALO_PING_SEGUNDOS = 15
+# Frequência com que cada worker procura alterações novas
+ALTERACOES_INTERVALO_SEGUNDOS = float(os.getenv("ALTERACOES_INTERVALO_SEGUNDOS", "1"))
+# Deltas maiores que isso (ex.: importação em massa) viram um pedido de
+# ressincronização: o cliente busca o delta em /api/sync
+ALTERACOES_MAX_ITENS = 200
+# Espera máxima entre tentativas quando a consulta periódica falha (banco fora do ar)
+ESPERA_MAXIMA_ERRO_SEGUNDOS = 30
+
+
+class Transmissor:
+    """
+    Repassa eventos novos aos streams SSE abertos neste worker.
+
+    `ler_ultimo()` retorna o ID do evento mais recente no banco e
+    `buscar(ultimo)` os eventos depois dele, como lista de (id, dados). As
+    duas funções são síncronas (database.py) e rodam em uma thread.
+    """
+
+    def __init__(self, ler_ultimo: Callable[[], int], buscar: Callable[[int], list], intervalo: float):
+        self.ler_ultimo = ler_ultimo
+        self._buscar = buscar
+        self._intervalo = intervalo
+        self._filas: set[asyncio.Queue] = set()
+        self._tarefa: Optional[asyncio.Task] = None
+        self._pronto: Optional[asyncio.Event] = None
+
+    async def assinar(self) -> asyncio.Queue:
+        """
+        Retorna a fila do novo stream. Só retorna depois que a consulta
+        periódica sabe de onde partir: o que for gravado a partir daí chega
+        pela fila, o que veio antes o stream lê do banco.
+        """
+        fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+        self._filas.add(fila)
+        if self._tarefa is None or self._tarefa.done():
+            self._pronto = asyncio.Event()
+            self._tarefa = asyncio.create_task(self._consultar(self._pronto))
+        try:
+            await self._pronto.wait()
+        except BaseException:
+            # Cliente desconectou antes (ex.: esperando o banco voltar)
+            self._filas.discard(fila)
+            raise
+        return fila
+
+    def cancelar(self, fila: asyncio.Queue):
+        self._filas.discard(fila)
+
+    async def _consultar(self, pronto: asyncio.Event):
+        """
+        Consulta periódica, enquanto houver streams. Uma falha não a encerra
+        (os streams ficariam esperando para sempre): registra o erro e tenta
+        de novo com espera crescente, retomando do último evento repassado.
+        """
+        ultimo = None
+        falhas = 0
+        while self._filas:
+            try:
+                if ultimo is None:
+                    ultimo = await asyncio.to_thread(self.ler_ultimo)
+                    pronto.set()
+                    novos = []
+                else:
+                    novos = await asyncio.to_thread(self._buscar, ultimo)
+            except Exception:
+                falhas += 1
+                logger.exception("Erro ao consultar eventos novos (%d falha(s) seguida(s))", falhas)
+                await asyncio.sleep(min(self._intervalo * 2 ** min(falhas, 10), ESPERA_MAXIMA_ERRO_SEGUNDOS))
+                continue
+            falhas = 0
+            for evento_id, dados in novos:
+                ultimo = evento_id
+                for fila in list(self._filas):
+                    if not fila.full():
+                        fila.put_nowait((evento_id, dados))
+            await asyncio.sleep(self._intervalo)
+
+
+class Transmissores:
+    """Um Transmissor por inquilino, criado na primeira assinatura dele neste worker."""
+
+    def __init__(self, ler_ultimo: Callable[[], int], buscar: Callable[[int], list], intervalo: float):
+        self._argumentos = (ler_ultimo, buscar, intervalo)
+        self._por_inquilino: dict[Optional[str], Transmissor] = {}
+
+    def obter(self) -> Transmissor:
+        """Transmissor do inquilino atual (a consulta periódica herda o contexto dele)."""
+        inquilino = inquilinos.atual()
+        transmissor = self._por_inquilino.get(inquilino)
+        if transmissor is None:
+            transmissor = self._por_inquilino[inquilino] = Transmissor(*self._argumentos)
+        return transmissor
+
+
+def formatar_evento(nome: str, evento_id: int, dados: dict) -> str:
+    return f"id: {evento_id}\nevent: {nome}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+async def stream(
+    transmissor: Transmissor,
+    nome: str,
+    desde: Optional[int],
+    duracao: float,
+    pendentes: Callable[[int], list]
+):
+    """
+    Gera um stream SSE: primeiro o que o cliente perdeu depois de `desde`
+    (Last-Event-ID), lido com `pendentes(desde)` até voltar vazio; depois os
+    eventos novos, por `duracao` segundos (até o token expirar; o cliente
+    reconecta com um token novo). Sem `desde`, só os eventos novos.
+    """
+    fila = await transmissor.assinar()
+    loop = asyncio.get_running_loop()
+    expira_em = loop.time() + duracao
+    try:
+        # Reconexão do navegador em 5 s
+        yield "retry: 5000\n\n"
+        if desde is None:
+            desde = await asyncio.to_thread(transmissor.ler_ultimo)
+        while lote := await asyncio.to_thread(pendentes, desde):
+            for evento_id, dados in lote:
+                desde = evento_id
+                yield formatar_evento(nome, evento_id, dados)
+
+        while loop.time() < expira_em:
+            try:
+                restante = max(expira_em - loop.time(), 0.1)
+                evento_id, dados = await asyncio.wait_for(fila.get(), timeout=min(INTERVALO_PING_SEGUNDOS, restante))
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if evento_id > desde:
+                desde = evento_id
+                yield formatar_evento(nome, evento_id, dados)
+    finally:
+        transmissor.cancelar(fila)
+
+
+# ============ ALTERAÇÕES ============
+
+def _buscar_alteracoes(desde: int) -> list[tuple[int, dict]]:
+    """
+    Delta desde o token `desde`, no formato de /api/sync mais o token de
+    origem ("desde"): o cliente só o aplica se estiver exatamente nele.
+    """
+    if database.obter_token_alteracoes() == desde:
+        return []
+    if desde <= 0:
+        # Token zero significaria um snapshot completo: o cliente usa /api/sync
+        token = database.obter_token_alteracoes()
+        return [(token, {"desde": desde, "token": token, "resincronizar": True})]
+
+    delta = database.listar_alteracoes(desde)
+    if delta["completo"] or sum(
+        len(delta[entidade]) + len(delta["excluidos"][entidade])
+        for entidade in ("registros", "veiculos", "anexos")
+    ) > ALTERACOES_MAX_ITENS:
+        return [(delta["token"], {"desde": desde, "token": delta["token"], "resincronizar": True})]
+
+    del delta["completo"]
+    return [(delta["token"], {"desde": desde, **delta})]
+
+
+_alteracoes = Transmissores(database.obter_token_alteracoes, _buscar_alteracoes, ALTERACOES_INTERVALO_SEGUNDOS)
+
+
+def stream_alteracoes(desde: Optional[int], duracao: float):
+    """Stream SSE das alterações de registros, veículos e anexos (eventos "alteracoes")."""
+    return stream(_alteracoes.obter(), "alteracoes", desde, duracao, _buscar_alteracoes)
@@ -0,0 +1,40 @@
+"""
+Configuração do gunicorn - partida a frio rápida
+
+    gunicorn main:app -c gunicorn.conf.py
+
+  - preload_app: a aplicação (FastAPI, pydantic, jose...) é importada uma
+    única vez no master; os workers nascem por fork e compartilham esses
+    módulos (copy-on-write), em vez de cada um importar tudo de novo;
+  - on_starting: o schema do banco é criado/migrado uma vez, antes do fork,
+    e não mais em cada worker (main.py só o faz quando roda sem este arquivo).
+
+Tempos de cada fase: GET /api/admin/inicializacao e log da primeira resposta
+de cada worker; por pacote importado, `python profiler.py inicializacao`.
+"""
+
+import os
+import time
+
+# Referência do relatório de inicialização (ver profiler.py)
+os.environ.setdefault("INICIO_SERVIDOR", str(time.time()))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server):
+    """Prepara o banco no master, antes de criar os workers."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    import database
+    import profiler
+
+    database.init_db()
+    # Os workers não podem herdar conexões abertas pelo master (PostgreSQL)
+    database.fechar_conexoes()
+    os.environ["BANCO_INICIALIZADO"] = "1"
+    profiler.marcar_inicializacao("banco")
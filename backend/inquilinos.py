@@ -0,0 +1,69 @@
+"""
+Módulo de inquilinos - várias frotas isoladas na mesma instalação
+
+Cada inquilino (uma frota/cliente) tem o seu próprio banco e os seus anexos:
+  - SQLite: um arquivo por inquilino em INQUILINOS_DIR/<id>.db;
+  - PostgreSQL: um schema por inquilino (inquilino_<id>) no mesmo banco,
+    com um pool de conexões próprio (ver banco_postgres.py);
+  - anexos: uma subpasta (ou prefixo no S3) por inquilino.
+
+O inquilino vem do token (claim "inquilino", ver auth.py) e fica em uma
+ContextVar durante a requisição; database.py e armazenamento.py a consultam
+para escolher o banco e a pasta. A fila de tarefas e os streams SSE rodam
+no contexto de cada inquilino. Sem inquilino (senha APP_PASSWORD) tudo
+continua como antes: DB_PATH, schema public e UPLOADS_DIR. Esse banco
+principal também guarda o cadastro dos inquilinos e os tokens revogados.
+
+Para cadastrar um inquilino (a partir de backend/):
+    python auth.py criar-inquilino frota_norte "Frota Norte"
+"""
+
+import os
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator, Optional
+
+# Bancos SQLite dos inquilinos
+INQUILINOS_DIR = Path(os.getenv("INQUILINOS_DIR", Path(__file__).parent / "data" / "inquilinos"))
+
+# Também é nome de arquivo e de schema: só minúsculas, dígitos e "_"
+_RE_ID = re.compile(r"^[a-z][a-z0-9_]{1,39}$")
+
+_atual: ContextVar[Optional[str]] = ContextVar("inquilino", default=None)
+
+
+def id_valido(inquilino_id: str) -> bool:
+    """Indica se o ID pode ser usado como inquilino."""
+    return bool(_RE_ID.match(inquilino_id))
+
+
+def atual() -> Optional[str]:
+    """Inquilino da requisição/tarefa em andamento (None = banco principal)."""
+    return _atual.get()
+
+
+def definir(inquilino_id: Optional[str]):
+    """Define o inquilino do contexto atual (cada requisição tem o seu contexto)."""
+    _atual.set(inquilino_id)
+
+
+@contextmanager
+def usar(inquilino_id: Optional[str]) -> Iterator[None]:
+    """Executa o bloco no contexto de um inquilino, restaurando o anterior ao sair."""
+    token = _atual.set(inquilino_id)
+    try:
+        yield
+    finally:
+        _atual.reset(token)
+
+
+def caminho_banco(inquilino_id: str) -> Path:
+    """Arquivo SQLite do inquilino."""
+    return INQUILINOS_DIR / f"{inquilino_id}.db"
+
+
+def esquema(inquilino_id: str) -> str:
+    """Schema PostgreSQL do inquilino."""
+    return f"inquilino_{inquilino_id}"
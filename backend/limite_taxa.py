@@ -0,0 +1,152 @@
+"""
+Módulo de limite de taxa - token bucket para rotas sensíveis (login)
+
+Cada chave (ex.: "ip:1.2.3.4" ou "global") tem um balde com `capacidade`
+fichas que se recarregam a `por_segundo`. Por padrão os baldes ficam em
+memória; com RATE_LIMIT_BACKEND=sqlite ficam em um arquivo SQLite local,
+compartilhado entre os workers do gunicorn.
+"""
+
+import ipaddress
+import os
+import sqlite3
+import threading
+import time
+
+from database import DATA_DIR
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memoria")
+RATE_LIMIT_DB_PATH = DATA_DIR / "limite_taxa.db"
+
+# Tentativas de login: por IP e no total (fichas, recarga por minuto). O
+# global é só um teto contra ataques de muitos IPs: bem acima do pico de
+# logins legítimos, para que um atacante não bloqueie o login de todos
+LOGIN_POR_IP_CAPACIDADE = int(os.getenv("LOGIN_POR_IP_CAPACIDADE", "5"))
+LOGIN_POR_IP_POR_MINUTO = float(os.getenv("LOGIN_POR_IP_POR_MINUTO", "5"))
+LOGIN_GLOBAL_CAPACIDADE = int(os.getenv("LOGIN_GLOBAL_CAPACIDADE", "600"))
+LOGIN_GLOBAL_POR_MINUTO = float(os.getenv("LOGIN_GLOBAL_POR_MINUTO", "600"))
+
+# Proxies cujo X-Forwarded-For é confiável (IPs ou redes separados por vírgula;
+# "*" = qualquer um, só quando a API não é acessível sem passar pelo proxy)
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+_PROXIES_CONFIAVEIS = [
+    ipaddress.ip_network(rede.strip(), strict=False)
+    for rede in TRUSTED_PROXIES.split(",") if rede.strip() and rede.strip() != "*"
+]
+
+# Baldes cheios há mais tempo que isso são descartados (limita o uso de memória)
+_LIMPEZA_SEGUNDOS = 600
+
+_lock = threading.Lock()
+_baldes: dict[str, tuple[float, float]] = {}
+_ultima_limpeza = time.monotonic()
+
+
+def _recarregar(tokens: float, atualizado_em: float, agora: float, capacidade: int, por_segundo: float) -> float:
+    """Retorna as fichas disponíveis após a recarga desde a última atualização."""
+    return min(capacidade, tokens + (agora - atualizado_em) * por_segundo)
+
+
+def _consumir_memoria(chave: str, capacidade: int, por_segundo: float) -> float:
+    global _ultima_limpeza
+    agora = time.monotonic()
+
+    with _lock:
+        tokens, atualizado_em = _baldes.get(chave, (capacidade, agora))
+        tokens = _recarregar(tokens, atualizado_em, agora, capacidade, por_segundo)
+
+        if tokens >= 1:
+            _baldes[chave] = (tokens - 1, agora)
+            espera = 0.0
+        else:
+            _baldes[chave] = (tokens, agora)
+            espera = (1 - tokens) / por_segundo
+
+        if agora - _ultima_limpeza > _LIMPEZA_SEGUNDOS:
+            limite = agora - _LIMPEZA_SEGUNDOS
+            for k in [k for k, (_, t) in _baldes.items() if t < limite]:
+                del _baldes[k]
+            _ultima_limpeza = agora
+
+    return espera
+
+
+def _conexao_sqlite() -> sqlite3.Connection:
+    conn = sqlite3.connect(RATE_LIMIT_DB_PATH, timeout=5, isolation_level=None)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS baldes (
+            chave TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            atualizado_em REAL NOT NULL
+        )
+    """)
+    return conn
+
+
+def _consumir_sqlite(chave: str, capacidade: int, por_segundo: float) -> float:
+    # Relógio de parede: precisa ser comparável entre processos
+    agora = time.time()
+    conn = _conexao_sqlite()
+    try:
+        # BEGIN IMMEDIATE serializa o ler-modificar-gravar entre os workers
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT tokens, atualizado_em FROM baldes WHERE chave = ?", (chave,)
+        ).fetchone()
+        tokens, atualizado_em = row if row else (capacidade, agora)
+        tokens = _recarregar(tokens, atualizado_em, agora, capacidade, por_segundo)
+
+        if tokens >= 1:
+            tokens -= 1
+            espera = 0.0
+        else:
+            espera = (1 - tokens) / por_segundo
+
+        conn.execute(
+            "INSERT OR REPLACE INTO baldes (chave, tokens, atualizado_em) VALUES (?, ?, ?)",
+            (chave, tokens, agora)
+        )
+        conn.execute(
+            "DELETE FROM baldes WHERE atualizado_em < ?", (agora - _LIMPEZA_SEGUNDOS,)
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    return espera
+
+
+def proxy_confiavel(ip: str) -> bool:
+    """Indica se a conexão vem de um proxy de TRUSTED_PROXIES (que adiciona o X-Forwarded-For)."""
+    if TRUSTED_PROXIES.strip() == "*":
+        return True
+    try:
+        endereco = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(endereco in rede for rede in _PROXIES_CONFIAVEIS)
+
+
+def consumir(chave: str, capacidade: int, por_minuto: float) -> float:
+    """
+    Tenta consumir uma ficha do balde da chave.
+
+    Retorna 0 se permitido, ou quantos segundos esperar até haver uma ficha.
+    """
+    por_segundo = por_minuto / 60
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return _consumir_sqlite(chave, capacidade, por_segundo)
+    return _consumir_memoria(chave, capacidade, por_segundo)
+
+
+def limitar_login(ip: str) -> float:
+    """
+    Aplica os limites de login (por IP e global). Retorna segundos de espera ou 0.
+
+    Só as tentativas aceitas pelo balde do IP consomem o global: um IP
+    sozinho gasta no máximo LOGIN_POR_IP_POR_MINUTO do teto.
+    """
+    espera = consumir(f"login:ip:{ip}", LOGIN_POR_IP_CAPACIDADE, LOGIN_POR_IP_POR_MINUTO)
+    if espera:
+        return espera
+    return consumir("login:global", LOGIN_GLOBAL_CAPACIDADE, LOGIN_GLOBAL_POR_MINUTO)
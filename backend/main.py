@@ -3,55 +3,75 @@ Sistema de Armazenamento de Informações v2
 API FastAPI REST para frontend React
 """
 
-import io
+import asyncio
+import functools
+import json
+import math
 import os
-from datetime import date, datetime
-from dateutil.relativedelta import relativedelta
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Callable, Optional
 
+# Início do processo para o relatório de inicialização (ver profiler.py);
+# com o gunicorn.conf.py, já definido no master
+os.environ.setdefault("INICIO_SERVIDOR", str(time.time()))
 
-def formatar_data_br(data_str: str) -> str:
-    """Formata data YYYY-MM-DD para DD/MM/AAAA."""
-    if not data_str:
-        return '-'
-    try:
-        if 'T' in data_str:
-            dt = datetime.fromisoformat(data_str.replace('Z', '+00:00'))
-            return dt.strftime('%d/%m/%Y')
-        else:
-            dt = datetime.strptime(data_str[:10], '%Y-%m-%d')
-            return dt.strftime('%d/%m/%Y')
-    except:
-        return data_str
-
-
-def formatar_data_hora_br(data_str: str) -> str:
-    """Formata datetime para DD/MM/AAAA HH:MM."""
-    if not data_str:
-        return '-'
-    try:
-        if 'T' in data_str:
-            dt = datetime.fromisoformat(data_str.replace('Z', '+00:00'))
-            return dt.strftime('%d/%m/%Y %H:%M')
-        else:
-            dt = datetime.strptime(data_str[:16], '%Y-%m-%d %H:%M')
-            return dt.strftime('%d/%m/%Y %H:%M')
-    except:
-        return data_str
-
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+
+from dotenv import load_dotenv
+
+# Antes dos módulos abaixo, que leem a configuração ao serem importados
+load_dotenv()
+
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from pydantic import BaseModel, Field
 
+import armazenamento
+import coalescencia
 import database
-from auth import fazer_login, get_current_user
+import eventos
+import inquilinos
+import limite_taxa
+import metricas
+import notificacoes
+import previsao
+import profiler
+import tarefas
+from auth import (
+    carregar_revogados, decodificar_token, fazer_login, renovar_tokens, revogar_token,
+    get_current_user, get_current_user_stream, security
+)
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    """
+    Prepara o banco (se ainda não foi feito antes do fork), carrega os tokens
+    revogados e inicia o loop de tarefas deste worker.
+    """
+    # Com o gunicorn.conf.py o schema é criado uma vez no master (on_starting);
+    # rodando direto (python main.py, uvicorn), cada processo o prepara aqui
+    if os.environ.get("BANCO_INICIALIZADO") != "1":
+        await asyncio.to_thread(database.init_db)
+        profiler.marcar_inicializacao("banco")
+    # Lista de revogação pronta antes da primeira requisição (depois, recarregada em thread)
+    await asyncio.to_thread(carregar_revogados)
+    if tarefas.TAREFAS_WORKER:
+        tarefas.iniciar_worker()
+    profiler.marcar_inicializacao("worker_pronto")
+    yield
+    tarefas.parar_worker()
+
 
 # Inicialização
 app = FastAPI(
     title="Sistema de Armazenamento de Informações v2",
     description="API REST para controle de manutenções de veículos",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=ciclo_de_vida
 )
 
 # Configurar CORS para permitir o frontend React
@@ -73,23 +93,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Proximo-Cursor"],
 )
 
-# Inicializar banco de dados ao iniciar
-database.init_db()
+# Token opcional exigido pelo /metrics (Authorization: Bearer <token>)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+
+@app.middleware("http")
+async def medir_requisicoes(request: Request, call_next):
+    """Registra latência, requisições em andamento e tamanho das respostas por rota."""
+    metodo = request.method
+    metricas.ajustar_gauge("http_requisicoes_em_andamento", 1)
+    inicio = time.perf_counter()
+    response = None
+    try:
+        response = await call_next(request)
+        return response
+    finally:
+        duracao = time.perf_counter() - inicio
+        # Usa o template da rota (ex.: /api/registros/{registro_id}) para limitar a cardinalidade
+        rota = getattr(request.scope.get("route"), "path", "desconhecida")
+        metricas.ajustar_gauge("http_requisicoes_em_andamento", -1)
+        metricas.observar("http_requisicao_segundos", duracao, metodo=metodo, rota=rota)
+        status_code = response.status_code if response is not None else 500
+        metricas.incrementar("http_requisicoes_total", metodo=metodo, rota=rota, status=status_code)
+        if response is not None and response.headers.get("content-length"):
+            metricas.observar(
+                "http_resposta_bytes", int(response.headers["content-length"]),
+                buckets=metricas.BUCKETS_BYTES, metodo=metodo, rota=rota
+            )
+        metricas.gravar_snapshot()
+        profiler.marcar_inicializacao("primeira_resposta")
 
 
 # ============ SCHEMAS ============
 
 class LoginRequest(BaseModel):
     senha: str
+    # ID do inquilino (frota); sem ele, a senha é a da aplicação
+    inquilino: Optional[str] = None
 
 
 class LoginResponse(BaseModel):
     access_token: str
+    refresh_token: str
+    expires_in: int
     token_type: str = "bearer"
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+
 class CampoAdicional(BaseModel):
     chave: str
     valor: str
@@ -125,6 +185,64 @@ class RegistroResponse(BaseModel):
     atualizado_em: str
 
 
+# Máximo de IDs por operação em lote (com filtro não há limite)
+LOTE_MAX_IDS = 1000
+
+
+class FiltroRegistros(BaseModel):
+    busca: Optional[str] = None
+    criado_antes: Optional[date] = None
+    data_proxima_troca_antes: Optional[date] = None
+    filtro_trocado: Optional[bool] = None
+
+
+class ExclusaoRegistrosLote(BaseModel):
+    # IDs ou filtro, um dos dois
+    ids: Optional[list[int]] = Field(None, max_length=LOTE_MAX_IDS)
+    filtro: Optional[FiltroRegistros] = None
+
+
+class RelatorioRegistros(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=LOTE_MAX_IDS)
+
+
+class AtualizacaoRegistrosLote(ExclusaoRegistrosLote):
+    filtro_trocado: Optional[bool] = None
+    # Define a data ou a desloca (em dias, negativo para antecipar)
+    data_proxima_troca: Optional[date] = None
+    deslocar_dias: Optional[int] = None
+
+
+class FiltroAnexos(BaseModel):
+    registro_id: Optional[int] = None
+    # Prefixo do tipo MIME, ex.: "image/"
+    tipo: Optional[str] = None
+    criado_antes: Optional[date] = None
+
+
+class ExclusaoAnexosLote(BaseModel):
+    ids: Optional[list[int]] = Field(None, max_length=LOTE_MAX_IDS)
+    filtro: Optional[FiltroAnexos] = None
+
+
+class ResultadoLote(BaseModel):
+    id: int
+    # atualizado, excluido, sem_data ou nao_encontrado
+    status: str
+
+
+class UploadDiretoRequest(BaseModel):
+    nome: str
+    tipo: Optional[str] = None
+    tamanho: int
+
+
+class ConcluirUploadRequest(BaseModel):
+    nome_arquivo: str
+    nome_original: str
+    tipo: Optional[str] = None
+
+
 class VeiculoCreate(BaseModel):
     placa: str
     modelo: str
@@ -149,18 +267,143 @@ class VeiculoResponse(BaseModel):
     atualizado_em: str
 
 
+class VeiculoResumo(BaseModel):
+    id: int
+    placa: str
+    modelo: str
+
+
+if profiler.PROFILER_POR_REQUISICAO:
+    # Registrado só quando habilitado: sem o header, custo zero quando desligado
+    @app.middleware("http")
+    async def perfilar_requisicao(request: Request, call_next):
+        """
+        Com o header X-Profile: 1 e token do operador (banco principal, como em
+        /api/admin/profiler), retorna o perfil collapsed da requisição.
+        """
+        if request.headers.get("x-profile") != "1":
+            return await call_next(request)
+        payload = decodificar_token(request.headers.get("authorization", "").removeprefix("Bearer "))
+        if not payload or not payload.get("authenticated", False) or payload.get("inquilino"):
+            return await call_next(request)
+
+        amostrador = profiler.iniciar_perfil_requisicao()
+        if amostrador is None:
+            return await call_next(request)
+        try:
+            response = await call_next(request)
+            # Consome o corpo para que o envio (ex.: download de anexo) entre no perfil;
+            # streams SSE não terminam, então X-Profile não serve para eles
+            async for _ in response.body_iterator:
+                pass
+        finally:
+            perfil = profiler.finalizar_perfil_requisicao(amostrador)
+        return PlainTextResponse(perfil, headers={"X-Profile-Status": str(response.status_code)})
+
+
+# ============ ROTAS DE MÉTRICAS ============
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def exportar_metricas(request: Request):
+    """Métricas de todos os workers no formato texto do Prometheus."""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Não autorizado")
+    return PlainTextResponse(
+        metricas.exportar_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# ============ ROTAS DE ADMINISTRAÇÃO ============
+
+@app.get("/api/admin/profiler", response_class=PlainTextResponse)
+async def perfilar_worker(
+    segundos: float = Query(10, gt=0, le=profiler.DURACAO_MAXIMA_SEGUNDOS),
+    intervalo_ms: float = Query(5, ge=1, le=100),
+    authenticated: bool = Depends(get_current_user)
+):
+    """
+    Amostra as pilhas deste worker por N segundos e retorna o perfil no formato
+    collapsed stacks (compatível com flamegraph.pl / speedscope).
+    Só para o operador (banco principal): o worker é de todos os inquilinos.
+    """
+    if inquilinos.atual() is not None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso restrito ao operador")
+    perfil = await asyncio.to_thread(profiler.perfilar_processo, segundos, intervalo_ms / 1000)
+    if perfil is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Já existe um perfil em andamento neste worker"
+        )
+    return PlainTextResponse(perfil)
+
+
+@app.get("/api/admin/inicializacao")
+async def relatorio_inicializacao(authenticated: bool = Depends(get_current_user)):
+    """Segundos desde o início do servidor até cada fase da inicialização deste worker."""
+    if inquilinos.atual() is not None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso restrito ao operador")
+    return profiler.relatorio_inicializacao()
+
+
 # ============ ROTAS DE AUTENTICAÇÃO ============
 
+def ip_cliente(http_request: Request) -> str:
+    """
+    Retorna o IP do cliente. Atrás de um proxy confiável (TRUSTED_PROXIES), é o
+    último salto do X-Forwarded-For, adicionado pelo proxy; sem ele o header é
+    ignorado, senão o cliente poderia trocá-lo a cada tentativa de login.
+    """
+    conectado = http_request.client.host if http_request.client else "desconhecido"
+    encaminhado = http_request.headers.get("x-forwarded-for")
+    if encaminhado and limite_taxa.proxy_confiavel(conectado):
+        return encaminhado.split(",")[-1].strip()
+    return conectado
+
+
 @app.post("/api/login", response_model=LoginResponse)
-async def login(request: LoginRequest):
+async def login(request: LoginRequest, http_request: Request):
     """Autentica o usuário e retorna o token JWT."""
-    token = fazer_login(request.senha)
-    if not token:
+    # Com RATE_LIMIT_BACKEND=sqlite a consulta pode esperar o lock: fora do event loop
+    espera = await asyncio.to_thread(limite_taxa.limitar_login, ip_cliente(http_request))
+    if espera:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas de login. Tente novamente em instantes.",
+            headers={"Retry-After": str(math.ceil(espera))}
+        )
+
+    tokens = await fazer_login(request.senha, request.inquilino)
+    if not tokens:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Senha incorreta"
         )
-    return LoginResponse(access_token=token)
+    return LoginResponse(**tokens)
+
+
+@app.post("/api/refresh", response_model=LoginResponse)
+async def refresh(request: RefreshRequest):
+    """Troca um refresh token válido por um novo par de tokens."""
+    tokens = renovar_tokens(request.refresh_token)
+    if not tokens:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido ou expirado"
+        )
+    return LoginResponse(**tokens)
+
+
+@app.post("/api/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    request: LogoutRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Revoga o access token atual e, se informado, o refresh token."""
+    revogar_token(credentials.credentials)
+    if request.refresh_token:
+        revogar_token(request.refresh_token, tipo="refresh")
+    return None
 
 
 @app.get("/api/verificar-auth")
@@ -171,14 +414,75 @@ async def verificar_auth(authenticated: bool = Depends(get_current_user)):
 
 # ============ ROTAS DE REGISTROS ============
 
+DESCRICAO_CAMPOS = "Projeção (resumo, completo) ou colunas separadas por vírgula; o padrão é completo"
+
+
+def projetar(campos: Optional[str], projecoes: dict[str, tuple[str, ...]]) -> tuple[str, ...]:
+    """Colunas pedidas em ?campos= (ver database.resolver_campos)."""
+    try:
+        return database.resolver_campos(campos, projecoes)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def paginar(
+    funcao,
+    busca: Optional[str],
+    limite: Optional[int],
+    cursor: Optional[str],
+    campos: tuple[str, ...]
+) -> tuple[list, Optional[str]]:
+    """Executa uma listagem paginada; retorna a página e o cursor da próxima."""
+    try:
+        return funcao(busca=busca, limite=limite, cursor_pagina=cursor, campos=campos)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def serializar(dados) -> bytes:
+    """Corpo JSON como o FastAPI o geraria, para ser reaproveitado entre requisições."""
+    return json.dumps(jsonable_encoder(dados), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def responder_listagem(
+    rota: str,
+    parametros: tuple,
+    listar: Callable[[], tuple[list, Optional[str]]]
+) -> Response:
+    """
+    Executa `listar()` uma vez para as requisições idênticas simultâneas (ver
+    coalescencia.py) e devolve o JSON já serializado; o cursor da próxima
+    página, se houver, vai no header X-Proximo-Cursor.
+    """
+    def gerar():
+        itens, proximo_cursor = listar()
+        return serializar(itens), proximo_cursor
+
+    corpo, proximo_cursor = await coalescencia.executar(rota, parametros, gerar)
+    headers = {"X-Proximo-Cursor": proximo_cursor} if proximo_cursor else None
+    return Response(corpo, media_type="application/json", headers=headers)
+
+
 @app.get("/api/registros", response_model=list[RegistroResponse])
 async def listar_registros(
     busca: Optional[str] = None,
+    limite: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    campos: Optional[str] = Query(None, description=DESCRICAO_CAMPOS),
     authenticated: bool = Depends(get_current_user)
 ):
-    """Lista todos os registros, opcionalmente filtrados por busca."""
-    registros = database.listar_registros(busca=busca)
-    return registros
+    """
+    Lista os registros, opcionalmente filtrados por busca.
+
+    Com `limite`, retorna uma página; o cursor da próxima vem no header X-Proximo-Cursor.
+    Com `campos`, cada registro traz só as colunas pedidas (ex.: `campos=resumo`, sem `dados`).
+    """
+    colunas = projetar(campos, database.PROJECOES_REGISTRO)
+    if limite is None and cursor is None:
+        listar = lambda: (database.listar_registros(busca=busca, campos=colunas), None)
+    else:
+        listar = lambda: paginar(database.listar_registros_paginado, busca, limite or 50, cursor, colunas)
+    return await responder_listagem("registros", (busca, limite, cursor, colunas), listar)
 
 
 @app.get("/api/registros/{registro_id}", response_model=RegistroResponse)
@@ -186,8 +490,8 @@ async def obter_registro(
     registro_id: int,
     authenticated: bool = Depends(get_current_user)
 ):
-    """Retorna um registro pelo ID."""
-    registro = database.obter_registro(registro_id)
+    """Retorna um registro pelo ID (também os arquivados, só para leitura)."""
+    registro = database.obter_registro(registro_id, incluir_arquivados=True)
     if not registro:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -245,30 +549,135 @@ async def excluir_registro(
     authenticated: bool = Depends(get_current_user)
 ):
     """Exclui um registro."""
-    existente = database.obter_registro(registro_id)
-    if not existente:
+    if not database.excluir_registro(registro_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Registro não encontrado"
         )
-    database.excluir_registro(registro_id)
     return None
 
 
+def executar_lote(funcao, lote: BaseModel, **alteracoes) -> list[dict]:
+    """Executa uma operação em lote com os IDs ou o filtro do corpo; erros de validação viram 400."""
+    filtro = lote.filtro.model_dump(mode="json", exclude_none=True) if lote.filtro else None
+    try:
+        return funcao(ids=lote.ids, filtro=filtro, **alteracoes)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.post("/api/registros/lote/atualizar", response_model=list[ResultadoLote])
+async def atualizar_registros_em_lote(
+    lote: AtualizacaoRegistrosLote,
+    authenticated: bool = Depends(get_current_user)
+):
+    """
+    Atualiza vários registros (por `ids` ou `filtro`) em uma transação:
+    `filtro_trocado`, `data_proxima_troca` ou `deslocar_dias`. Retorna o resultado por ID.
+    """
+    return executar_lote(
+        database.atualizar_registros_em_lote, lote,
+        filtro_trocado=lote.filtro_trocado,
+        data_proxima_troca=lote.data_proxima_troca.isoformat() if lote.data_proxima_troca else None,
+        deslocar_dias=lote.deslocar_dias
+    )
+
+
+@app.post("/api/registros/lote/excluir", response_model=list[ResultadoLote])
+async def excluir_registros_em_lote(
+    lote: ExclusaoRegistrosLote,
+    authenticated: bool = Depends(get_current_user)
+):
+    """Exclui vários registros (por `ids` ou `filtro`) e os seus anexos em uma transação."""
+    return executar_lote(database.excluir_registros_em_lote, lote)
+
+
 @app.get("/api/data-padrao-proxima-troca")
-async def data_padrao_proxima_troca(authenticated: bool = Depends(get_current_user)):
-    """Retorna a data padrão para próxima troca (hoje + 6 meses)."""
+async def data_padrao_proxima_troca(
+    placa: Optional[str] = None,
+    proxima_troca: Optional[int] = None,
+    authenticated: bool = Depends(get_current_user)
+):
+    """
+    Retorna a data padrão para próxima troca: com placa e quilometragem da
+    próxima troca, a data prevista pelo histórico do veículo; senão (ou sem
+    histórico suficiente), hoje + 6 meses.
+    """
+    if placa and proxima_troca is not None:
+        for estatistica in database.listar_estatisticas_km(placa):
+            prevista = previsao.prever({**estatistica, "proxima_troca": proxima_troca})["data_prevista"]
+            if prevista and prevista > date.today().isoformat():
+                return {"data": prevista, "hoje": date.today().isoformat(), "origem": "previsao"}
+
+    from dateutil.relativedelta import relativedelta
+
     data_padrao = (date.today() + relativedelta(months=6)).isoformat()
-    return {"data": data_padrao, "hoje": date.today().isoformat()}
+    return {"data": data_padrao, "hoje": date.today().isoformat(), "origem": "padrao"}
 
 
 # ============ ROTAS DE HISTÓRICO ============
 
 @app.get("/api/historico")
-async def listar_historico(authenticated: bool = Depends(get_current_user)):
-    """Retorna todos os registros em formato de timeline (ordenados por data de criação)."""
-    registros = database.listar_historico()
-    return registros
+async def listar_historico(
+    busca: Optional[str] = None,
+    limite: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    campos: Optional[str] = Query(None, description=DESCRICAO_CAMPOS),
+    de: Optional[date] = Query(None, description="Criados a partir desta data"),
+    ate: Optional[date] = Query(None, description="Criados até esta data (inclusive)"),
+    authenticated: bool = Depends(get_current_user)
+):
+    """
+    Retorna os registros em formato de timeline (ordenados por data de criação).
+
+    Com `limite`, retorna uma página; o cursor da próxima vem no header X-Proximo-Cursor.
+    Com `campos`, cada registro traz só as colunas pedidas (ex.: `campos=resumo`, sem `dados`).
+    Com um período (`de`/`ate`), inclui os registros arquivados nele.
+    """
+    colunas = projetar(campos, database.PROJECOES_REGISTRO)
+    periodo = {"de": de.isoformat() if de else None, "ate": ate.isoformat() if ate else None}
+    if limite is None and cursor is None and not busca:
+        listar = lambda: (database.listar_historico(campos=colunas, **periodo), None)
+    else:
+        listar = lambda: paginar(
+            functools.partial(database.listar_historico_paginado, **periodo), busca, limite or 50, cursor, colunas
+        )
+    return await responder_listagem("historico", (busca, limite, cursor, colunas, de, ate), listar)
+
+
+# ============ ROTAS DE SINCRONIZAÇÃO ============
+
+@app.get("/api/sync")
+async def sincronizar(
+    desde: int = 0,
+    authenticated: bool = Depends(get_current_user)
+):
+    """
+    Retorna apenas o que mudou desde o token informado (registros, veículos,
+    anexos e exclusões), junto com o novo token para a próxima chamada.
+    """
+    return database.listar_alteracoes(desde=desde)
+
+
+@app.get("/api/alteracoes/stream")
+async def stream_alteracoes(
+    request: Request,
+    desde: Optional[int] = None,
+    payload: dict = Depends(get_current_user_stream)
+):
+    """
+    Stream SSE das alterações (token em ?token=): a cada escrita, em qualquer
+    worker, envia o delta no formato de /api/sync junto com o token de
+    origem. `desde` (ou Last-Event-ID) é o token de sincronização do cliente.
+    """
+    ultimo_evento = request.headers.get("last-event-id", "")
+    if ultimo_evento.isdigit():
+        desde = int(ultimo_evento)
+    return StreamingResponse(
+        eventos.stream_alteracoes(desde, payload["exp"] - time.time()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # ============ ROTAS DE ANEXOS ============
@@ -288,7 +697,9 @@ async def upload_anexo(
         )
 
     conteudo = await arquivo.read()
-    anexo = database.salvar_anexo(
+    # Com armazenamento remoto a gravação é uma chamada de rede: fora do event loop
+    anexo = await asyncio.to_thread(
+        database.salvar_anexo,
         registro_id=registro_id,
         nome_original=arquivo.filename,
         conteudo=conteudo,
@@ -297,20 +708,87 @@ async def upload_anexo(
     return anexo
 
 
+@app.post("/api/registros/{registro_id}/anexos/upload-direto")
+async def iniciar_upload_direto(
+    registro_id: int,
+    request: UploadDiretoRequest,
+    authenticated: bool = Depends(get_current_user)
+):
+    """
+    Prepara um upload direto do navegador para o armazenamento.
+
+    Retorna {"upload": {"url", "fields"}, "nome_arquivo"} para um POST
+    multipart ao bucket, seguido de /anexos/concluir; ou {"upload": None}
+    quando o armazenamento é local e o arquivo deve ir para /anexos.
+    """
+    registro = database.obter_registro(registro_id)
+    if not registro:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Registro não encontrado"
+        )
+    if request.tamanho > armazenamento.ANEXO_TAMANHO_MAXIMO:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Arquivo maior que o permitido"
+        )
+
+    nome_arquivo = armazenamento.gerar_nome_arquivo(request.nome)
+    upload = armazenamento.obter_armazenamento().url_upload(nome_arquivo, request.tipo)
+    if upload is None:
+        return {"upload": None}
+    return {"upload": upload, "nome_arquivo": nome_arquivo}
+
+
+@app.post("/api/registros/{registro_id}/anexos/concluir")
+async def concluir_upload_direto(
+    registro_id: int,
+    request: ConcluirUploadRequest,
+    authenticated: bool = Depends(get_current_user)
+):
+    """Registra o anexo após o upload direto, conferindo o objeto no armazenamento."""
+    registro = database.obter_registro(registro_id)
+    if not registro:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Registro não encontrado"
+        )
+    if not armazenamento.nome_arquivo_valido(request.nome_arquivo):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nome de arquivo inválido"
+        )
+
+    tamanho = await asyncio.to_thread(armazenamento.obter_armazenamento().tamanho, request.nome_arquivo)
+    if tamanho is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Arquivo não encontrado no armazenamento"
+        )
+
+    return database.registrar_anexo(
+        registro_id=registro_id,
+        nome_original=request.nome_original,
+        nome_arquivo=request.nome_arquivo,
+        tipo=request.tipo,
+        tamanho=tamanho
+    )
+
+
 @app.get("/api/registros/{registro_id}/anexos")
 async def listar_anexos(
     registro_id: int,
     authenticated: bool = Depends(get_current_user)
 ):
     """Lista todos os anexos de um registro."""
-    registro = database.obter_registro(registro_id)
+    registro = database.obter_registro(registro_id, incluir_arquivados=True)
     if not registro:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Registro não encontrado"
         )
 
-    anexos = database.listar_anexos(registro_id)
+    anexos = database.listar_anexos(registro_id, incluir_arquivados=True)
     return anexos
 
 
@@ -320,7 +798,7 @@ async def obter_anexo(
     authenticated: bool = Depends(get_current_user)
 ):
     """Retorna os dados de um anexo."""
-    anexo = database.obter_anexo(anexo_id)
+    anexo = database.obter_anexo(anexo_id, incluir_arquivados=True)
     if not anexo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -334,14 +812,20 @@ async def download_anexo(
     anexo_id: int,
     authenticated: bool = Depends(get_current_user)
 ):
-    """Faz download de um anexo."""
-    anexo = database.obter_anexo(anexo_id)
+    """Faz download de um anexo (redireciona para uma URL pré-assinada se houver)."""
+    anexo = database.obter_anexo(anexo_id, incluir_arquivados=True)
     if not anexo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Anexo não encontrado"
         )
 
+    url = armazenamento.obter_armazenamento().url_download(
+        anexo["nome_arquivo"], anexo["nome_original"], anexo["tipo"]
+    )
+    if url:
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
     caminho = database.obter_caminho_anexo(anexo["nome_arquivo"])
     if not caminho.exists():
         raise HTTPException(
@@ -356,30 +840,75 @@ async def download_anexo(
     )
 
 
+@app.get("/api/anexos/{anexo_id}/url")
+async def obter_url_anexo(
+    anexo_id: int,
+    authenticated: bool = Depends(get_current_user)
+):
+    """
+    Retorna uma URL de download de curta duração, que o navegador pode abrir
+    sem o header Authorization; None quando o armazenamento é local.
+    """
+    anexo = database.obter_anexo(anexo_id, incluir_arquivados=True)
+    if not anexo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Anexo não encontrado"
+        )
+
+    url = armazenamento.obter_armazenamento().url_download(
+        anexo["nome_arquivo"], anexo["nome_original"], anexo["tipo"]
+    )
+    return {"url": url, "expira_em": armazenamento.URL_EXPIRA_SEGUNDOS if url else None}
+
+
 @app.delete("/api/anexos/{anexo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def excluir_anexo(
     anexo_id: int,
     authenticated: bool = Depends(get_current_user)
 ):
     """Exclui um anexo."""
-    anexo = database.obter_anexo(anexo_id)
-    if not anexo:
+    if not database.excluir_anexo(anexo_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Anexo não encontrado"
         )
-
-    database.excluir_anexo(anexo_id)
     return None
 
 
+@app.post("/api/anexos/lote/excluir", response_model=list[ResultadoLote])
+async def excluir_anexos_em_lote(
+    lote: ExclusaoAnexosLote,
+    authenticated: bool = Depends(get_current_user)
+):
+    """Exclui vários anexos (por `ids` ou `filtro`) em uma transação; os arquivos saem em segundo plano."""
+    return executar_lote(database.excluir_anexos_em_lote, lote)
+
+
 # ============ ROTAS DE VEÍCULOS ============
 
 @app.get("/api/veiculos", response_model=list[VeiculoResponse])
-async def listar_veiculos(authenticated: bool = Depends(get_current_user)):
-    """Lista todos os veículos cadastrados."""
-    veiculos = database.listar_veiculos()
-    return veiculos
+async def listar_veiculos(
+    campos: Optional[str] = Query(None, description=DESCRICAO_CAMPOS),
+    authenticated: bool = Depends(get_current_user)
+):
+    """Lista todos os veículos cadastrados (com `campos`, só as colunas pedidas)."""
+    colunas = projetar(campos, database.PROJECOES_VEICULO)
+    return await responder_listagem("veiculos", (colunas,), lambda: (database.listar_veiculos(colunas), None))
+
+
+@app.get("/api/veiculos/autocomplete", response_model=list[VeiculoResumo])
+async def autocompletar_veiculos(
+    q: str = Query(..., min_length=1, max_length=50),
+    limite: int = Query(10, ge=1, le=50),
+    authenticated: bool = Depends(get_current_user)
+):
+    """
+    Veículos cuja placa ou modelo começa com `q`, placas primeiro. A placa
+    ignora hífens, maiúsculas e a diferença entre o padrão antigo e o
+    Mercosul ("ABC1234" encontra "ABC1C34"); o modelo ignora acentos.
+    """
+    return database.autocompletar_veiculos(q, limite)
 
 
 @app.get("/api/veiculos/{veiculo_id}", response_model=VeiculoResponse)
@@ -411,13 +940,11 @@ async def criar_veiculo(
             cor=veiculo.cor
         )
         return database.obter_veiculo(veiculo_id)
-    except Exception as e:
-        if "UNIQUE constraint failed" in str(e):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Já existe um veículo com esta placa"
-            )
-        raise
+    except database.ErroIntegridade:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Já existe um veículo com esta placa"
+        )
 
 
 @app.put("/api/veiculos/{veiculo_id}", response_model=VeiculoResponse)
@@ -443,13 +970,11 @@ async def atualizar_veiculo(
             cor=veiculo.cor
         )
         return database.obter_veiculo(veiculo_id)
-    except Exception as e:
-        if "UNIQUE constraint failed" in str(e):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Já existe um veículo com esta placa"
-            )
-        raise
+    except database.ErroIntegridade:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Já existe um veículo com esta placa"
+        )
 
 
 @app.delete("/api/veiculos/{veiculo_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -468,194 +993,184 @@ async def excluir_veiculo(
     return None
 
 
-# ============ ROTAS DE EXPORTAÇÃO ============
+# ============ ROTAS DE PREVISÃO ============
 
-@app.get("/api/registros/{registro_id}/pdf")
-async def exportar_pdf_registro(
-    registro_id: int,
+@app.get("/api/previsoes")
+async def listar_previsoes(
+    dias: Optional[int] = Query(None, ge=0, description="Só veículos com troca prevista em até N dias"),
     authenticated: bool = Depends(get_current_user)
 ):
-    """Exporta um registro específico em formato PDF."""
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import cm
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    """Previsão da próxima troca de toda a frota, da mais próxima para a mais distante."""
+    def calcular():
+        hoje = previsao.dia_de_hoje()
+        previsoes = [previsao.prever(estatistica, hoje) for estatistica in database.listar_estatisticas_km()]
+        if dias is not None:
+            previsoes = [p for p in previsoes if p["dias_restantes"] is not None and p["dias_restantes"] <= dias]
+        # Sem previsão (histórico insuficiente) vai para o fim
+        previsoes.sort(key=lambda p: (p["dias_restantes"] is None, p["dias_restantes"] or 0, p["placa"]))
+        return previsoes, None
 
-    registro = database.obter_registro(registro_id)
-    if not registro:
+    return await responder_listagem("previsoes", (dias,), calcular)
+
+
+@app.get("/api/veiculos/{veiculo_id}/previsao")
+async def obter_previsao_veiculo(
+    veiculo_id: int,
+    authenticated: bool = Depends(get_current_user)
+):
+    """Previsão da próxima troca de um veículo."""
+    veiculo = database.obter_veiculo(veiculo_id)
+    if not veiculo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Registro não encontrado"
+            detail="Veículo não encontrado"
         )
 
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=1.5*cm, leftMargin=1.5*cm, topMargin=1.5*cm, bottomMargin=1.5*cm)
+    estatisticas = database.listar_estatisticas_km(veiculo["placa"])
+    if not estatisticas:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Veículo sem registros de quilometragem"
+        )
+    return previsao.prever(estatisticas[0])
 
-    styles = getSampleStyleSheet()
-    titulo_style = ParagraphStyle(
-        'TituloRelatorio',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=20,
-        alignment=1
-    )
-    subtitulo_style = ParagraphStyle(
-        'Subtitulo',
-        parent=styles['Heading2'],
-        fontSize=12,
-        spaceAfter=10
-    )
 
-    elements = []
-
-    # Título
-    elements.append(Paragraph(registro['titulo'], titulo_style))
-    elements.append(Paragraph(f"Gerado em: {date.today().strftime('%d/%m/%Y')}", styles['Normal']))
-    elements.append(Spacer(1, 20))
-
-    # Dados principais
-    data = []
-    if registro['quilometragem']:
-        km = f"{registro['quilometragem']:,}".replace(',', '.')
-        data.append(['Quilometragem', f"{km} km"])
-    if registro['proxima_troca']:
-        proxima = f"{registro['proxima_troca']:,}".replace(',', '.')
-        data.append(['Próxima Troca', f"{proxima} km"])
-    if registro['data_proxima_troca']:
-        data.append(['Data Próxima Troca', formatar_data_br(registro['data_proxima_troca'])])
-    data.append(['Filtro Trocado', 'Sim' if registro['filtro_trocado'] else 'Não'])
-    data.append(['Criado em', formatar_data_hora_br(registro['criado_em'])])
-
-    if data:
-        table = Table(data, colWidths=[6*cm, 10*cm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#2c3e50')),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-            ('BACKGROUND', (1, 0), (1, -1), colors.HexColor('#ecf0f1')),
-            ('TEXTCOLOR', (1, 0), (1, -1), colors.black),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#bdc3c7')),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('PADDING', (0, 0), (-1, -1), 8),
-        ]))
-        elements.append(table)
-
-    # Campos adicionais
-    if registro['dados'] and len(registro['dados']) > 0:
-        elements.append(Spacer(1, 20))
-        elements.append(Paragraph("Informações Adicionais", subtitulo_style))
-        dados_extras = [[k, v] for k, v in registro['dados'].items()]
-        if dados_extras:
-            table_extras = Table(dados_extras, colWidths=[6*cm, 10*cm])
-            table_extras.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#34495e')),
-                ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-                ('BACKGROUND', (1, 0), (1, -1), colors.HexColor('#ecf0f1')),
-                ('TEXTCOLOR', (1, 0), (1, -1), colors.black),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#bdc3c7')),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('PADDING', (0, 0), (-1, -1), 8),
-            ]))
-            elements.append(table_extras)
-
-    doc.build(elements)
-    buffer.seek(0)
-
-    nome_arquivo = f"registro_{registro_id}.pdf"
+# ============ ROTAS DE NOTIFICAÇÕES ============
+
+@app.get("/api/notificacoes")
+async def listar_notificacoes(
+    desde: int = 0,
+    limite: int = Query(100, ge=1, le=500),
+    authenticated: bool = Depends(get_current_user)
+):
+    """Avisos de troca próxima/vencida com ID maior que `desde`."""
+    return database.listar_notificacoes(desde=desde, limite=limite)
+
+
+@app.get("/api/notificacoes/stream")
+async def stream_notificacoes(
+    request: Request,
+    desde: Optional[int] = None,
+    payload: dict = Depends(get_current_user_stream)
+):
+    """
+    Stream SSE dos avisos de troca (token em ?token=). O navegador reconecta
+    sozinho enviando Last-Event-ID; a conexão termina quando o token expira.
+    """
+    ultimo_evento = request.headers.get("last-event-id", "")
+    if ultimo_evento.isdigit():
+        desde = int(ultimo_evento)
     return StreamingResponse(
-        buffer,
+        notificacoes.stream(desde, payload["exp"] - time.time()),
+        media_type="text/event-stream",
+        # Sem cache e sem buffer em proxies (nginx), para os eventos chegarem na hora
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ============ ROTAS DE EXPORTAÇÃO ============
+
+def responder_pdf(pdf: bytes, nome_arquivo: str) -> Response:
+    return Response(
+        pdf,
         media_type="application/pdf",
         headers={"Content-Disposition": f"attachment; filename={nome_arquivo}"}
     )
 
 
+@app.get("/api/registros/{registro_id}/pdf")
+async def exportar_pdf_registro(
+    registro_id: int,
+    authenticated: bool = Depends(get_current_user)
+):
+    """Exporta um registro específico em formato PDF."""
+    def gerar():
+        import relatorios
+
+        registro = database.obter_registro(registro_id, incluir_arquivados=True)
+        return relatorios.pdf_registro(registro) if registro else None
+
+    # Requisições simultâneas do mesmo registro geram o PDF uma vez só
+    pdf = await coalescencia.executar("pdf_registro", (registro_id,), gerar)
+    if pdf is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Registro não encontrado"
+        )
+
+    return responder_pdf(pdf, f"registro_{registro_id}.pdf")
+
+
 @app.get("/api/exportar/pdf")
 async def exportar_pdf(authenticated: bool = Depends(get_current_user)):
     """Exporta todos os registros em formato PDF."""
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import cm
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-
-    registros = database.listar_historico()
-
-    # Criar PDF em memória
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=1.5*cm, leftMargin=1.5*cm, topMargin=1.5*cm, bottomMargin=1.5*cm)
-
-    # Estilos
-    styles = getSampleStyleSheet()
-    titulo_style = ParagraphStyle(
-        'TituloRelatorio',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=20,
-        alignment=1  # Centralizado
-    )
+    def gerar():
+        import relatorios
 
-    elements = []
-
-    # Título do relatório
-    elements.append(Paragraph("Relatório de Manutenções", titulo_style))
-    elements.append(Paragraph(f"Gerado em: {date.today().strftime('%d/%m/%Y')}", styles['Normal']))
-    elements.append(Spacer(1, 20))
-
-    if registros:
-        # Cabeçalho da tabela
-        data = [['Título', 'KM', 'Próx. Troca', 'Filtro', 'Data']]
-
-        # Dados
-        for r in registros:
-            km = f"{r['quilometragem']:,}".replace(',', '.') if r['quilometragem'] else '-'
-            proxima = f"{r['proxima_troca']:,}".replace(',', '.') if r['proxima_troca'] else '-'
-            filtro = 'Sim' if r['filtro_trocado'] else 'Não'
-            data_criacao = formatar_data_br(r['criado_em'])
-
-            data.append([
-                r['titulo'][:30] + '...' if len(r['titulo']) > 30 else r['titulo'],
-                km,
-                proxima,
-                filtro,
-                data_criacao
-            ])
-
-        # Criar tabela
-        table = Table(data, colWidths=[7*cm, 2.5*cm, 2.5*cm, 1.5*cm, 2.5*cm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ecf0f1')),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#bdc3c7')),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#ecf0f1')])
-        ]))
-
-        elements.append(table)
-        elements.append(Spacer(1, 20))
-        elements.append(Paragraph(f"Total de registros: {len(registros)}", styles['Normal']))
-    else:
-        elements.append(Paragraph("Nenhum registro encontrado.", styles['Normal']))
+        return relatorios.pdf_registros(database.listar_historico())
 
-    doc.build(elements)
-    buffer.seek(0)
+    # Requisições simultâneas compartilham a mesma leitura e a mesma renderização
+    pdf = await coalescencia.executar("pdf_todos", (), gerar)
 
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": "attachment; filename=registros.pdf"}
-    )
+    return responder_pdf(pdf, "registros.pdf")
+
+
+@app.post("/api/relatorios/registros")
+async def relatorio_registros(
+    pedido: RelatorioRegistros,
+    authenticated: bool = Depends(get_current_user)
+):
+    """
+    Relatório consolidado em PDF dos registros escolhidos (inclusive
+    arquivados): tabela-resumo e cada registro com as miniaturas dos anexos.
+    """
+    ids = tuple(sorted(set(pedido.ids)))
+
+    def gerar():
+        import relatorios
+
+        registros = database.obter_registros(list(ids))
+        if not registros:
+            return None
+        anexos = database.listar_anexos_de_registros([registro["id"] for registro in registros])
+        return relatorios.pdf_consolidado("Relatório de Manutenções", registros, anexos, "registros")
+
+    pdf = await coalescencia.executar("pdf_relatorio_registros", ids, gerar)
+    if pdf is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nenhum registro encontrado"
+        )
+    return responder_pdf(pdf, "relatorio.pdf")
+
+
+@app.get("/api/veiculos/{veiculo_id}/relatorio")
+async def relatorio_veiculo(
+    veiculo_id: int,
+    authenticated: bool = Depends(get_current_user)
+):
+    """Histórico completo do veículo (inclusive arquivado) em um PDF consolidado."""
+    def gerar():
+        import relatorios
+
+        veiculo = database.obter_veiculo(veiculo_id)
+        if not veiculo:
+            return None
+        registros = database.listar_registros_da_placa(veiculo["placa"])
+        anexos = database.listar_anexos_de_registros([registro["id"] for registro in registros])
+        titulo = f"Histórico do veículo {veiculo['modelo']} - {veiculo['placa']}"
+        return relatorios.pdf_consolidado(titulo, registros, anexos, "veiculo")
+
+    pdf = await coalescencia.executar("pdf_relatorio_veiculo", (veiculo_id,), gerar)
+    if pdf is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Veículo não encontrado"
+        )
+    return responder_pdf(pdf, f"veiculo_{veiculo_id}.pdf")
+
+
+profiler.marcar_inicializacao("importacao")
 
 
 # ============ EXECUÇÃO ============
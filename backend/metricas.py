@@ -0,0 +1,216 @@
+"""
+Módulo de métricas - contadores, gauges e histogramas em formato Prometheus
+
+Cada worker mantém suas métricas em memória e grava periodicamente um
+snapshot em METRICAS_DIR/<pid>.json; o endpoint /metrics soma os snapshots
+de todos os workers vivos, então qualquer worker responde pelo conjunto.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Snapshots dos workers: dados de execução, fora da árvore do projeto. Por padrão
+# em uma pasta temporária própria desta instalação (o hash do caminho separa
+# duas cópias da aplicação na mesma máquina)
+_PASTA_PADRAO = Path(tempfile.gettempdir()) / (
+    "metricas-" + hashlib.sha1(str(Path(__file__).resolve().parent).encode()).hexdigest()[:12]
+)
+METRICAS_DIR = Path(os.getenv("METRICAS_DIR") or os.getenv("PROMETHEUS_MULTIPROC_DIR") or _PASTA_PADRAO)
+METRICAS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Consultas mais lentas que isso (ms) são registradas no log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Intervalo mínimo entre gravações do snapshot do worker
+INTERVALO_SNAPSHOT_SEGUNDOS = 5
+
+BUCKETS_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+logger_lentas = logging.getLogger("metricas.consultas_lentas")
+
+_lock = threading.Lock()
+_tipos: dict[str, str] = {}
+_contadores: dict[str, float] = {}
+_gauges: dict[str, float] = {}
+_histogramas: dict[str, dict] = {}
+_ultimo_snapshot = 0.0
+
+
+def _escapar(valor) -> str:
+    """Escapa um valor de label conforme o formato texto do Prometheus."""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _chave(nome: str, labels: dict) -> str:
+    """Monta a chave 'nome<NUL>a="x",b="y"' usada nos dicionários e snapshots."""
+    texto = ",".join(f'{k}="{_escapar(v)}"' for k, v in sorted(labels.items()))
+    return f"{nome}\0{texto}"
+
+
+def incrementar(nome: str, valor: float = 1, **labels):
+    """Incrementa um contador."""
+    chave = _chave(nome, labels)
+    with _lock:
+        _tipos[nome] = "counter"
+        _contadores[chave] = _contadores.get(chave, 0) + valor
+
+
+def ajustar_gauge(nome: str, delta: float, **labels):
+    """Soma delta a um gauge (ex.: +1 ao iniciar uma requisição, -1 ao terminar)."""
+    chave = _chave(nome, labels)
+    with _lock:
+        _tipos[nome] = "gauge"
+        _gauges[chave] = _gauges.get(chave, 0) + delta
+
+
+def observar(nome: str, valor: float, buckets: tuple = BUCKETS_SEGUNDOS, **labels):
+    """Registra uma observação em um histograma."""
+    chave = _chave(nome, labels)
+    with _lock:
+        _tipos[nome] = "histogram"
+        hist = _histogramas.get(chave)
+        if hist is None:
+            hist = {"buckets": list(buckets), "contagens": [0] * len(buckets), "soma": 0.0, "contagem": 0}
+            _histogramas[chave] = hist
+        for i, limite in enumerate(hist["buckets"]):
+            if valor <= limite:
+                hist["contagens"][i] += 1
+        hist["soma"] += valor
+        hist["contagem"] += 1
+
+
+@contextmanager
+def cronometro(nome: str, **labels):
+    """Mede a duração do bloco em segundos e registra no histograma."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nome, time.perf_counter() - inicio, **labels)
+
+
+def medir_consulta(funcao):
+    """Decorator para funções do database.py: mede a duração e registra consultas lentas."""
+    nome = funcao.__name__
+
+    @functools.wraps(funcao)
+    def wrapper(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            duracao = time.perf_counter() - inicio
+            observar("db_consulta_segundos", duracao, consulta=nome)
+            if duracao * 1000 >= SLOW_QUERY_MS:
+                logger_lentas.warning("Consulta lenta: %s levou %.1f ms", nome, duracao * 1000)
+
+    return wrapper
+
+
+# ============ AGREGAÇÃO ENTRE WORKERS ============
+
+def gravar_snapshot(forcar: bool = False):
+    """Grava o snapshot deste worker (no máximo a cada INTERVALO_SNAPSHOT_SEGUNDOS)."""
+    global _ultimo_snapshot
+    agora = time.monotonic()
+    if not forcar and agora - _ultimo_snapshot < INTERVALO_SNAPSHOT_SEGUNDOS:
+        return
+    _ultimo_snapshot = agora
+
+    with _lock:
+        snapshot = json.dumps({
+            "tipos": _tipos,
+            "contadores": _contadores,
+            "gauges": _gauges,
+            "histogramas": _histogramas
+        })
+
+    destino = METRICAS_DIR / f"{os.getpid()}.json"
+    temporario = destino.with_suffix(".tmp")
+    temporario.write_text(snapshot)
+    os.replace(temporario, destino)
+
+
+def _processo_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _agregar() -> dict:
+    """Soma os snapshots de todos os workers vivos (remove os de processos encerrados)."""
+    total = {"tipos": {}, "contadores": {}, "gauges": {}, "histogramas": {}}
+
+    for arquivo in METRICAS_DIR.glob("*.json"):
+        if not arquivo.stem.isdigit() or not _processo_vivo(int(arquivo.stem)):
+            arquivo.unlink(missing_ok=True)
+            continue
+        try:
+            snapshot = json.loads(arquivo.read_text())
+        except (OSError, ValueError):
+            continue
+
+        total["tipos"].update(snapshot["tipos"])
+        for secao in ("contadores", "gauges"):
+            for chave, valor in snapshot[secao].items():
+                total[secao][chave] = total[secao].get(chave, 0) + valor
+        for chave, hist in snapshot["histogramas"].items():
+            acumulado = total["histogramas"].get(chave)
+            if acumulado is None:
+                total["histogramas"][chave] = {
+                    "buckets": hist["buckets"],
+                    "contagens": list(hist["contagens"]),
+                    "soma": hist["soma"],
+                    "contagem": hist["contagem"]
+                }
+            else:
+                acumulado["contagens"] = [a + b for a, b in zip(acumulado["contagens"], hist["contagens"])]
+                acumulado["soma"] += hist["soma"]
+                acumulado["contagem"] += hist["contagem"]
+
+    return total
+
+
+def _linha(nome: str, labels: str, valor: float) -> str:
+    return f"{nome}{{{labels}}} {valor}" if labels else f"{nome} {valor}"
+
+
+def exportar_prometheus() -> str:
+    """Retorna as métricas agregadas de todos os workers no formato texto do Prometheus."""
+    gravar_snapshot(forcar=True)
+    total = _agregar()
+
+    por_nome: dict[str, list[str]] = {}
+    for secao in ("contadores", "gauges"):
+        for chave, valor in sorted(total[secao].items()):
+            nome, labels = chave.split("\0", 1)
+            por_nome.setdefault(nome, []).append(_linha(nome, labels, valor))
+
+    for chave, hist in sorted(total["histogramas"].items()):
+        nome, labels = chave.split("\0", 1)
+        linhas = por_nome.setdefault(nome, [])
+        prefixo = f"{labels}," if labels else ""
+        # Os buckets já são cumulativos (cada observação conta em todos os limites >= valor)
+        for limite, contagem in zip(hist["buckets"], hist["contagens"]):
+            linhas.append(_linha(f"{nome}_bucket", f'{prefixo}le="{limite}"', contagem))
+        linhas.append(_linha(f"{nome}_bucket", f'{prefixo}le="+Inf"', hist["contagem"]))
+        linhas.append(_linha(f"{nome}_sum", labels, hist["soma"]))
+        linhas.append(_linha(f"{nome}_count", labels, hist["contagem"]))
+
+    saida = []
+    for nome in sorted(por_nome):
+        saida.append(f"# TYPE {nome} {total['tipos'].get(nome, 'untyped')}")
+        saida.extend(por_nome[nome])
+    return "\n".join(saida) + "\n"
@@ -0,0 +1,186 @@
+"""
+Módulo de notificações - avisos de trocas próximas e vencidas
+
+A tarefa periódica verificar_manutencoes (ver tarefas.py) procura, por
+índice, as trocas cuja data_proxima_troca está na janela de aviso e que
+ainda não foram avisadas, e grava um aviso por registro, tipo ("proxima" ou
+"vencida") e data; a tabela notificacoes impede que o mesmo aviso se repita. Cada
+execução trata no máximo NOTIFICACOES_LOTE avisos, então uma frota grande
+não gera picos: o restante fica para a próxima.
+
+Os avisos novos são entregues pelos canais configurados, cada entrega como
+uma tarefa da fila (com retentativas):
+  - "email": SMTP (em desenvolvimento, um servidor local como
+    `python -m aiosmtpd -n -l localhost:1025`);
+  - "webhook": POST JSON em NOTIFICACOES_WEBHOOK_URL;
+além do stream SSE /api/notificacoes/stream, que o frontend assina sempre.
+
+Com inquilinos (ver inquilinos.py), cada um recebe os e-mails no
+email_avisos do seu cadastro, e o webhook informa o inquilino no corpo.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+from datetime import date, timedelta
+from typing import Callable, Optional
+
+import database
+import eventos
+import inquilinos
+
+NOTIFICACOES_INTERVALO_SEGUNDOS = float(os.getenv("NOTIFICACOES_INTERVALO_SEGUNDOS", "900"))
+# Avisar quantos dias antes da data da próxima troca
+NOTIFICACOES_ANTECEDENCIA_DIAS = int(os.getenv("NOTIFICACOES_ANTECEDENCIA_DIAS", "7"))
+# Trocas vencidas há mais que isso não geram aviso novo
+NOTIFICACOES_JANELA_VENCIDAS_DIAS = 30
+# Avisos gravados por execução (o restante fica para a próxima)
+NOTIFICACOES_LOTE = 500
+# Canais de entrega além do SSE: "email", "webhook" (separados por vírgula)
+NOTIFICACOES_CANAIS = [c.strip() for c in os.getenv("NOTIFICACOES_CANAIS", "").split(",") if c.strip()]
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORTA = int(os.getenv("SMTP_PORTA", "1025"))
+SMTP_USUARIO = os.getenv("SMTP_USUARIO", "")
+SMTP_SENHA = os.getenv("SMTP_SENHA", "")
+SMTP_REMETENTE = os.getenv("SMTP_REMETENTE", "manutencoes@localhost")
+NOTIFICACOES_EMAIL_PARA = os.getenv("NOTIFICACOES_EMAIL_PARA", "")
+
+NOTIFICACOES_WEBHOOK_URL = os.getenv("NOTIFICACOES_WEBHOOK_URL", "")
+# Se definido, o corpo vai assinado no header X-Assinatura (HMAC-SHA256)
+NOTIFICACOES_WEBHOOK_SEGREDO = os.getenv("NOTIFICACOES_WEBHOOK_SEGREDO", "")
+
+# Frequência com que cada worker consulta avisos novos para o SSE
+SSE_INTERVALO_SEGUNDOS = 5
+
+logger = logging.getLogger("notificacoes")
+
+_canais: dict[str, Callable[[dict], None]] = {}
+
+
+def canal(nome: str):
+    """Registra a função que entrega uma notificação por um canal."""
+    def decorator(funcao):
+        _canais[nome] = funcao
+        return funcao
+    return decorator
+
+
+def _email_destino() -> Optional[str]:
+    """Destinatário dos e-mails do inquilino atual."""
+    inquilino = inquilinos.atual()
+    if inquilino is None:
+        return NOTIFICACOES_EMAIL_PARA
+    cadastro = database.obter_inquilino(inquilino)
+    return cadastro["email_avisos"] if cadastro else None
+
+
+def _formatar_data(data_iso: str) -> str:
+    return date.fromisoformat(data_iso[:10]).strftime("%d/%m/%Y")
+
+
+def _mensagem(troca: dict) -> str:
+    quando = _formatar_data(troca["data_proxima_troca"])
+    km = f" ou aos {troca['proxima_troca']:,} km".replace(",", ".") if troca["proxima_troca"] else ""
+    if troca["tipo"] == "vencida":
+        return f"Troca de óleo de {troca['titulo']} vencida desde {quando}{km}."
+    return f"Troca de óleo de {troca['titulo']} prevista para {quando}{km}."
+
+
+# ============ VERIFICAÇÃO ============
+
+def verificar_manutencoes(hoje: Optional[date] = None) -> int:
+    """Grava os avisos novos e enfileira suas entregas. Retorna quantos avisos foram criados."""
+    hoje = hoje or date.today()
+    trocas = database.listar_trocas_a_vencer(
+        hoje=hoje.isoformat(),
+        inicio=(hoje - timedelta(days=NOTIFICACOES_JANELA_VENCIDAS_DIAS)).isoformat(),
+        fim=(hoje + timedelta(days=NOTIFICACOES_ANTECEDENCIA_DIAS)).isoformat(),
+        limite=NOTIFICACOES_LOTE
+    )
+    avisos = [
+        {
+            "registro_id": troca["id"],
+            "tipo": troca["tipo"],
+            "titulo": troca["titulo"],
+            "mensagem": _mensagem(troca),
+            "data_proxima_troca": troca["data_proxima_troca"],
+        }
+        for troca in trocas
+    ]
+    canais = [nome for nome in NOTIFICACOES_CANAIS if nome in _canais]
+    if "email" in canais and inquilinos.atual() is not None and not _email_destino():
+        # Inquilino sem e-mail cadastrado: só os demais canais
+        canais.remove("email")
+    novos = database.criar_notificacoes(avisos, canais) if avisos else 0
+    if novos:
+        logger.info("%d aviso(s) de troca criado(s)", novos)
+    return novos
+
+
+def entregar(notificacao_id: int, nome_canal: str):
+    """Entrega uma notificação por um canal (erros sobem para a fila tentar de novo)."""
+    notificacao = database.obter_notificacao(notificacao_id)
+    if notificacao is None:
+        return
+    _canais[nome_canal](notificacao)
+
+
+# ============ CANAIS ============
+
+@canal("email")
+def enviar_email(notificacao: dict):
+    # Importados só quando o canal é usado: não pesam na inicialização dos workers
+    import smtplib
+    from email.message import EmailMessage
+
+    destino = _email_destino()
+    if not destino:
+        raise RuntimeError("Canal email requer NOTIFICACOES_EMAIL_PARA")
+
+    mensagem = EmailMessage()
+    mensagem["Subject"] = ("Troca vencida: " if notificacao["tipo"] == "vencida" else "Troca próxima: ") + notificacao["titulo"]
+    mensagem["From"] = SMTP_REMETENTE
+    mensagem["To"] = destino
+    mensagem.set_content(notificacao["mensagem"])
+
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORTA, timeout=10) as smtp:
+        if SMTP_USUARIO:
+            smtp.starttls()
+            smtp.login(SMTP_USUARIO, SMTP_SENHA)
+        smtp.send_message(mensagem)
+
+
+@canal("webhook")
+def enviar_webhook(notificacao: dict):
+    import urllib.request
+
+    if not NOTIFICACOES_WEBHOOK_URL:
+        raise RuntimeError("Canal webhook requer NOTIFICACOES_WEBHOOK_URL")
+
+    corpo = json.dumps({**notificacao, "inquilino": inquilinos.atual()}, ensure_ascii=False).encode()
+    headers = {"Content-Type": "application/json"}
+    if NOTIFICACOES_WEBHOOK_SEGREDO:
+        assinatura = hmac.new(NOTIFICACOES_WEBHOOK_SEGREDO.encode(), corpo, hashlib.sha256).hexdigest()
+        headers["X-Assinatura"] = f"sha256={assinatura}"
+
+    requisicao = urllib.request.Request(NOTIFICACOES_WEBHOOK_URL, data=corpo, headers=headers, method="POST")
+    # Respostas 4xx/5xx levantam HTTPError
+    with urllib.request.urlopen(requisicao, timeout=10):
+        pass
+
+
+# ============ SSE ============
+
+def _buscar_novas(desde: int) -> list[tuple[int, dict]]:
+    return [(notificacao["id"], notificacao) for notificacao in database.listar_notificacoes(desde)]
+
+
+_transmissores = eventos.Transmissores(database.obter_ultima_notificacao_id, _buscar_novas, SSE_INTERVALO_SEGUNDOS)
+
+
+def stream(desde: Optional[int], duracao: float):
+    """Stream SSE dos avisos (ver eventos.stream)."""
+    return eventos.stream(_transmissores.obter(), "notificacao", desde, duracao, _buscar_novas)
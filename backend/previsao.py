@@ -0,0 +1,86 @@
+"""
+Módulo de previsão - estima quando cada veículo chega à quilometragem da próxima troca
+
+Cada registro com quilometragem é um ponto (dia, km) do veículo cuja placa
+está no título ("Modelo - PLACA", como o frontend monta). A taxa de km/dia
+é a inclinação da reta de mínimos quadrados desses pontos.
+
+A reta sai de cinco somas por placa (pontos, Σt, Σkm, Σt², Σt·km) que o
+database.py mantém na tabela estatisticas_km, na mesma transação de cada
+escrita: incluir, alterar ou excluir um registro só soma ou subtrai o seu
+ponto, sem reler o histórico. A inclinação da frota inteira é calculada em
+uma única consulta sobre essa tabela (uma linha por veículo).
+"""
+
+from datetime import date, datetime, timezone
+from typing import Optional
+
+SEGUNDOS_POR_DIA = 86400
+# As datas dos pontos precisam variar pelo menos isso (desvio padrão, em dias);
+# registros todos do mesmo dia não dizem nada sobre o ritmo de uso
+DESVIO_MINIMO_DIAS = 1.0
+
+_EPOCA = datetime(1970, 1, 1)
+_ORDINAL_EPOCA = _EPOCA.toordinal()
+
+
+def placa_do_titulo(titulo: Optional[str]) -> Optional[str]:
+    """Extrai a placa de um título "Modelo - PLACA" (None se não tiver esse formato)."""
+    if not titulo:
+        return None
+    _, separador, placa = titulo.rpartition(" - ")
+    placa = placa.strip().upper()
+    return placa if separador and placa else None
+
+
+def dia_do_timestamp(timestamp: str) -> float:
+    """Converte "YYYY-MM-DD HH:MM:SS" (UTC, formato do banco) em dias desde 1970."""
+    momento = datetime.fromisoformat(timestamp[:19])
+    return (momento - _EPOCA).total_seconds() / SEGUNDOS_POR_DIA
+
+
+def dia_de_hoje() -> float:
+    """Momento atual em dias desde 1970 (mesma escala de dia_do_timestamp)."""
+    return datetime.now(timezone.utc).timestamp() / SEGUNDOS_POR_DIA
+
+
+def _data(dia: float) -> str:
+    return date.fromordinal(_ORDINAL_EPOCA + int(dia)).isoformat()
+
+
+def prever(estatistica: dict, hoje: Optional[float] = None) -> dict:
+    """
+    Monta a previsão de um veículo a partir da sua linha de estatisticas_km
+    (com km_por_dia já calculado na consulta, ou None se não houver histórico
+    suficiente).
+    """
+    hoje = dia_de_hoje() if hoje is None else hoje
+    taxa = estatistica["km_por_dia"]
+    ultima_km = estatistica["ultima_quilometragem"]
+    proxima_troca = estatistica["proxima_troca"]
+
+    previsao = {
+        "placa": estatistica["placa"],
+        "veiculo_id": estatistica["veiculo_id"],
+        "modelo": estatistica["modelo"],
+        "registro_id": estatistica["ultimo_registro_id"],
+        "pontos": estatistica["pontos"],
+        "ultima_quilometragem": ultima_km,
+        "data_ultima_quilometragem": _data(estatistica["ultimo_dia"]),
+        "proxima_troca": proxima_troca,
+        "data_proxima_troca": estatistica["data_proxima_troca"],
+        "km_por_dia": None,
+        "quilometragem_estimada": None,
+        "data_prevista": None,
+        "dias_restantes": None,
+    }
+    if taxa is None or taxa <= 0:
+        return previsao
+
+    previsao["km_por_dia"] = round(taxa, 1)
+    previsao["quilometragem_estimada"] = round(ultima_km + taxa * max(hoje - estatistica["ultimo_dia"], 0))
+    if proxima_troca is not None:
+        dia_previsto = estatistica["ultimo_dia"] + (proxima_troca - ultima_km) / taxa
+        previsao["data_prevista"] = _data(dia_previsto)
+        previsao["dias_restantes"] = int(dia_previsto) - int(hoje)
+    return previsao
@@ -0,0 +1,192 @@
+"""
+Módulo de profiling - amostragem estatística de pilhas em produção
+
+Uma thread amostra periodicamente as pilhas das demais threads do worker
+(sys._current_frames) e acumula as contagens no formato "collapsed stacks"
+(func1;func2;func3 N), aceito por flamegraph.pl, speedscope e similares.
+Nada roda enquanto não há perfil em andamento.
+
+Também mede a inicialização: cada worker registra quanto tempo levou, desde
+o início do servidor, para importar a aplicação, preparar o banco, ficar
+pronto e dar a primeira resposta (GET /api/admin/inicializacao e log), e
+`python profiler.py inicializacao` detalha o tempo de importação por pacote.
+"""
+
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+INTERVALO_PADRAO = 0.005
+DURACAO_MAXIMA_SEGUNDOS = 60
+
+# Perfil de uma única requisição via header X-Profile (desligado por padrão)
+PROFILER_POR_REQUISICAO = os.getenv("PROFILER_POR_REQUISICAO", "0") == "1"
+
+# Amostras cuja função do topo está nestes módulos são threads ociosas
+_MODULOS_OCIOSOS = ("threading.py", "queue.py", "selectors.py")
+
+_lock_perfil = threading.Lock()
+
+logger = logging.getLogger("profiler")
+
+
+def _colapsar(frame) -> Optional[str]:
+    """Converte um frame em "arquivo:func;arquivo:func" (raiz primeiro) ou None se ocioso."""
+    if frame.f_code.co_filename.endswith(_MODULOS_OCIOSOS):
+        return None
+    pilha = []
+    while frame is not None:
+        codigo = frame.f_code
+        pilha.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(pilha))
+
+
+class Amostrador:
+    """Amostra as pilhas das threads do processo (ou de uma thread específica) em segundo plano."""
+
+    def __init__(
+        self,
+        intervalo: float = INTERVALO_PADRAO,
+        thread_alvo: Optional[int] = None,
+        ignorar: frozenset = frozenset()
+    ):
+        self.intervalo = intervalo
+        self.thread_alvo = thread_alvo
+        self.ignorar = ignorar
+        self.contagens: Counter = Counter()
+        self.amostras = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="amostrador", daemon=True)
+
+    def _executar(self):
+        proprio = threading.get_ident()
+        while not self._parar.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == proprio or ident in self.ignorar:
+                    continue
+                if self.thread_alvo is not None and ident != self.thread_alvo:
+                    continue
+                pilha = _colapsar(frame)
+                if pilha:
+                    self.contagens[pilha] += 1
+            self.amostras += 1
+            self._parar.wait(self.intervalo)
+
+    def iniciar(self) -> "Amostrador":
+        self._thread.start()
+        return self
+
+    def parar(self) -> str:
+        """Encerra a amostragem e retorna as pilhas no formato collapsed."""
+        self._parar.set()
+        self._thread.join()
+        return "".join(f"{pilha} {n}\n" for pilha, n in self.contagens.most_common())
+
+
+def perfilar_processo(segundos: float, intervalo: float = INTERVALO_PADRAO) -> Optional[str]:
+    """
+    Amostra todas as threads do worker por alguns segundos (bloqueante).
+
+    Retorna o perfil collapsed, ou None se já houver um perfil em andamento.
+    """
+    if not _lock_perfil.acquire(blocking=False):
+        return None
+    try:
+        # A thread que espera pelo perfil não interessa
+        amostrador = Amostrador(intervalo, ignorar=frozenset({threading.get_ident()})).iniciar()
+        time.sleep(min(segundos, DURACAO_MAXIMA_SEGUNDOS))
+        return amostrador.parar()
+    finally:
+        _lock_perfil.release()
+
+
+def iniciar_perfil_requisicao(intervalo: float = INTERVALO_PADRAO) -> Optional[Amostrador]:
+    """
+    Inicia a amostragem de todas as threads do worker para uma requisição.
+
+    Não só a do event loop: rotas síncronas rodam no threadpool e listagens e
+    PDFs em asyncio.to_thread (coalescencia.executar). Threads ociosas não
+    entram; outras requisições simultâneas no mesmo worker, sim.
+    """
+    if not _lock_perfil.acquire(blocking=False):
+        return None
+    return Amostrador(intervalo).iniciar()
+
+
+def finalizar_perfil_requisicao(amostrador: Amostrador) -> str:
+    """Encerra a amostragem iniciada por iniciar_perfil_requisicao."""
+    try:
+        return amostrador.parar()
+    finally:
+        _lock_perfil.release()
+
+
+# ============ INICIALIZAÇÃO ============
+
+# Definido no início do gunicorn.conf.py (master) ou do main.py
+INICIO_SERVIDOR = float(os.getenv("INICIO_SERVIDOR") or time.time())
+
+# Fases na ordem em que acontecem; as do master são herdadas pelos workers no fork
+FASES_INICIALIZACAO = ("importacao", "banco", "worker_pronto", "primeira_resposta")
+
+_fases: dict[str, float] = {}
+
+# Linha do `python -X importtime`: "import time: self | cumulativo | pacote"
+_RE_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def marcar_inicializacao(fase: str):
+    """Registra (uma vez por processo) em quantos segundos desde o início do servidor a fase terminou."""
+    if fase in _fases:
+        return
+    _fases[fase] = round(time.time() - INICIO_SERVIDOR, 4)
+    if fase == "primeira_resposta":
+        logger.info("Inicialização do worker %d: %s", os.getpid(), ", ".join(
+            f"{nome} {_fases[nome]:.2f}s" for nome in FASES_INICIALIZACAO if nome in _fases
+        ))
+
+
+def relatorio_inicializacao() -> dict:
+    """Segundos desde o início do servidor até o fim de cada fase, neste worker."""
+    return {"pid": os.getpid(), "fases": {nome: _fases.get(nome) for nome in FASES_INICIALIZACAO}}
+
+
+def medir_importacoes(modulo: str = "main", limite: int = 15) -> tuple[float, list[tuple[str, float]]]:
+    """
+    Importa `modulo` em um processo novo com -X importtime e soma o tempo
+    próprio de cada módulo por pacote de topo. Retorna o total (ms) e os
+    `limite` pacotes mais caros, como (pacote, ms).
+    """
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+    )
+    por_pacote: Counter = Counter()
+    total = 0.0
+    for linha in resultado.stderr.splitlines():
+        casamento = _RE_IMPORTTIME.match(linha)
+        if not casamento:
+            continue
+        proprio, cumulativo, recuo, nome = casamento.groups()
+        por_pacote[nome.split(".")[0]] += int(proprio) / 1000
+        if nome == modulo and not recuo:
+            total = int(cumulativo) / 1000
+    return total, por_pacote.most_common(limite)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["inicializacao"]:
+        print("Uso: python profiler.py inicializacao")
+        sys.exit(1)
+    total, pacotes = medir_importacoes()
+    print(f"Importação de main: {total:.0f} ms")
+    for pacote, ms in pacotes:
+        print(f"  {pacote:<28} {ms:8.1f} ms  {ms / total:6.1%}")
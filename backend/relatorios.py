@@ -0,0 +1,331 @@
+"""
+Módulo de relatórios - geração dos PDFs
+
+Os estilos de parágrafo e de tabela são montados uma vez por processo, na
+primeira geração (é também quando o reportlab é importado, fora da partida
+a frio), e reaproveitados por todas as requisições.
+
+Tabelas longas entram no documento em blocos de LINHAS_POR_TABELA linhas
+(com o cabeçalho repetido em cada página): uma tabela única é redividida
+pelo reportlab a cada página, o que deixa a geração quadrática no número de
+linhas (10.000 registros levavam 9 s); em blocos ela é linear.
+
+Cada geração registra no /metrics o tempo (pdf_geracao_segundos) e as
+páginas (pdf_paginas_total), por relatório: a razão entre os dois é a
+vazão em páginas por segundo.
+"""
+
+import functools
+import io
+import logging
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import Optional
+
+import inquilinos
+import metricas
+from armazenamento import obter_armazenamento
+
+logger = logging.getLogger("relatorios")
+
+# Linhas por bloco das tabelas de listagem (cerca de 5 páginas A4)
+LINHAS_POR_TABELA = 200
+# Miniaturas de imagem por registro no relatório consolidado e o lado máximo (px)
+MINIATURAS_POR_REGISTRO = 6
+MINIATURA_LADO_PX = 320
+
+
+def formatar_data_br(data_str: str) -> str:
+    """Formata data YYYY-MM-DD para DD/MM/AAAA."""
+    if not data_str:
+        return '-'
+    try:
+        if 'T' in data_str:
+            dt = datetime.fromisoformat(data_str.replace('Z', '+00:00'))
+            return dt.strftime('%d/%m/%Y')
+        else:
+            dt = datetime.strptime(data_str[:10], '%Y-%m-%d')
+            return dt.strftime('%d/%m/%Y')
+    except:
+        return data_str
+
+
+def formatar_data_hora_br(data_str: str) -> str:
+    """Formata datetime para DD/MM/AAAA HH:MM."""
+    if not data_str:
+        return '-'
+    try:
+        if 'T' in data_str:
+            dt = datetime.fromisoformat(data_str.replace('Z', '+00:00'))
+            return dt.strftime('%d/%m/%Y %H:%M')
+        else:
+            dt = datetime.strptime(data_str[:16], '%Y-%m-%d %H:%M')
+            return dt.strftime('%d/%m/%Y %H:%M')
+    except:
+        return data_str
+
+
+def _formatar_km(km: Optional[int]) -> str:
+    return f"{km:,}".replace(',', '.')
+
+
+# ============ MODELOS ============
+
+@functools.cache
+def _modelos() -> SimpleNamespace:
+    """
+    Classes do reportlab e estilos prontos, criados na primeira chamada. Os
+    estilos só são lidos durante a geração, então podem ser compartilhados
+    entre threads.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import cm
+    from reportlab.platypus import (
+        Image, KeepTogether, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    )
+
+    styles = getSampleStyleSheet()
+
+    def estilo_campos(cor_rotulo: str) -> TableStyle:
+        # Tabela de duas colunas: rótulo escuro à esquerda, valor claro à direita
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(cor_rotulo)),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
+            ('BACKGROUND', (1, 0), (1, -1), colors.HexColor('#ecf0f1')),
+            ('TEXTCOLOR', (1, 0), (1, -1), colors.black),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#bdc3c7')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('PADDING', (0, 0), (-1, -1), 8),
+        ])
+
+    return SimpleNamespace(
+        A4=A4, cm=cm, colors=colors,
+        Image=Image, KeepTogether=KeepTogether, Paragraph=Paragraph,
+        SimpleDocTemplate=SimpleDocTemplate, Spacer=Spacer, Table=Table,
+        normal=styles['Normal'],
+        titulo=ParagraphStyle('TituloRelatorio', parent=styles['Heading1'], fontSize=16, spaceAfter=20, alignment=1),
+        subtitulo=ParagraphStyle('Subtitulo', parent=styles['Heading2'], fontSize=12, spaceAfter=10),
+        legenda=ParagraphStyle('Legenda', parent=styles['Normal'], fontSize=7, leading=8, alignment=1),
+        tabela_campos=estilo_campos('#2c3e50'),
+        tabela_extras=estilo_campos('#34495e'),
+        tabela_lista=TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ecf0f1')),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#bdc3c7')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#ecf0f1')])
+        ]),
+        tabela_miniaturas=TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
+            ('PADDING', (0, 0), (-1, -1), 4),
+        ]),
+    )
+
+
+def _numerar_pagina(canvas, doc):
+    canvas.saveState()
+    canvas.setFont('Helvetica', 8)
+    canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, doc.bottomMargin / 2, f"Página {doc.page}")
+    canvas.restoreState()
+
+
+def _gerar(relatorio: str, elementos: list, numerar: bool = False) -> bytes:
+    """Monta o documento A4 e registra tempo e páginas no /metrics."""
+    m = _modelos()
+    buffer = io.BytesIO()
+    margem = 1.5 * m.cm
+    doc = m.SimpleDocTemplate(
+        buffer, pagesize=m.A4, rightMargin=margem, leftMargin=margem, topMargin=margem, bottomMargin=margem
+    )
+    extras = {"onFirstPage": _numerar_pagina, "onLaterPages": _numerar_pagina} if numerar else {}
+
+    with metricas.cronometro("pdf_geracao_segundos", relatorio=relatorio):
+        doc.build(elementos, **extras)
+    metricas.incrementar("pdf_paginas_total", doc.page, relatorio=relatorio)
+    return buffer.getvalue()
+
+
+# ============ BLOCOS ============
+
+def _cabecalho(titulo: str) -> list:
+    m = _modelos()
+    return [
+        m.Paragraph(titulo, m.titulo),
+        m.Paragraph(f"Gerado em: {date.today().strftime('%d/%m/%Y')}", m.normal),
+        m.Spacer(1, 20),
+    ]
+
+
+def _tabela_campos(registro: dict):
+    m = _modelos()
+    data = []
+    if registro['quilometragem']:
+        data.append(['Quilometragem', f"{_formatar_km(registro['quilometragem'])} km"])
+    if registro['proxima_troca']:
+        data.append(['Próxima Troca', f"{_formatar_km(registro['proxima_troca'])} km"])
+    if registro['data_proxima_troca']:
+        data.append(['Data Próxima Troca', formatar_data_br(registro['data_proxima_troca'])])
+    data.append(['Filtro Trocado', 'Sim' if registro['filtro_trocado'] else 'Não'])
+    data.append(['Criado em', formatar_data_hora_br(registro['criado_em'])])
+    return m.Table(data, colWidths=[6*m.cm, 10*m.cm], style=m.tabela_campos)
+
+
+def _tabela_extras(dados: dict) -> list:
+    m = _modelos()
+    if not dados:
+        return []
+    return [
+        m.Spacer(1, 20),
+        m.Paragraph("Informações Adicionais", m.subtitulo),
+        m.Table([[k, v] for k, v in dados.items()], colWidths=[6*m.cm, 10*m.cm], style=m.tabela_extras),
+    ]
+
+
+def _tabela_lista(registros: list[dict]) -> list:
+    """Tabela-resumo dos registros, em blocos de LINHAS_POR_TABELA (ver docstring do módulo)."""
+    m = _modelos()
+    cabecalho = ['Título', 'KM', 'Próx. Troca', 'Filtro', 'Data']
+    linhas = [
+        [
+            r['titulo'][:30] + '...' if len(r['titulo']) > 30 else r['titulo'],
+            _formatar_km(r['quilometragem']) if r['quilometragem'] else '-',
+            _formatar_km(r['proxima_troca']) if r['proxima_troca'] else '-',
+            'Sim' if r['filtro_trocado'] else 'Não',
+            formatar_data_br(r['criado_em']),
+        ]
+        for r in registros
+    ]
+    return [
+        m.Table(
+            [cabecalho, *linhas[inicio:inicio + LINHAS_POR_TABELA]],
+            colWidths=[7*m.cm, 2.5*m.cm, 2.5*m.cm, 1.5*m.cm, 2.5*m.cm],
+            style=m.tabela_lista,
+            repeatRows=1
+        )
+        for inicio in range(0, len(linhas), LINHAS_POR_TABELA)
+    ]
+
+
+@functools.lru_cache(maxsize=256)
+def _gerar_miniatura(inquilino: Optional[str], nome_arquivo: str) -> tuple[bytes, int, int]:
+    """
+    JPEG reduzido de um anexo de imagem: (conteúdo, largura, altura). Os nomes
+    de arquivo são únicos e os arquivos não mudam, então a miniatura fica em
+    cache (por inquilino, porque o armazenamento é o do inquilino atual).
+    Falhas levantam exceção e, assim, não entram no cache.
+    """
+    from PIL import Image
+
+    conteudo = obter_armazenamento().ler(nome_arquivo)
+    if conteudo is None:
+        raise FileNotFoundError(nome_arquivo)
+    with Image.open(io.BytesIO(conteudo)) as imagem:
+        # Em JPEG, decodifica já reduzido (bem mais rápido que decodificar inteiro e reduzir)
+        imagem.draft("RGB", (MINIATURA_LADO_PX, MINIATURA_LADO_PX))
+        imagem.thumbnail((MINIATURA_LADO_PX, MINIATURA_LADO_PX))
+        saida = io.BytesIO()
+        imagem.convert("RGB").save(saida, "JPEG", quality=75)
+        return saida.getvalue(), imagem.width, imagem.height
+
+
+def _miniatura(inquilino: Optional[str], nome_arquivo: str) -> Optional[tuple[bytes, int, int]]:
+    """Miniatura do anexo, ou None se não for possível lê-lo (tenta de novo no próximo relatório)."""
+    try:
+        return _gerar_miniatura(inquilino, nome_arquivo)
+    except Exception:
+        logger.warning("Miniatura indisponível para %s", nome_arquivo, exc_info=True)
+        return None
+
+
+def _anexos(anexos: list[dict]) -> list:
+    """Miniaturas dos anexos de imagem (3 por linha) e os nomes dos demais."""
+    m = _modelos()
+    lado = 5 * m.cm
+    celulas = []
+    outros = []
+    for anexo in anexos:
+        miniatura = None
+        if (anexo['tipo'] or '').startswith('image/') and len(celulas) < MINIATURAS_POR_REGISTRO:
+            miniatura = _miniatura(inquilinos.atual(), anexo['nome_arquivo'])
+        if miniatura is None:
+            outros.append(anexo['nome_original'])
+            continue
+        conteudo, largura, altura = miniatura
+        escala = lado / max(largura, altura)
+        celulas.append([
+            m.Image(io.BytesIO(conteudo), width=largura * escala, height=altura * escala),
+            m.Paragraph(anexo['nome_original'], m.legenda),
+        ])
+
+    elementos = []
+    if celulas:
+        linhas = [celulas[inicio:inicio + 3] for inicio in range(0, len(celulas), 3)]
+        linhas[-1] += [''] * (3 - len(linhas[-1]))
+        elementos += [m.Spacer(1, 10), m.Table(linhas, colWidths=[lado + 0.5*m.cm] * 3, style=m.tabela_miniaturas)]
+    if outros:
+        elementos += [m.Spacer(1, 6), m.Paragraph(f"Anexos: {', '.join(outros)}", m.normal)]
+    return elementos
+
+
+# ============ RELATÓRIOS ============
+
+def pdf_registro(registro: dict) -> bytes:
+    """Gera o PDF de um registro."""
+    return _gerar("registro", [
+        *_cabecalho(registro['titulo']),
+        _tabela_campos(registro),
+        *_tabela_extras(registro['dados']),
+    ])
+
+
+def pdf_registros(registros: list[dict]) -> bytes:
+    """Gera o relatório em PDF com todos os registros."""
+    m = _modelos()
+    elementos = _cabecalho("Relatório de Manutenções")
+    if registros:
+        elementos += _tabela_lista(registros)
+        elementos += [m.Spacer(1, 20), m.Paragraph(f"Total de registros: {len(registros)}", m.normal)]
+    else:
+        elementos.append(m.Paragraph("Nenhum registro encontrado.", m.normal))
+    return _gerar("todos", elementos)
+
+
+def pdf_consolidado(titulo: str, registros: list[dict], anexos: dict[int, list[dict]], relatorio: str) -> bytes:
+    """
+    Relatório consolidado: a tabela-resumo dos registros e depois cada um
+    deles com os campos, as informações adicionais e as miniaturas dos
+    anexos de imagem (`anexos`: registro_id -> anexos). Páginas numeradas.
+    """
+    m = _modelos()
+    elementos = _cabecalho(titulo)
+    if not registros:
+        elementos.append(m.Paragraph("Nenhum registro encontrado.", m.normal))
+        return _gerar(relatorio, elementos, numerar=True)
+
+    elementos += _tabela_lista(registros)
+    elementos += [m.Spacer(1, 10), m.Paragraph(f"Total de registros: {len(registros)}", m.normal)]
+    for registro in registros:
+        elementos += [
+            m.Spacer(1, 24),
+            # O título não fica sozinho no pé da página
+            m.KeepTogether([
+                m.Paragraph(f"{registro['titulo']} — {formatar_data_br(registro['criado_em'])}", m.subtitulo),
+                _tabela_campos(registro),
+            ]),
+            *_tabela_extras(registro['dados']),
+            *_anexos(anexos.get(registro['id'], [])),
+        ]
+    return _gerar(relatorio, elementos, numerar=True)
@@ -0,0 +1,268 @@
+"""
+Módulo de tarefas - fila durável de trabalho em segundo plano
+
+As tarefas ficam na tabela `tarefas` do banco principal, então sobrevivem a
+reinícios e são compartilhadas entre os workers do gunicorn: cada processo
+roda um loop (thread) que reserva a próxima tarefa vencida, executa e a
+remove; em caso de erro tenta de novo com espera exponencial.
+
+Tarefas avulsas (ex.: excluir_arquivos) são enfileiradas na mesma transação
+da escrita que as originou. Tarefas periódicas (varredura de órfãos,
+manutenção do banco, arquivo, backup, avisos de troca) são reagendadas ao terminar.
+
+Cada inquilino (ver inquilinos.py) tem a sua fila no seu banco; o loop
+percorre o banco principal e os inquilinos cadastrados, executando cada
+tarefa no contexto do seu inquilino. Um inquilino sem nada a fazer só é
+consultado de novo depois de TAREFAS_INTERVALO_INQUILINO_SEGUNDOS.
+
+Para rodar a fila fora da API (TAREFAS_WORKER=0 nos workers web):
+    python tarefas.py
+"""
+
+import logging
+import os
+import threading
+import time
+import traceback
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+
+# Também roda como script: carrega o .env antes dos módulos que leem a configuração
+load_dotenv()
+
+import backup
+import database
+import inquilinos
+import notificacoes
+from armazenamento import obter_armazenamento
+
+# Roda o loop de tarefas dentro de cada worker da API
+TAREFAS_WORKER = os.getenv("TAREFAS_WORKER", "1") == "1"
+# Espera entre consultas à fila quando não há nada a fazer
+TAREFAS_INTERVALO_SEGUNDOS = float(os.getenv("TAREFAS_INTERVALO_SEGUNDOS", "2"))
+# Espera antes da primeira consulta nos workers da API: as primeiras
+# requisições depois de uma partida a frio não disputam CPU com a fila
+TAREFAS_ATRASO_INICIAL_SEGUNDOS = float(os.getenv("TAREFAS_ATRASO_INICIAL_SEGUNDOS", "10"))
+TAREFAS_MAX_TENTATIVAS = int(os.getenv("TAREFAS_MAX_TENTATIVAS", "5"))
+# Espera até consultar de novo a fila de um inquilino que estava vazia
+TAREFAS_INTERVALO_INQUILINO_SEGUNDOS = float(os.getenv("TAREFAS_INTERVALO_INQUILINO_SEGUNDOS", "30"))
+# Tempo de reserva: se o worker morrer, a tarefa volta para a fila depois disso
+DURACAO_RESERVA_SEGUNDOS = 300
+# Espera da 1ª retentativa (dobra a cada falha)
+ESPERA_RETENTATIVA_SEGUNDOS = 30
+
+# Arquivos sem anexo mais novos que isso podem ser uploads diretos em andamento
+ORFAOS_IDADE_MINIMA_SEGUNDOS = 3600
+# Compacta o banco quando as páginas livres passam dessa fração do arquivo
+VACUUM_FRACAO_LIVRE = float(os.getenv("VACUUM_FRACAO_LIVRE", "0.2"))
+
+logger = logging.getLogger("tarefas")
+
+_tratadores: dict[str, Callable[[dict], None]] = {}
+# tipo -> intervalo em segundos
+_periodicas: dict[str, float] = {}
+# tipo -> reserva em segundos, para tarefas que podem passar de DURACAO_RESERVA_SEGUNDOS
+_reservas: dict[str, float] = {}
+
+
+def tarefa(tipo: str, intervalo: Optional[float] = None, reserva: Optional[float] = None):
+    """Registra a função que executa um tipo de tarefa (periódica se houver intervalo)."""
+    def decorator(funcao):
+        _tratadores[tipo] = funcao
+        if intervalo:
+            _periodicas[tipo] = intervalo
+        if reserva:
+            _reservas[tipo] = reserva
+        return funcao
+    return decorator
+
+
+# ============ TAREFAS ============
+
+@tarefa("excluir_arquivos")
+def excluir_arquivos(dados: dict):
+    """Remove os arquivos dos anexos excluídos (uma tarefa por exclusão, mesmo em lote)."""
+    obter_armazenamento().excluir_varios(dados["nomes_arquivos"])
+
+
+@tarefa("excluir_arquivo")
+def excluir_arquivo(dados: dict):
+    """Remove o arquivo de um anexo excluído (tarefas enfileiradas antes de excluir_arquivos)."""
+    obter_armazenamento().excluir(dados["nome_arquivo"])
+
+
+@tarefa("varrer_orfaos", intervalo=6 * 3600)
+def varrer_orfaos(dados: dict):
+    """Remove arquivos do armazenamento que não pertencem a nenhum anexo."""
+    armazenamento = obter_armazenamento()
+    referenciados = database.listar_nomes_arquivos_anexos()
+    limite = time.time() - ORFAOS_IDADE_MINIMA_SEGUNDOS
+
+    removidos = 0
+    for nome_arquivo, modificado_em in armazenamento.listar():
+        if nome_arquivo not in referenciados and modificado_em < limite:
+            armazenamento.excluir(nome_arquivo)
+            removidos += 1
+    if removidos:
+        logger.info("Varredura de órfãos: %d arquivo(s) removido(s)", removidos)
+
+
+@tarefa("manutencao_banco", intervalo=24 * 3600, reserva=3600)
+def manutencao_banco(dados: dict):
+    """Atualiza as estatísticas do banco e compacta o arquivo quando há muito espaço livre."""
+    database.otimizar_banco()
+    if database.fracao_paginas_livres() > VACUUM_FRACAO_LIVRE:
+        database.compactar_banco()
+
+
+if database.ARQUIVO_HORIZONTE_DIAS > 0:
+    @tarefa("arquivar_registros", intervalo=24 * 3600, reserva=3600)
+    def arquivar_registros(dados: dict):
+        """Move os registros mais antigos que ARQUIVO_HORIZONTE_DIAS para o arquivo, em lotes."""
+        antes_de = time.strftime(
+            "%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - database.ARQUIVO_HORIZONTE_DIAS * 86400)
+        )
+        movidos = 0
+        while lote := database.arquivar_registros(antes_de):
+            movidos += lote
+            # Entre os lotes, deixa as escritas das requisições passarem
+            time.sleep(0.1)
+        if movidos:
+            logger.info("Arquivo: %d registro(s) anterior(es) a %s arquivado(s)", movidos, antes_de)
+
+
+if backup.BACKUP_INTERVALO_HORAS > 0 and database.DB_BACKEND == "sqlite":
+    @tarefa("backup", intervalo=backup.BACKUP_INTERVALO_HORAS * 3600, reserva=3600)
+    def fazer_backup(dados: dict):
+        """Backup online do banco e dos anexos, com retenção."""
+        backup.criar_backup()
+
+
+@tarefa("verificar_manutencoes", intervalo=notificacoes.NOTIFICACOES_INTERVALO_SEGUNDOS)
+def verificar_manutencoes(dados: dict):
+    """Gera os avisos de trocas próximas e vencidas."""
+    notificacoes.verificar_manutencoes()
+
+
+@tarefa("entregar_notificacao")
+def entregar_notificacao(dados: dict):
+    """Entrega um aviso por e-mail ou webhook."""
+    notificacoes.entregar(dados["notificacao_id"], dados["canal"])
+
+# ============ EXECUÇÃO ============
+
+def executar_proxima() -> bool:
+    """Reserva e executa uma tarefa. Retorna False se a fila não tinha nada vencido."""
+    item = database.reservar_tarefa(DURACAO_RESERVA_SEGUNDOS)
+    if item is None:
+        return False
+
+    tratador = _tratadores.get(item["tipo"])
+    if tratador is None:
+        database.falhar_tarefa(item["id"], f"Tipo de tarefa desconhecido: {item['tipo']}")
+        return True
+    if item["tipo"] in _reservas:
+        database.estender_reserva(item["id"], _reservas[item["tipo"]])
+
+    try:
+        tratador(item["dados"])
+    except Exception:
+        erro = traceback.format_exc(limit=5)
+        if item["periodica"]:
+            # Periódicas nunca desistem: tentam de novo no próximo ciclo
+            logger.exception("Tarefa periódica %s falhou", item["tipo"])
+            database.reagendar_tarefa(item["id"], _periodicas.get(item["tipo"], 3600), erro, zerar_tentativas=True)
+        elif item["tentativas"] >= TAREFAS_MAX_TENTATIVAS:
+            logger.error("Tarefa %s (%s) desistiu após %d tentativas", item["id"], item["tipo"], item["tentativas"])
+            database.falhar_tarefa(item["id"], erro)
+        else:
+            espera = ESPERA_RETENTATIVA_SEGUNDOS * 2 ** (item["tentativas"] - 1)
+            logger.warning("Tarefa %s (%s) falhou; nova tentativa em %ds", item["id"], item["tipo"], espera)
+            database.reagendar_tarefa(item["id"], espera, erro)
+        return True
+
+    if item["periodica"]:
+        database.reagendar_tarefa(item["id"], _periodicas.get(item["tipo"], 3600), zerar_tentativas=True)
+    else:
+        database.concluir_tarefa(item["id"])
+    return True
+
+
+def processar_pendentes(limite: int = 1000) -> int:
+    """Executa tarefas vencidas até esvaziar a fila (ou atingir o limite). Retorna quantas rodaram."""
+    executadas = 0
+    while executadas < limite and executar_proxima():
+        executadas += 1
+    return executadas
+
+
+_parar = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+def _executar_no_inquilino(inquilino: Optional[str], agendados: set) -> bool:
+    """Agenda as periódicas do inquilino (uma vez) e executa uma tarefa dele."""
+    with inquilinos.usar(inquilino):
+        if inquilino not in agendados:
+            for tipo in _periodicas:
+                database.agendar_tarefa_periodica(tipo, atraso=60)
+            agendados.add(inquilino)
+        return executar_proxima()
+
+
+def _loop(atraso_inicial: float = 0):
+    _parar.wait(atraso_inicial)
+    agendados: set[Optional[str]] = set()
+    # inquilino -> quando consultar de novo (a fila dele estava vazia)
+    ociosos: dict[str, float] = {}
+    while not _parar.is_set():
+        executou = False
+        try:
+            executou = _executar_no_inquilino(None, agendados)
+            for inquilino in database.listar_inquilinos():
+                if _parar.is_set():
+                    break
+                if ociosos.get(inquilino, 0) > time.monotonic():
+                    continue
+                try:
+                    if _executar_no_inquilino(inquilino, agendados):
+                        executou = True
+                        ociosos.pop(inquilino, None)
+                    else:
+                        ociosos[inquilino] = time.monotonic() + TAREFAS_INTERVALO_INQUILINO_SEGUNDOS
+                except Exception:
+                    logger.exception("Erro no loop de tarefas do inquilino %s", inquilino)
+                    ociosos[inquilino] = time.monotonic() + TAREFAS_INTERVALO_INQUILINO_SEGUNDOS
+        except Exception:
+            # Ex.: banco indisponível; o loop não pode morrer
+            logger.exception("Erro no loop de tarefas")
+        if not executou:
+            _parar.wait(TAREFAS_INTERVALO_SEGUNDOS)
+
+
+def iniciar_worker():
+    """Inicia o loop de tarefas em uma thread deste processo (idempotente)."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _parar.clear()
+    _thread = threading.Thread(target=_loop, args=(TAREFAS_ATRASO_INICIAL_SEGUNDOS,), name="tarefas", daemon=True)
+    _thread.start()
+
+
+def parar_worker(timeout: float = 10):
+    """Sinaliza o loop para parar e aguarda a tarefa em execução terminar."""
+    _parar.set()
+    if _thread is not None:
+        _thread.join(timeout)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    database.init_db()
+    logger.info("Worker de tarefas iniciado (Ctrl+C para encerrar)")
+    try:
+        _loop()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,114 @@
+"""
+Configuração dos testes do backend (python -m pytest, a partir de backend/)
+
+Cada teste roda com um banco SQLite, uma pasta de anexos e uma pasta de
+backups próprios, em um diretório temporário: nada toca em data/ ou uploads/.
+
+Com TEST_DATABASE_URL (ou DATABASE_URL) apontando para um PostgreSQL
+descartável, cada teste roda também nele, em um schema próprio que é
+removido no fim; sem a URL, os casos "postgres" são pulados:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/testes python -m pytest
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+# Antes dos módulos do backend, que leem a configuração ao serem importados
+_PASTA_TESTES = Path(tempfile.mkdtemp(prefix="testes-backend-"))
+os.environ.update({
+    "DB_PATH": str(_PASTA_TESTES / "dados.db"),
+    "UPLOADS_DIR": str(_PASTA_TESTES / "uploads"),
+    "METRICAS_DIR": str(_PASTA_TESTES / "metricas"),
+    "APP_PASSWORD": "senha-de-teste",
+    "TAREFAS_WORKER": "0",
+})
+URL_POSTGRES_TESTES = os.getenv("TEST_DATABASE_URL") or os.getenv("DATABASE_URL")
+if URL_POSTGRES_TESTES:
+    os.environ["DATABASE_URL"] = URL_POSTGRES_TESTES
+os.environ.pop("DB_BACKEND", None)
+os.environ.pop("ANEXOS_BACKEND", None)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest  # noqa: E402
+
+import armazenamento  # noqa: E402
+import backup  # noqa: E402
+import database  # noqa: E402
+import inquilinos  # noqa: E402
+
+
+def _usar_postgres(monkeypatch, request) -> str:
+    """Aponta o database.py para um schema novo no PostgreSQL de testes; retorna o schema."""
+    if not URL_POSTGRES_TESTES:
+        pytest.skip("defina TEST_DATABASE_URL para rodar os testes no PostgreSQL")
+    pytest.importorskip("psycopg_pool")
+    import psycopg
+
+    import banco_postgres
+
+    esquema = f"teste_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(URL_POSTGRES_TESTES, autocommit=True) as conn:
+        conn.execute(f"CREATE SCHEMA {esquema}")
+
+    def remover():
+        banco_postgres.fechar_pools()
+        with psycopg.connect(URL_POSTGRES_TESTES, autocommit=True) as conn:
+            # O do teste e os dos inquilinos criados nele
+            for (nome,) in conn.execute(
+                "SELECT nspname FROM pg_namespace WHERE nspname = %s OR nspname LIKE %s",
+                (esquema, f"{esquema}\\_%")
+            ).fetchall():
+                conn.execute(f"DROP SCHEMA {nome} CASCADE")
+    request.addfinalizer(remover)
+
+    # O pool do banco principal usa o schema do teste no lugar do public
+    separador = "&" if "?" in URL_POSTGRES_TESTES else "?"
+    monkeypatch.setattr(
+        banco_postgres, "DATABASE_URL", f"{URL_POSTGRES_TESTES}{separador}options=-csearch_path%3D{esquema}"
+    )
+    monkeypatch.setattr(database, "banco_postgres", banco_postgres, raising=False)
+    monkeypatch.setattr(database, "ErroIntegridade", (sqlite3.IntegrityError, banco_postgres.ErroIntegridade))
+    monkeypatch.setattr(database, "DB_BACKEND", "postgres")
+    monkeypatch.setattr(inquilinos, "esquema", lambda inquilino_id: f"{esquema}_{inquilino_id}")
+    return esquema
+
+
+@pytest.fixture(autouse=True, params=["sqlite", "postgres"])
+def banco(request, tmp_path, monkeypatch):
+    """Banco (SQLite ou PostgreSQL), anexos e backups novos para cada teste."""
+    if request.param == "postgres":
+        _usar_postgres(monkeypatch, request)
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "dados.db")
+    monkeypatch.setattr(database, "_inquilinos_prontos", set())
+    monkeypatch.setattr(inquilinos, "INQUILINOS_DIR", tmp_path / "inquilinos")
+    monkeypatch.setattr(armazenamento, "UPLOADS_DIR", tmp_path / "uploads")
+    monkeypatch.setattr(armazenamento, "_armazenamentos", {})
+    monkeypatch.setattr(backup, "BACKUP_DIR", tmp_path / "backups")
+    database.init_db()
+    return tmp_path
+
+
+@pytest.fixture
+def so_sqlite():
+    """Pula o caso PostgreSQL de testes de recursos só do SQLite (ex.: backup.py)."""
+    if database.DB_BACKEND != "sqlite":
+        pytest.skip("só no SQLite")
+
+
+@pytest.fixture
+def datar():
+    """Define criado_em/atualizado_em de um registro (os testes precisam de datas controladas)."""
+    def definir(registro_id: int, criado_em: str, atualizado_em: str = None):
+        conn = database.get_connection()
+        conn.execute(
+            "UPDATE registros SET criado_em = ?, atualizado_em = ? WHERE id = ?",
+            (criado_em, atualizado_em or criado_em, registro_id)
+        )
+        conn.commit()
+        conn.close()
+    return definir
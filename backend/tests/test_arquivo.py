@@ -0,0 +1,90 @@
+"""Arquivo de registros antigos: ida e volta, consultas por período, busca e backups."""
+
+import backup
+import database
+
+
+def _ids(registros):
+    return [registro["id"] for registro in registros]
+
+
+def _arquivar_antigos(datar):
+    """Dois registros de 2020 (um com anexo) e um atual; arquiva os de 2020."""
+    antigo = database.criar_registro("Gol - ABC1234", {"Óleo": "Mobil Super"}, quilometragem=1000)
+    anexo = database.salvar_anexo(antigo, "foto.jpg", b"foto", "image/jpeg")
+    outro = database.criar_registro("Uno - XYZ9876", {"Óleo": "Shell"})
+    atual = database.criar_registro("Gol - ABC1234", {"Óleo": "Mobil"}, quilometragem=9000)
+    datar(antigo, "2020-03-01 10:00:00")
+    datar(outro, "2020-04-01 10:00:00")
+
+    assert database.arquivar_registros("2021-01-01 00:00:00") == 2
+    return antigo, anexo, outro, atual
+
+
+def test_ida_e_volta_preserva_o_registro_e_o_anexo(datar):
+    antes = database.criar_registro("Gol - ABC1234", {"Óleo": "5W30", "Observações": "ç"}, quilometragem=1000)
+    datar(antes, "2020-03-01 10:00:00")
+    original = database.obter_registro(antes)
+    anexo = database.salvar_anexo(antes, "foto.jpg", b"foto", "image/jpeg")
+
+    database.arquivar_registros("2021-01-01 00:00:00")
+
+    assert database.obter_registro(antes) is None
+    assert database.obter_registro(antes, incluir_arquivados=True) == original
+    arquivados = database.listar_anexos(antes, incluir_arquivados=True)
+    assert [a["nome_arquivo"] for a in arquivados] == [anexo["nome_arquivo"]]
+
+
+def test_listagens_e_sincronizacao_ficam_com_os_ativos(datar):
+    # Token > 0: com 0 a sincronização devolve o snapshot completo
+    database.criar_veiculo("ABC1234", "Gol")
+    token = database.obter_token_alteracoes()
+    antigo, anexo, outro, atual = _arquivar_antigos(datar)
+
+    assert _ids(database.listar_registros()) == [atual]
+    assert _ids(database.listar_historico()) == [atual]
+    excluidos = database.listar_alteracoes(token)["excluidos"]
+    assert sorted(excluidos["registros"]) == [antigo, outro]
+    assert excluidos["anexos"] == [anexo["id"]]
+
+
+def test_historico_por_periodo_intercala_as_camadas(datar):
+    antigo, _, outro, atual = _arquivar_antigos(datar)
+
+    assert _ids(database.listar_historico(de="2020-01-01", ate="2020-12-31")) == [outro, antigo]
+    assert _ids(database.listar_historico(de="2020-01-01")) == [atual, outro, antigo]
+
+    pagina, cursor_pagina = database.listar_historico_paginado(limite=2, de="2020-01-01")
+    resto, fim = database.listar_historico_paginado(limite=2, cursor_pagina=cursor_pagina, de="2020-01-01")
+    assert _ids(pagina) + _ids(resto) == [atual, outro, antigo]
+    assert fim is None
+
+
+def test_busca_usa_a_mesma_regra_nas_duas_camadas(datar):
+    antigo, _, outro, atual = _arquivar_antigos(datar)
+
+    for termo, esperado in [("mobil", [atual, antigo]), ("MOBIL", [atual, antigo]),
+                            ("shell", [outro]), ("Óleo", [atual, outro, antigo])]:
+        pagina, _ = database.listar_historico_paginado(busca=termo, de="2000-01-01")
+        assert _ids(pagina) == esperado, termo
+
+
+def test_relatorio_da_placa_inclui_arquivados(datar):
+    antigo, _, _, atual = _arquivar_antigos(datar)
+
+    assert _ids(database.listar_registros_da_placa("ABC1234")) == [antigo, atual]
+
+
+def test_anexos_arquivados_entram_na_varredura(datar):
+    _, anexo, _, _ = _arquivar_antigos(datar)
+
+    assert anexo["nome_arquivo"] in database.listar_nomes_arquivos_anexos()
+
+
+def test_anexos_arquivados_entram_no_backup(datar, so_sqlite):
+    _, anexo, _, _ = _arquivar_antigos(datar)
+
+    manifesto = backup._ler_manifesto(backup.criar_backup())
+
+    assert anexo["nome_arquivo"] in {a["nome_arquivo"] for a in manifesto["anexos"]}
+    assert (backup.pasta_backups() / "uploads" / anexo["nome_arquivo"]).exists()
@@ -0,0 +1,50 @@
+"""Lista de revogação de tokens: recarga fora do event loop."""
+
+import threading
+import time
+
+import pytest
+
+import auth
+import database
+
+
+@pytest.fixture(autouse=True)
+def lista_vazia(monkeypatch):
+    monkeypatch.setattr(auth, "_revogados", set())
+    monkeypatch.setattr(auth, "_revogados_carregado_em", time.monotonic())
+    monkeypatch.setattr(auth, "_revogados_recarregando", False)
+
+
+def test_revogado_neste_worker_vale_na_hora():
+    token = auth.criar_par_tokens()["access_token"]
+
+    auth.revogar_token(token)
+
+    assert auth.decodificar_token(token) is None
+
+
+def test_recarga_nao_bloqueia_a_verificacao(monkeypatch):
+    token = auth.criar_par_tokens()["access_token"]
+    jti = auth.decodificar_token(token)["jti"]
+    # Revogado por outro worker: só no banco
+    database.revogar_token(jti, int(time.time()) + 60)
+    liberar = threading.Event()
+    listar = database.listar_tokens_revogados
+
+    def listar_devagar():
+        liberar.wait(5)
+        return listar()
+
+    monkeypatch.setattr(database, "listar_tokens_revogados", listar_devagar)
+    monkeypatch.setattr(auth, "_revogados_carregado_em", float("-inf"))
+
+    # A lista venceu: a consulta vai para uma thread e a verificação responde com a lista atual
+    inicio = time.perf_counter()
+    assert auth.decodificar_token(token) is not None
+    assert time.perf_counter() - inicio < 1
+    recarga, = [thread for thread in threading.enumerate() if thread.name == "revogacoes"]
+
+    liberar.set()
+    recarga.join(5)
+    assert auth.decodificar_token(token) is None
@@ -0,0 +1,122 @@
+"""Backup online, retenção e restauração (backup.py)."""
+
+import sqlite3
+import tarfile
+from datetime import datetime, timedelta
+
+import pytest
+
+import backup
+import database
+from armazenamento import pasta_uploads
+
+# Com PostgreSQL o backup é pelo pg_dump
+pytestmark = pytest.mark.usefixtures("so_sqlite")
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    """Avança um minuto a cada backup: o nome do arquivo tem resolução de segundos."""
+    class Relogio(datetime):
+        atual = datetime(2025, 1, 1, 3, 0, 0)
+
+        @classmethod
+        def now(cls, tz=None):
+            cls.atual += timedelta(minutes=1)
+            return cls.atual
+
+    monkeypatch.setattr(backup, "datetime", Relogio)
+
+
+def test_restaura_banco_e_anexos(relogio):
+    registro_id = database.criar_registro("Gol - ABC1234", {"Óleo": "5W30"}, quilometragem=1000)
+    anexo = database.salvar_anexo(registro_id, "foto.jpg", b"conteudo da foto", "image/jpeg")
+    arquivo = backup.criar_backup()
+
+    database.excluir_registro(registro_id)
+    (pasta_uploads() / anexo["nome_arquivo"]).unlink()
+    backup.restaurar_backup(arquivo)
+
+    assert database.obter_registro(registro_id)["dados"] == {"Óleo": "5W30"}
+    assert (pasta_uploads() / anexo["nome_arquivo"]).read_bytes() == b"conteudo da foto"
+
+
+def test_restaura_sem_o_filtro_do_tarfile(relogio, monkeypatch):
+    # Python < 3.11.4 (o render.yaml fixa 3.11.0) não tem tarfile.data_filter
+    registro_id = database.criar_registro("Gol - ABC1234", {})
+    arquivo = backup.criar_backup()
+    database.excluir_registro(registro_id)
+
+    monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    backup.restaurar_backup(arquivo)
+
+    assert database.obter_registro(registro_id) is not None
+
+
+def test_manifesto_lista_os_anexos_do_snapshot(relogio):
+    registro_id = database.criar_registro("Gol - ABC1234", {})
+    anexo = database.salvar_anexo(registro_id, "nota.pdf", b"%PDF", "application/pdf")
+
+    manifesto = backup._ler_manifesto(backup.criar_backup())
+
+    assert [a["nome_arquivo"] for a in manifesto["anexos"]] == [anexo["nome_arquivo"]]
+    assert (backup.pasta_backups() / "uploads" / anexo["nome_arquivo"]).exists()
+
+
+def test_retencao_remove_backups_e_copias_que_so_eles_usavam(relogio):
+    registro_id = database.criar_registro("Gol - ABC1234", {})
+    antigo = database.salvar_anexo(registro_id, "antiga.jpg", b"1", "image/jpeg")
+    backup.criar_backup()
+    database.excluir_anexos_em_lote(ids=[antigo["id"]])
+    novo = database.salvar_anexo(registro_id, "nova.jpg", b"2", "image/jpeg")
+
+    backup.criar_backup()
+    backup.criar_backup()
+    removidos = backup.aplicar_retencao(manter=2)
+
+    assert removidos == 1
+    assert len(backup.listar_backups()) == 2
+    copias = {copia.name for copia in (backup.pasta_backups() / "uploads").iterdir()}
+    assert copias == {novo["nome_arquivo"]}
+
+
+def test_backups_no_mesmo_segundo_nao_se_sobrescrevem(monkeypatch):
+    class Parado(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 1, 1, 3, 0, 0)
+
+    monkeypatch.setattr(backup, "datetime", Parado)
+    criados = [backup.criar_backup() for _ in range(10)]
+
+    assert [arquivo.name for arquivo in criados[:3]] == [
+        "backup-20250101-030000.tar.gz", "backup-20250101-030000-2.tar.gz", "backup-20250101-030000-3.tar.gz"
+    ]
+    # A retenção mantém os mais recentes (com -10, depois de -9) e não reaproveita os N removidos
+    assert backup.listar_backups() == criados[-backup.BACKUP_RETENCAO:]
+    assert backup.criar_backup().name == "backup-20250101-030000-11.tar.gz"
+
+
+def test_banco_em_wal():
+    conn = database.get_connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+
+def test_backup_corrompido_nao_substitui_o_banco(relogio, tmp_path):
+    registro_id = database.criar_registro("Gol - ABC1234", {})
+    arquivo = backup.criar_backup()
+    # Mesmo backup com o banco truncado no meio
+    with tarfile.open(arquivo) as tar:
+        tar.extractall(tmp_path / "conteudo")
+    banco = tmp_path / "conteudo" / "dados.db"
+    banco.write_bytes(banco.read_bytes()[:len(banco.read_bytes()) // 2])
+    with tarfile.open(arquivo, "w:gz") as tar:
+        tar.add(banco, arcname="dados.db")
+        tar.add(tmp_path / "conteudo" / "manifesto.json", arcname="manifesto.json")
+    database.criar_registro("Uno - XYZ9876", {})
+
+    with pytest.raises((RuntimeError, sqlite3.DatabaseError)):
+        backup.restaurar_backup(arquivo)
+    assert database.obter_registro(registro_id) is not None
+    assert len(database.listar_registros()) == 2
@@ -0,0 +1,107 @@
+"""estatisticas_km mantida a cada escrita deve ser igual ao recálculo completo."""
+
+import random
+
+import pytest
+
+import database
+
+
+def _estatisticas() -> dict:
+    conn = database.get_connection()
+    rows = conn.execute("SELECT * FROM estatisticas_km ORDER BY placa").fetchall()
+    conn.close()
+    return {row["placa"]: dict(row) for row in rows}
+
+
+def _conferir_com_recalculo():
+    incremental = _estatisticas()
+    database.recalcular_estatisticas_km()
+    completo = _estatisticas()
+
+    assert incremental.keys() == completo.keys()
+    for placa, esperado in completo.items():
+        assert incremental[placa] == pytest.approx(esperado, rel=1e-9, abs=1e-6), placa
+
+
+@pytest.fixture
+def frota(datar):
+    """30 registros de 4 placas em datas distintas, com as estatísticas recalculadas."""
+    rng = random.Random(7)
+    placas = ["ABC1234", "XYZ9876", "DEF5555", "GHI0001"]
+    ids = []
+    for i in range(30):
+        placa = rng.choice(placas)
+        registro_id = database.criar_registro(
+            f"Gol - {placa}", {}, quilometragem=10_000 + i * rng.randint(300, 900),
+            data_proxima_troca=f"2024-{1 + i % 12:02d}-15"
+        )
+        datar(registro_id, f"2023-{1 + i % 12:02d}-{1 + i // 12:02d} 08:00:00")
+        ids.append(registro_id)
+    database.recalcular_estatisticas_km()
+    return rng, placas, ids
+
+
+def test_criacao_e_atualizacao(frota):
+    rng, placas, ids = frota
+
+    database.criar_registro("Uno - ABC1234", {}, quilometragem=50_000)
+    _conferir_com_recalculo()
+
+    # Mesma placa, outra quilometragem
+    registro = database.obter_registro(ids[3])
+    database.atualizar_registro(ids[3], registro["titulo"], {}, quilometragem=99_999)
+    _conferir_com_recalculo()
+
+    # Troca de placa: sai de uma estatística e entra em outra
+    database.atualizar_registro(ids[5], "Gol - NOV0001", {}, quilometragem=12_345)
+    _conferir_com_recalculo()
+
+    # Sem quilometragem: deixa de contar
+    database.atualizar_registro(ids[7], database.obter_registro(ids[7])["titulo"], {})
+    _conferir_com_recalculo()
+
+
+def test_exclusao_do_ultimo_registro_da_placa(frota):
+    _, _, ids = frota
+    ultimo_por_placa = {placa: e["ultimo_registro_id"] for placa, e in _estatisticas().items()}
+
+    for registro_id in ultimo_por_placa.values():
+        database.excluir_registro(registro_id)
+        _conferir_com_recalculo()
+
+
+def test_operacoes_em_lote_e_arquivo(frota):
+    _, _, ids = frota
+
+    database.atualizar_registros_em_lote(ids=ids[:10], deslocar_dias=30)
+    _conferir_com_recalculo()
+
+    database.atualizar_registros_em_lote(filtro={"busca": "ABC1234"}, data_proxima_troca="2030-01-01")
+    _conferir_com_recalculo()
+
+    database.excluir_registros_em_lote(ids=ids[10:15])
+    _conferir_com_recalculo()
+
+    database.arquivar_registros("2023-06-01 00:00:00")
+    _conferir_com_recalculo()
+
+
+def test_sequencia_aleatoria(frota):
+    rng, placas, ids = frota
+    vivos = list(ids)
+
+    for _ in range(60):
+        operacao = rng.choice(["criar", "atualizar", "excluir"])
+        if operacao == "criar" or not vivos:
+            vivos.append(database.criar_registro(
+                f"Gol - {rng.choice(placas)}", {}, quilometragem=rng.choice([None, rng.randint(1, 90_000)])
+            ))
+        elif operacao == "atualizar":
+            database.atualizar_registro(
+                rng.choice(vivos), f"Gol - {rng.choice(placas)}", {},
+                quilometragem=rng.choice([None, rng.randint(1, 90_000)])
+            )
+        else:
+            database.excluir_registro(vivos.pop(rng.randrange(len(vivos))))
+        _conferir_com_recalculo()
@@ -0,0 +1,53 @@
+"""Transmissor dos streams SSE: falhas do banco não param a consulta periódica."""
+
+import asyncio
+
+import eventos
+
+
+def _transmissor(falhas_ler: int, falhas_buscar: int) -> eventos.Transmissor:
+    chamadas = {"ler": 0, "buscar": 0}
+
+    def ler_ultimo():
+        chamadas["ler"] += 1
+        if chamadas["ler"] <= falhas_ler:
+            raise ConnectionError("banco fora do ar")
+        return 10
+
+    def buscar(ultimo):
+        chamadas["buscar"] += 1
+        if chamadas["buscar"] <= falhas_buscar:
+            raise ConnectionError("banco fora do ar")
+        return [(ultimo + 1, {"n": ultimo + 1})] if ultimo < 12 else []
+
+    return eventos.Transmissor(ler_ultimo, buscar, intervalo=0.001)
+
+
+def test_consulta_continua_depois_de_falhas(monkeypatch):
+    monkeypatch.setattr(eventos, "ESPERA_MAXIMA_ERRO_SEGUNDOS", 0.01)
+
+    async def assinar_e_receber():
+        transmissor = _transmissor(falhas_ler=2, falhas_buscar=3)
+        fila = await transmissor.assinar()
+        recebidos = [await asyncio.wait_for(fila.get(), 5) for _ in range(2)]
+        transmissor.cancelar(fila)
+        await asyncio.wait_for(transmissor._tarefa, 5)
+        return recebidos
+
+    assert asyncio.run(assinar_e_receber()) == [(11, {"n": 11}), (12, {"n": 12})]
+
+
+def test_quem_desiste_de_esperar_sai_da_lista(monkeypatch):
+    monkeypatch.setattr(eventos, "ESPERA_MAXIMA_ERRO_SEGUNDOS", 0.01)
+
+    async def desistir():
+        transmissor = _transmissor(falhas_ler=10**6, falhas_buscar=0)
+        try:
+            await asyncio.wait_for(transmissor.assinar(), 0.05)
+        except asyncio.TimeoutError:
+            pass
+        # Sem streams, a consulta periódica termina
+        await asyncio.wait_for(transmissor._tarefa, 5)
+        return transmissor._filas
+
+    assert asyncio.run(desistir()) == set()
@@ -0,0 +1,49 @@
+"""Inquilinos: bancos (ou schemas) isolados e o LRU de pools do PostgreSQL."""
+
+import auth
+import database
+import inquilinos
+
+
+def _criar(inquilino_id: str):
+    database.criar_inquilino(inquilino_id, inquilino_id.title(), auth.gerar_hash_senha("senha"))
+
+
+def test_dados_de_cada_inquilino_ficam_isolados():
+    _criar("norte")
+    _criar("sul")
+
+    with inquilinos.usar("norte"):
+        norte = database.criar_registro("Gol - ABC1234", {})
+    with inquilinos.usar("sul"):
+        database.criar_registro("Uno - XYZ9876", {})
+        database.criar_registro("Palio - DEF5555", {})
+
+    with inquilinos.usar("norte"):
+        assert [r["id"] for r in database.listar_registros()] == [norte]
+    with inquilinos.usar("sul"):
+        assert len(database.listar_registros()) == 2
+    assert database.listar_registros() == []
+    assert database.listar_inquilinos() == ["norte", "sul"]
+
+
+def test_pools_dos_inquilinos_sao_limitados(monkeypatch):
+    if database.DB_BACKEND != "postgres":
+        return
+    import banco_postgres
+    monkeypatch.setattr(banco_postgres, "INQUILINOS_MAX_POOLS", 2)
+    ids = ["a1", "b2", "c3", "d4"]
+    for inquilino_id in ids:
+        _criar(inquilino_id)
+
+    # Alterna entre mais inquilinos que pools abertos: os fechados são recriados
+    for _ in range(2):
+        for inquilino_id in ids:
+            with inquilinos.usar(inquilino_id):
+                database.criar_registro(f"Gol - {inquilino_id.upper()}", {})
+
+    abertos = [esquema for esquema in banco_postgres._pools if esquema is not None]
+    assert len(abertos) <= 2
+    for inquilino_id in ids:
+        with inquilinos.usar(inquilino_id):
+            assert len(database.listar_registros()) == 2
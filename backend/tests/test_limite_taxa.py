@@ -0,0 +1,28 @@
+"""Limite de tentativas de login: um IP não bloqueia os demais."""
+
+import pytest
+
+import limite_taxa
+
+
+@pytest.fixture(autouse=True)
+def baldes_vazios(monkeypatch):
+    monkeypatch.setattr(limite_taxa, "RATE_LIMIT_BACKEND", "memoria")
+    monkeypatch.setattr(limite_taxa, "_baldes", {})
+
+
+def test_ip_que_esgota_o_balde_nao_bloqueia_os_outros():
+    esperas = [limite_taxa.limitar_login("203.0.113.7") for _ in range(1000)]
+
+    assert esperas[:limite_taxa.LOGIN_POR_IP_CAPACIDADE] == [0] * limite_taxa.LOGIN_POR_IP_CAPACIDADE
+    assert all(espera > 0 for espera in esperas[limite_taxa.LOGIN_POR_IP_CAPACIDADE:])
+    assert limite_taxa.limitar_login("198.51.100.1") == 0
+
+
+def test_teto_global_para_ataques_de_muitos_ips():
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(limite_taxa.LOGIN_GLOBAL_CAPACIDADE + 1)]
+
+    esperas = [limite_taxa.limitar_login(ip) for ip in ips]
+
+    assert esperas[:-1] == [0] * limite_taxa.LOGIN_GLOBAL_CAPACIDADE
+    assert esperas[-1] > 0
@@ -0,0 +1,81 @@
+"""Operações em lote: status por ID e o que chega ao log de sincronização."""
+
+import pytest
+
+import database
+
+
+def _status(resultado) -> dict:
+    return {item["id"]: item["status"] for item in resultado}
+
+
+def test_deslocar_dias_com_e_sem_data():
+    com_data = database.criar_registro("Gol - ABC1234", {}, data_proxima_troca="2025-01-10")
+    sem_data = database.criar_registro("Uno - XYZ9876", {})
+    antes = database.obter_registro(sem_data)
+    token = database.obter_token_alteracoes()
+
+    resultado = database.atualizar_registros_em_lote(
+        ids=[com_data, sem_data, 999], deslocar_dias=5, filtro_trocado=True
+    )
+
+    assert _status(resultado) == {com_data: "atualizado", sem_data: "sem_data", 999: "nao_encontrado"}
+    assert database.obter_registro(com_data)["data_proxima_troca"] == "2025-01-15"
+    assert database.obter_registro(com_data)["filtro_trocado"] is True
+    # "sem_data" não é alterado nem aparece para os clientes como alterado
+    assert database.obter_registro(sem_data) == antes
+    assert [r["id"] for r in database.listar_alteracoes(token)["registros"]] == [com_data]
+
+
+def test_definir_data_atualiza_a_estatistica_da_placa():
+    database.criar_registro("Gol - ABC1234", {}, quilometragem=1000)
+    ultimo = database.criar_registro("Gol - ABC1234", {}, quilometragem=2000)
+
+    database.atualizar_registros_em_lote(ids=[ultimo], data_proxima_troca="2030-01-01")
+
+    estatistica, = database.listar_estatisticas_km("ABC1234")
+    assert estatistica["data_proxima_troca"] == "2030-01-01"
+
+
+def test_atualizar_por_filtro():
+    gol = database.criar_registro("Gol - ABC1234", {})
+    database.criar_registro("Uno - XYZ9876", {}, filtro_trocado=True)
+
+    resultado = database.atualizar_registros_em_lote(filtro={"busca": "gol"}, filtro_trocado=True)
+
+    assert _status(resultado) == {gol: "atualizado"}
+
+
+def test_excluir_registros_leva_os_anexos():
+    registro_id = database.criar_registro("Gol - ABC1234", {})
+    anexo = database.salvar_anexo(registro_id, "foto.jpg", b"1", "image/jpeg")
+    token = database.obter_token_alteracoes()
+
+    resultado = database.excluir_registros_em_lote(ids=[registro_id, 999])
+
+    assert _status(resultado) == {registro_id: "excluido", 999: "nao_encontrado"}
+    assert database.obter_anexo(anexo["id"]) is None
+    excluidos = database.listar_alteracoes(token)["excluidos"]
+    assert excluidos["registros"] == [registro_id]
+    assert excluidos["anexos"] == [anexo["id"]]
+
+
+def test_excluir_anexos_por_tipo():
+    registro_id = database.criar_registro("Gol - ABC1234", {})
+    foto = database.salvar_anexo(registro_id, "foto.jpg", b"1", "image/jpeg")
+    nota = database.salvar_anexo(registro_id, "nota.pdf", b"2", "application/pdf")
+
+    resultado = database.excluir_anexos_em_lote(filtro={"tipo": "image/"})
+
+    assert _status(resultado) == {foto["id"]: "excluido"}
+    assert [a["id"] for a in database.listar_anexos(registro_id)] == [nota["id"]]
+
+
+@pytest.mark.parametrize("argumentos", [
+    {"ids": [1]},
+    {"ids": [1], "data_proxima_troca": "2025-01-01", "deslocar_dias": 1},
+    {"filtro": {}, "filtro_trocado": True},
+])
+def test_pedidos_invalidos(argumentos):
+    with pytest.raises(ValueError):
+        database.atualizar_registros_em_lote(**argumentos)
@@ -0,0 +1,77 @@
+"""Paginação por cursor (keyset) das listagens de registros e do histórico."""
+
+import pytest
+
+import database
+
+
+def _percorrer(listar, limite, **filtros):
+    """Lê todas as páginas seguindo o cursor; retorna os IDs na ordem recebida."""
+    ids, cursor_pagina = [], None
+    while True:
+        pagina, cursor_pagina = listar(limite=limite, cursor_pagina=cursor_pagina, **filtros)
+        assert len(pagina) <= limite
+        ids.extend(registro["id"] for registro in pagina)
+        if cursor_pagina is None:
+            return ids
+
+
+def test_historico_percorre_tudo_sem_repetir(datar):
+    ids = [database.criar_registro(f"Gol - ABC{i:04d}", {}) for i in range(23)]
+    # Vários registros com o mesmo criado_em: o id desempata
+    for indice, registro_id in enumerate(ids):
+        datar(registro_id, f"2024-01-{1 + indice // 4:02d} 10:00:00")
+
+    percorridos = _percorrer(database.listar_historico_paginado, 5)
+
+    esperado = [registro["id"] for registro in database.listar_historico()]
+    assert percorridos == esperado
+    assert sorted(percorridos) == sorted(ids)
+
+
+def test_listagem_por_atualizacao_segue_a_ordem_decrescente(datar):
+    for i in range(7):
+        registro_id = database.criar_registro(f"Gol - ABC{i:04d}", {})
+        datar(registro_id, "2024-01-01 10:00:00", f"2024-02-{10 - i:02d} 10:00:00")
+
+    paginas = _percorrer(database.listar_registros_paginado, 3)
+
+    assert paginas == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_ultima_pagina_exata_nao_devolve_cursor():
+    for i in range(4):
+        database.criar_registro(f"Gol - ABC{i:04d}", {})
+
+    pagina, cursor_pagina = database.listar_historico_paginado(limite=4)
+
+    assert len(pagina) == 4
+    assert cursor_pagina is None
+
+
+def test_busca_e_paginacao_juntas():
+    for i in range(10):
+        database.criar_registro(f"Gol - ABC{i:04d}" if i % 2 else f"Uno - XYZ{i:04d}", {})
+
+    ids = _percorrer(database.listar_historico_paginado, 2, busca="gol")
+
+    assert len(ids) == 5
+    assert all(database.obter_registro(registro_id)["titulo"].startswith("Gol") for registro_id in ids)
+
+
+def test_escrita_entre_paginas_nao_desloca_o_cursor(datar):
+    for i in range(6):
+        datar(database.criar_registro(f"Gol - ABC{i:04d}", {}), f"2024-01-0{i + 1} 10:00:00")
+
+    primeira, cursor_pagina = database.listar_historico_paginado(limite=3)
+    database.criar_registro("Uno - XYZ9999", {})
+    segunda, _ = database.listar_historico_paginado(limite=3, cursor_pagina=cursor_pagina)
+
+    assert [r["id"] for r in primeira] == [6, 5, 4]
+    assert [r["id"] for r in segunda] == [3, 2, 1]
+
+
+@pytest.mark.parametrize("cursor_pagina", ["sem-separador", "2024-01-01|abc"])
+def test_cursor_invalido(cursor_pagina):
+    with pytest.raises(ValueError):
+        database.listar_historico_paginado(cursor_pagina=cursor_pagina)
@@ -0,0 +1,33 @@
+"""Perfil por requisição: o trabalho feito fora do event loop também aparece."""
+
+import asyncio
+import time
+
+import profiler
+
+
+def _calcular_em_thread(segundos: float) -> int:
+    total, fim = 0, time.perf_counter() + segundos
+    while time.perf_counter() < fim:
+        total += sum(range(1000))
+    return total
+
+
+def test_trabalho_em_to_thread_aparece_no_perfil():
+    async def requisicao():
+        amostrador = profiler.iniciar_perfil_requisicao(intervalo=0.001)
+        await asyncio.to_thread(_calcular_em_thread, 0.3)
+        return profiler.finalizar_perfil_requisicao(amostrador)
+
+    perfil = asyncio.run(requisicao())
+
+    assert "test_profiler.py:_calcular_em_thread" in perfil
+
+
+def test_um_perfil_por_vez():
+    amostrador = profiler.iniciar_perfil_requisicao()
+    try:
+        assert profiler.iniciar_perfil_requisicao() is None
+    finally:
+        profiler.finalizar_perfil_requisicao(amostrador)
+    profiler.finalizar_perfil_requisicao(profiler.iniciar_perfil_requisicao())
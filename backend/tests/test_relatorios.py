@@ -0,0 +1,33 @@
+"""Miniaturas dos relatórios em PDF: só as geradas com sucesso ficam em cache."""
+
+import io
+
+import pytest
+from PIL import Image
+
+import armazenamento
+import relatorios
+
+
+@pytest.fixture(autouse=True)
+def cache_limpo():
+    relatorios._gerar_miniatura.cache_clear()
+    yield
+    relatorios._gerar_miniatura.cache_clear()
+
+
+def _jpeg() -> bytes:
+    saida = io.BytesIO()
+    Image.new("RGB", (800, 600), "red").save(saida, "JPEG")
+    return saida.getvalue()
+
+
+def test_falha_nao_fica_em_cache():
+    assert relatorios._miniatura(None, "foto.jpg") is None
+
+    # O arquivo aparece depois (ex.: falha transitória do armazenamento)
+    armazenamento.obter_armazenamento().salvar("foto.jpg", _jpeg(), "image/jpeg")
+    _, largura, altura = relatorios._miniatura(None, "foto.jpg")
+
+    assert max(largura, altura) == relatorios.MINIATURA_LADO_PX
+    assert relatorios._gerar_miniatura.cache_info().currsize == 1
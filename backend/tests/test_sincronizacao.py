@@ -0,0 +1,100 @@
+"""Sincronização incremental (listar_alteracoes e /api/sync): delta e semântica do token."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+
+def _ids(itens):
+    return sorted(item["id"] for item in itens)
+
+
+def test_snapshot_completo_sem_token():
+    registro_id = database.criar_registro("Gol - ABC1234", {"Óleo": "5W30"}, quilometragem=1000)
+    veiculo_id = database.criar_veiculo("ABC1234", "Gol")
+
+    delta = database.listar_alteracoes(0)
+
+    assert delta["completo"] is True
+    assert delta["token"] == database.obter_token_alteracoes() > 0
+    assert _ids(delta["registros"]) == [registro_id]
+    assert _ids(delta["veiculos"]) == [veiculo_id]
+
+
+def test_token_desconhecido_devolve_snapshot_completo():
+    database.criar_registro("Gol - ABC1234", {})
+    token = database.obter_token_alteracoes()
+
+    assert database.listar_alteracoes(token + 100)["completo"] is True
+
+
+def test_delta_traz_so_o_que_mudou_desde_o_token():
+    antigo = database.criar_registro("Gol - ABC1234", {})
+    alterado = database.criar_registro("Uno - XYZ9876", {})
+    token = database.obter_token_alteracoes()
+
+    database.atualizar_registro(alterado, "Uno - XYZ9876", {"Óleo": "5W30"})
+    novo = database.criar_registro("Palio - DEF5555", {})
+    delta = database.listar_alteracoes(token)
+
+    assert delta["completo"] is False
+    assert _ids(delta["registros"]) == [alterado, novo]
+    assert antigo not in _ids(delta["registros"])
+    assert delta["excluidos"]["registros"] == []
+
+
+def test_exclusao_aparece_so_como_excluido():
+    registro_id = database.criar_registro("Gol - ABC1234", {})
+    token = database.obter_token_alteracoes()
+
+    database.atualizar_registro(registro_id, "Gol - ABC1234", {"Óleo": "5W30"})
+    database.excluir_registro(registro_id)
+    delta = database.listar_alteracoes(token)
+
+    # Vale a última operação de cada entidade
+    assert delta["registros"] == []
+    assert delta["excluidos"]["registros"] == [registro_id]
+
+
+def test_token_do_delta_sem_alteracoes_nao_avanca():
+    database.criar_registro("Gol - ABC1234", {})
+    token = database.obter_token_alteracoes()
+
+    delta = database.listar_alteracoes(token)
+
+    assert delta["token"] == token
+    assert delta["registros"] == [] and delta["excluidos"]["registros"] == []
+
+
+def test_sincronizar_com_o_token_devolvido_nao_perde_nem_repete():
+    database.criar_registro("Gol - ABC1234", {})
+    primeiro = database.listar_alteracoes(0)
+
+    novo = database.criar_registro("Uno - XYZ9876", {})
+    segundo = database.listar_alteracoes(primeiro["token"])
+    terceiro = database.listar_alteracoes(segundo["token"])
+
+    assert _ids(segundo["registros"]) == [novo]
+    assert terceiro["registros"] == []
+    assert terceiro["token"] == segundo["token"]
+
+
+def test_escritas_concorrentes_nao_se_perdem():
+    database.criar_veiculo("ABC1234", "Gol")
+    token = database.obter_token_alteracoes()
+    vistos = set()
+
+    def escrever(n):
+        return [database.criar_registro(f"Gol - ABC{n}{i:03d}", {}) for i in range(10)]
+
+    with ThreadPoolExecutor(4) as executor:
+        futuros = [executor.submit(escrever, n) for n in range(4)]
+        # Sincroniza enquanto as escritas acontecem, sempre com o último token
+        while not all(futuro.done() for futuro in futuros):
+            delta = database.listar_alteracoes(token)
+            vistos.update(r["id"] for r in delta["registros"])
+            token = delta["token"]
+        criados = {registro_id for futuro in futuros for registro_id in futuro.result()}
+
+    vistos.update(r["id"] for r in database.listar_alteracoes(token)["registros"])
+    assert vistos == criados
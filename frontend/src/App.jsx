@@ -1,15 +1,12 @@
-import { Routes, Route, Navigate } from 'react-router-dom'
-import { useState, useEffect } from 'react'
+import { Routes, Route, Navigate, useLocation } from 'react-router-dom'
+import { useState, useEffect, Suspense } from 'react'
 import { isAuthenticated, verificarAuth } from './services/api'
+import { paginas, prefetchRotasProvaveis } from './rotas'
 import Login from './pages/Login'
-import Home from './pages/Home'
-import Criar from './pages/Criar'
-import Editar from './pages/Editar'
-import Detalhes from './pages/Detalhes'
-import Historico from './pages/Historico'
-import Veiculos from './pages/Veiculos'
 import Layout from './components/Layout'
 
+const { Home, Criar, Editar, Detalhes, Historico, Veiculos } = paginas
+
 function PrivateRoute({ children }) {
   const [loading, setLoading] = useState(true)
   const [authenticated, setAuthenticated] = useState(false)
@@ -29,10 +26,22 @@ function PrivateRoute({ children }) {
     return <div className="loading">Carregando...</div>
   }
 
-  return authenticated ? children : <Navigate to="/login" />
+  if (!authenticated) {
+    return <Navigate to="/login" />
+  }
+
+  return (
+    <Suspense fallback={<div className="loading">Carregando...</div>}>
+      {children}
+    </Suspense>
+  )
 }
 
 function App() {
+  const location = useLocation()
+
+  useEffect(() => prefetchRotasProvaveis(location.pathname), [location.pathname])
+
   return (
     <Routes>
       <Route path="/login" element={<Login />} />
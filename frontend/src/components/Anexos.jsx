@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react'
-import { listarAnexos, uploadAnexo, excluirAnexo } from '../services/api'
+import { listarAnexos, uploadAnexo, excluirAnexo, obterUrlDownloadAnexo, ouvirAlteracoes } from '../services/api'
 
 function Anexos({ registroId }) {
   const [anexos, setAnexos] = useState([])
@@ -8,7 +8,7 @@ function Anexos({ registroId }) {
 
   const carregarAnexos = async () => {
     try {
-      const data = await listarAnexos(registroId)
+      const data = await listarAnexos(registroId, { onAtualizar: setAnexos })
       setAnexos(data)
     } catch (error) {
       console.error('Erro ao carregar anexos:', error)
@@ -23,6 +23,13 @@ function Anexos({ registroId }) {
     }
   }, [registroId])
 
+  useEffect(() => ouvirAlteracoes((alteracoes) => {
+    if (!alteracoes || alteracoes.excluidos.anexos.length ||
+        alteracoes.anexos.some((anexo) => anexo.registro_id === registroId)) {
+      listarAnexos(registroId).then(setAnexos).catch(() => {})
+    }
+  }), [registroId])
+
   const handleUpload = async (e) => {
     const arquivo = e.target.files[0]
     if (!arquivo) return
@@ -68,6 +75,13 @@ function Anexos({ registroId }) {
 
   const handleDownload = async (anexoId, nomeOriginal) => {
     try {
+      // Armazenamento remoto: o navegador baixa direto do bucket
+      const urlDireta = await obterUrlDownloadAnexo(anexoId)
+      if (urlDireta) {
+        window.location.assign(urlDireta)
+        return
+      }
+
       const token = localStorage.getItem('token')
       const response = await fetch(`/api/anexos/${anexoId}/download`, {
         headers: {
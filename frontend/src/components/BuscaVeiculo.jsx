@@ -0,0 +1,121 @@
+import { useEffect, useRef, useState } from 'react'
+import { Link } from 'react-router-dom'
+import { autocompletarVeiculos } from '../services/api'
+import AddIcon from '@mui/icons-material/Add'
+
+const ATRASO_BUSCA_MS = 150
+
+const rotulo = (veiculo) => `${veiculo.modelo} - ${veiculo.placa}`
+
+// Campo de veículo com autocompletar por placa ou modelo (sem carregar a frota inteira)
+function BuscaVeiculo({ id, veiculo, onSelecionar, autoFocus }) {
+  const [texto, setTexto] = useState(veiculo ? rotulo(veiculo) : '')
+  const [sugestoes, setSugestoes] = useState([])
+  const [aberto, setAberto] = useState(false)
+  const [buscando, setBuscando] = useState(false)
+  const [destacado, setDestacado] = useState(0)
+  const requisicaoAtual = useRef(0)
+
+  useEffect(() => {
+    const termo = texto.trim()
+    const requisicao = ++requisicaoAtual.current
+    if (!termo || (veiculo && texto === rotulo(veiculo))) {
+      setSugestoes([])
+      setBuscando(false)
+      return
+    }
+    setBuscando(true)
+    const timer = setTimeout(async () => {
+      try {
+        const lista = await autocompletarVeiculos(termo)
+        // Ignora respostas de buscas que já foram substituídas
+        if (requisicao !== requisicaoAtual.current) return
+        setSugestoes(lista)
+        setDestacado(0)
+      } catch (error) {
+        console.error('Erro ao buscar veículos:', error)
+      } finally {
+        if (requisicao === requisicaoAtual.current) setBuscando(false)
+      }
+    }, ATRASO_BUSCA_MS)
+    return () => clearTimeout(timer)
+  }, [texto, veiculo])
+
+  const selecionar = (escolhido) => {
+    onSelecionar(escolhido)
+    setTexto(rotulo(escolhido))
+    setAberto(false)
+  }
+
+  const handleChange = (e) => {
+    setTexto(e.target.value)
+    setAberto(true)
+    if (veiculo) onSelecionar(null)
+  }
+
+  const handleKeyDown = (e) => {
+    if (!aberto || sugestoes.length === 0) return
+    if (e.key === 'ArrowDown') {
+      e.preventDefault()
+      setDestacado((atual) => (atual + 1) % sugestoes.length)
+    } else if (e.key === 'ArrowUp') {
+      e.preventDefault()
+      setDestacado((atual) => (atual - 1 + sugestoes.length) % sugestoes.length)
+    } else if (e.key === 'Enter') {
+      e.preventDefault()
+      selecionar(sugestoes[destacado])
+    } else if (e.key === 'Escape') {
+      setAberto(false)
+    }
+  }
+
+  const mostrarLista = aberto && texto.trim() && !veiculo && !buscando
+
+  return (
+    <div className="busca-veiculo">
+      <input
+        type="text"
+        id={id}
+        value={texto}
+        onChange={handleChange}
+        onKeyDown={handleKeyDown}
+        onFocus={() => setAberto(true)}
+        onBlur={() => setAberto(false)}
+        placeholder="Digite a placa ou o modelo"
+        autoComplete="off"
+        autoFocus={autoFocus}
+        required
+      />
+      {mostrarLista && (
+        <ul className="busca-veiculo-lista">
+          {sugestoes.length === 0 ? (
+            <li className="busca-veiculo-vazio">
+              Nenhum veículo encontrado.
+              {/* onMouseDown: o clique acontece antes do blur fechar a lista */}
+              <Link to="/veiculos" className="btn btn-primary btn-sm" onMouseDown={(e) => e.preventDefault()}>
+                <AddIcon sx={{ fontSize: 16, marginRight: 0.5 }} />
+                Cadastrar Veículo
+              </Link>
+            </li>
+          ) : (
+            sugestoes.map((sugestao, indice) => (
+              <li
+                key={sugestao.id}
+                className={indice === destacado ? 'destacado' : ''}
+                onMouseDown={(e) => {
+                  e.preventDefault()
+                  selecionar(sugestao)
+                }}
+                onMouseEnter={() => setDestacado(indice)}
+              >
+                <strong>{sugestao.placa}</strong> {sugestao.modelo}
+              </li>
+            ))
+          )}
+        </ul>
+      )}
+    </div>
+  )
+}
+
+export default BuscaVeiculo
@@ -1,6 +1,29 @@
+import { useEffect, useState } from 'react'
+import { assinarAlteracoes, assinarNotificacoes } from '../services/api'
+
 function Layout({ children }) {
+  const [avisos, setAvisos] = useState([])
+
+  useEffect(() => assinarAlteracoes(), [])
+
+  useEffect(() => assinarNotificacoes((aviso) => {
+    setAvisos((atuais) => [aviso, ...atuais.filter((a) => a.id !== aviso.id)].slice(0, 5))
+  }), [])
+
+  const dispensar = (id) => setAvisos((atuais) => atuais.filter((a) => a.id !== id))
+
   return (
     <div className="container">
+      {avisos.length > 0 && (
+        <div className="avisos">
+          {avisos.map((aviso) => (
+            <div key={aviso.id} className={`aviso aviso-${aviso.tipo}`}>
+              <span>{aviso.mensagem}</span>
+              <button type="button" onClick={() => dispensar(aviso.id)} aria-label="Dispensar">×</button>
+            </div>
+          ))}
+        </div>
+      )}
       <main>{children}</main>
     </div>
   )
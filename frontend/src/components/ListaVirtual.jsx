@@ -0,0 +1,91 @@
+import { Fragment, useEffect, useMemo, useRef, useState } from 'react'
+
+// Busca binária: índice do primeiro item cujo fim passa da posição
+const indiceNaPosicao = (offsets, posicao) => {
+  let inicio = 0
+  let fim = offsets.length - 1
+  while (inicio < fim) {
+    const meio = (inicio + fim) >> 1
+    if (offsets[meio + 1] <= posicao) {
+      inicio = meio + 1
+    } else {
+      fim = meio
+    }
+  }
+  return inicio
+}
+
+// Lista com janela de renderização: só os itens próximos da área visível são
+// montados; o restante vira espaçamento com base na altura estimada de cada item.
+function ListaVirtual({ itens, alturaItem, chaveItem, renderItem, onFimAlcancado, margem = 800, className }) {
+  const containerRef = useRef(null)
+  const [janela, setJanela] = useState({ inicio: 0, fim: 20 })
+
+  const offsets = useMemo(() => {
+    const lista = [0]
+    for (const item of itens) {
+      lista.push(lista[lista.length - 1] + alturaItem(item))
+    }
+    return lista
+  }, [itens, alturaItem])
+
+  useEffect(() => {
+    let frame = null
+
+    const atualizar = () => {
+      frame = null
+      const container = containerRef.current
+      if (!container) return
+
+      const topo = container.getBoundingClientRect().top
+      const visivelInicio = Math.max(0, -topo - margem)
+      const visivelFim = -topo + window.innerHeight + margem
+      const alturaTotal = offsets[offsets.length - 1]
+
+      const inicio = itens.length ? indiceNaPosicao(offsets, visivelInicio) : 0
+      const fim = itens.length ? Math.min(itens.length, indiceNaPosicao(offsets, visivelFim) + 1) : 0
+      setJanela((anterior) => (
+        anterior.inicio === inicio && anterior.fim === fim ? anterior : { inicio, fim }
+      ))
+
+      if (onFimAlcancado && visivelFim >= alturaTotal) {
+        onFimAlcancado()
+      }
+    }
+
+    const agendar = () => {
+      if (frame === null) {
+        frame = window.requestAnimationFrame(atualizar)
+      }
+    }
+
+    atualizar()
+    window.addEventListener('scroll', agendar, { passive: true })
+    window.addEventListener('resize', agendar)
+    return () => {
+      window.removeEventListener('scroll', agendar)
+      window.removeEventListener('resize', agendar)
+      if (frame !== null) window.cancelAnimationFrame(frame)
+    }
+  }, [itens, offsets, margem, onFimAlcancado])
+
+  const inicio = Math.min(janela.inicio, itens.length)
+  const fim = Math.min(janela.fim, itens.length)
+
+  return (
+    <div
+      ref={containerRef}
+      className={className}
+      style={{
+        paddingTop: offsets[inicio],
+        paddingBottom: offsets[itens.length] - offsets[fim]
+      }}
+    >
+      {itens.slice(inicio, fim).map((item, i) => (
+        <Fragment key={chaveItem(item)}>{renderItem(item, inicio + i)}</Fragment>
+      ))}
+    </div>
+  )
+}
+
+export default ListaVirtual
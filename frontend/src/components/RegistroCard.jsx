@@ -1,3 +1,4 @@
+import { memo } from 'react'
 import { Link } from 'react-router-dom'
 
 function RegistroCard({ registro, onExcluir, hoje }) {
@@ -107,4 +108,5 @@ function RegistroCard({ registro, onExcluir, hoje }) {
   )
 }
 
-export default RegistroCard
+// Memoizado: em listas longas só re-renderiza o card cujo registro mudou
+export default memo(RegistroCard)
@@ -1,16 +1,15 @@
 import { useState, useEffect } from 'react'
 import { useNavigate, Link } from 'react-router-dom'
-import { criarRegistro, obterDataPadrao, listarVeiculos } from '../services/api'
+import { criarRegistro, obterDataPadrao } from '../services/api'
+import BuscaVeiculo from '../components/BuscaVeiculo'
 import SaveIcon from '@mui/icons-material/Save'
 import CancelIcon from '@mui/icons-material/Cancel'
-import AddIcon from '@mui/icons-material/Add'
 
 function Criar() {
   const navigate = useNavigate()
   const [loading, setLoading] = useState(false)
-  const [veiculos, setVeiculos] = useState([])
+  const [veiculo, setVeiculo] = useState(null)
   const [form, setForm] = useState({
-    veiculo_id: '',
     quilometragem: '',
     proxima_troca: '',
     data_proxima_troca: '',
@@ -22,12 +21,8 @@ function Criar() {
   useEffect(() => {
     const carregarDados = async () => {
       try {
-        const [dataPadrao, listaVeiculos] = await Promise.all([
-          obterDataPadrao(),
-          listarVeiculos()
-        ])
+        const dataPadrao = await obterDataPadrao()
         setForm((prev) => ({ ...prev, data_proxima_troca: dataPadrao.data }))
-        setVeiculos(listaVeiculos)
       } catch (error) {
         console.error('Erro ao carregar dados:', error)
       }
@@ -63,6 +58,10 @@ function Criar() {
 
   const handleSubmit = async (e) => {
     e.preventDefault()
+    if (!veiculo) {
+      alert('Selecione um veículo da lista')
+      return
+    }
     setLoading(true)
 
     try {
@@ -74,14 +73,8 @@ function Criar() {
         dados['Viscosidade'] = form.viscosidade.trim()
       }
 
-      // Buscar nome do veículo selecionado
-      const veiculoSelecionado = veiculos.find(v => v.id === parseInt(form.veiculo_id))
-      const tituloVeiculo = veiculoSelecionado
-        ? `${veiculoSelecionado.modelo} - ${veiculoSelecionado.placa}`
-        : ''
-
       await criarRegistro({
-        titulo: tituloVeiculo,
+        titulo: `${veiculo.modelo} - ${veiculo.placa}`,
         quilometragem: form.quilometragem ? parseInt(form.quilometragem) : null,
         proxima_troca: form.proxima_troca ? parseInt(form.proxima_troca) : null,
         data_proxima_troca: form.data_proxima_troca || null,
@@ -106,32 +99,8 @@ function Criar() {
 
       <form className="form-registro" onSubmit={handleSubmit}>
         <div className="form-group">
-          <label htmlFor="veiculo_id">Veículo *</label>
-          {veiculos.length === 0 ? (
-            <div className="veiculo-aviso">
-              <p>Nenhum veículo cadastrado.</p>
-              <Link to="/veiculos" className="btn btn-primary btn-sm">
-                <AddIcon sx={{ fontSize: 16, marginRight: 0.5 }} />
-                Cadastrar Veículo
-              </Link>
-            </div>
-          ) : (
-            <select
-              id="veiculo_id"
-              name="veiculo_id"
-              value={form.veiculo_id}
-              onChange={handleChange}
-              required
-              autoFocus
-            >
-              <option value="">Selecione um veículo</option>
-              {veiculos.map((veiculo) => (
-                <option key={veiculo.id} value={veiculo.id}>
-                  {veiculo.modelo} - {veiculo.placa} {veiculo.ano ? `(${veiculo.ano})` : ''}
-                </option>
-              ))}
-            </select>
-          )}
+          <label htmlFor="veiculo">Veículo *</label>
+          <BuscaVeiculo id="veiculo" veiculo={veiculo} onSelecionar={setVeiculo} autoFocus />
         </div>
 
         <div className="form-section">
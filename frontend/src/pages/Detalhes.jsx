@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react'
 import { useNavigate, useParams, Link } from 'react-router-dom'
-import { obterRegistro } from '../services/api'
+import { obterRegistro, ouvirAlteracoes } from '../services/api'
 import ArrowBackIcon from '@mui/icons-material/ArrowBack'
 import EditIcon from '@mui/icons-material/Edit'
 
@@ -13,7 +13,7 @@ function Detalhes() {
   useEffect(() => {
     const carregarRegistro = async () => {
       try {
-        const data = await obterRegistro(id)
+        const data = await obterRegistro(id, { onAtualizar: setRegistro })
         setRegistro(data)
       } catch (error) {
         console.error('Erro ao carregar registro:', error)
@@ -25,6 +25,15 @@ function Detalhes() {
     carregarRegistro()
   }, [id, navigate])
 
+  useEffect(() => ouvirAlteracoes((alteracoes) => {
+    const registroId = Number(id)
+    if (alteracoes?.excluidos.registros.includes(registroId)) {
+      navigate('/historico')
+    } else if (!alteracoes || alteracoes.registros.some((registro) => registro.id === registroId)) {
+      obterRegistro(id).then(setRegistro).catch(() => {})
+    }
+  }), [id, navigate])
+
   const formatarKm = (km) => {
     return km?.toLocaleString('pt-BR') || ''
   }
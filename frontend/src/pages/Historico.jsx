@@ -1,42 +1,170 @@
-import { useState, useEffect } from 'react'
+import { memo, useCallback, useEffect, useMemo, useRef, useState } from 'react'
 import { Link } from 'react-router-dom'
-import { listarHistorico, exportarPDF, exportarPDFRegistro } from '../services/api'
+import { listarHistoricoPaginado, exportarPDF, exportarPDFRegistro, exportarRelatorioRegistros, ouvirAlteracoes } from '../services/api'
+import ListaVirtual from '../components/ListaVirtual'
 import PictureAsPdfIcon from '@mui/icons-material/PictureAsPdf'
 import ArrowBackIcon from '@mui/icons-material/ArrowBack'
 import VisibilityIcon from '@mui/icons-material/Visibility'
 import AddIcon from '@mui/icons-material/Add'
 
+const TAMANHO_PAGINA = 50
+// Máximo de registros por relatório consolidado (LOTE_MAX_IDS no backend)
+const RELATORIO_MAX_REGISTROS = 1000
+const ATRASO_BUSCA_MS = 300
+
+// Alturas estimadas (px) usadas pela lista virtual
+const ALTURA_MES = 45
+const ALTURA_ITEM = 130
+
+const formatarData = (dataStr) => {
+  if (!dataStr) return ''
+  const data = new Date(dataStr)
+  return data.toLocaleDateString('pt-BR', {
+    day: '2-digit',
+    month: '2-digit',
+    year: 'numeric',
+    hour: '2-digit',
+    minute: '2-digit'
+  })
+}
+
+// Achata a timeline em linhas (cabeçalho do mês + itens) para a lista virtual
+const agruparPorMes = (registros) => {
+  const linhas = []
+  let mesAtual = null
+  registros.forEach(registro => {
+    const data = new Date(registro.criado_em)
+    const chave = `${data.getFullYear()}-${String(data.getMonth() + 1).padStart(2, '0')}`
+    if (chave !== mesAtual) {
+      const label = data.toLocaleDateString('pt-BR', { month: 'long', year: 'numeric' })
+      linhas.push({ tipo: 'mes', chave: `mes-${chave}`, label, primeiro: mesAtual === null })
+      mesAtual = chave
+    }
+    linhas.push({ tipo: 'item', chave: registro.id, registro })
+  })
+  return linhas
+}
+
+const maisRecentePrimeiro = (a, b) => (b.criado_em || '').localeCompare(a.criado_em || '') || b.id - a.id
+
+// Aplica um delta do stream de alterações à lista já carregada
+const aplicarDelta = (registros, alteracoes, comFiltro) => {
+  const excluidos = new Set(alteracoes.excluidos.registros)
+  const alterados = new Map(alteracoes.registros.map((registro) => [registro.id, registro]))
+  const lista = registros
+    .filter((registro) => !excluidos.has(registro.id))
+    .map((registro) => alterados.get(registro.id) || registro)
+  // Registros novos entram no topo; com busca ou período, não há como saber se combinam
+  const presentes = new Set(lista.map((registro) => registro.id))
+  const novos = comFiltro ? [] : alteracoes.registros.filter((registro) => !presentes.has(registro.id))
+  return novos.length ? [...novos.sort(maisRecentePrimeiro), ...lista] : lista
+}
+
+const alturaLinha = (linha) => (linha.tipo === 'mes' ? ALTURA_MES : ALTURA_ITEM)
+const chaveLinha = (linha) => linha.chave
+
+const ItemTimeline = memo(function ItemTimeline({ registro, exportando, onExportarPDF }) {
+  return (
+    <div className="timeline-item">
+      <div className="timeline-marker"></div>
+      <div className="timeline-content">
+        <div className="timeline-header">
+          <h3>{registro.titulo}</h3>
+          <span className="timeline-data">{formatarData(registro.criado_em)}</span>
+        </div>
+
+        <div className="timeline-actions">
+          <button
+            className="btn btn-pdf btn-sm"
+            onClick={() => onExportarPDF(registro.id, registro.titulo)}
+            disabled={exportando}
+          >
+            <PictureAsPdfIcon sx={{ fontSize: 16, marginRight: 0.5 }} />
+            {exportando ? 'Exportando...' : 'PDF'}
+          </button>
+          <Link to={`/detalhes/${registro.id}`} className="btn btn-secondary btn-sm">
+            <VisibilityIcon sx={{ fontSize: 16, marginRight: 0.5 }} />
+            Ver detalhes
+          </Link>
+        </div>
+      </div>
+    </div>
+  )
+})
+
 function Historico() {
   const [registros, setRegistros] = useState([])
   const [loading, setLoading] = useState(true)
+  const [carregandoMais, setCarregandoMais] = useState(false)
+  const [proximoCursor, setProximoCursor] = useState(null)
+  const [busca, setBusca] = useState('')
+  const [buscaAplicada, setBuscaAplicada] = useState('')
+  // Período ("YYYY-MM-DD"); com ele o servidor inclui os registros arquivados
+  const [de, setDe] = useState('')
+  const [ate, setAte] = useState('')
   const [exportando, setExportando] = useState(false)
   const [exportandoId, setExportandoId] = useState(null)
+  const [versao, setVersao] = useState(0)
+  const requisicaoAtual = useRef(0)
+
+  // Debounce: só consulta o servidor depois que o usuário para de digitar
+  useEffect(() => {
+    const timer = setTimeout(() => setBuscaAplicada(busca.trim()), ATRASO_BUSCA_MS)
+    return () => clearTimeout(timer)
+  }, [busca])
 
   useEffect(() => {
+    const id = ++requisicaoAtual.current
     const carregarHistorico = async () => {
+      setLoading(true)
       try {
-        const data = await listarHistorico()
-        setRegistros(data)
+        const pagina = await listarHistoricoPaginado({ busca: buscaAplicada, de, ate, limite: TAMANHO_PAGINA })
+        // Ignora respostas de buscas que já foram substituídas
+        if (id !== requisicaoAtual.current) return
+        setRegistros(pagina.registros)
+        setProximoCursor(pagina.proximoCursor)
       } catch (error) {
         console.error('Erro ao carregar histórico:', error)
       } finally {
-        setLoading(false)
+        if (id === requisicaoAtual.current) setLoading(false)
       }
     }
     carregarHistorico()
-  }, [])
+  }, [buscaAplicada, de, ate, versao])
 
-  const formatarData = (dataStr) => {
-    if (!dataStr) return ''
-    const data = new Date(dataStr)
-    return data.toLocaleDateString('pt-BR', {
-      day: '2-digit',
-      month: '2-digit',
-      year: 'numeric',
-      hour: '2-digit',
-      minute: '2-digit'
-    })
-  }
+  const filtrando = !!(buscaAplicada || de || ate)
+
+  // Alterações de outros usuários aparecem sem recarregar a página
+  useEffect(() => ouvirAlteracoes((alteracoes) => {
+    if (!alteracoes) {
+      setVersao((atual) => atual + 1)
+    } else if (alteracoes.registros.length || alteracoes.excluidos.registros.length) {
+      setRegistros((atuais) => aplicarDelta(atuais, alteracoes, filtrando))
+    }
+  }), [filtrando])
+
+  const carregarMais = useCallback(async () => {
+    if (!proximoCursor || carregandoMais || loading) return
+    const id = requisicaoAtual.current
+    setCarregandoMais(true)
+    try {
+      const pagina = await listarHistoricoPaginado({
+        busca: buscaAplicada,
+        de,
+        ate,
+        cursor: proximoCursor,
+        limite: TAMANHO_PAGINA
+      })
+      if (id !== requisicaoAtual.current) return
+      setRegistros((anteriores) => [...anteriores, ...pagina.registros])
+      setProximoCursor(pagina.proximoCursor)
+    } catch (error) {
+      console.error('Erro ao carregar mais registros:', error)
+      setProximoCursor(null)
+    } finally {
+      setCarregandoMais(false)
+    }
+  }, [proximoCursor, carregandoMais, loading, buscaAplicada, de, ate])
 
   const handleExportarPDF = async () => {
     setExportando(true)
@@ -58,7 +186,29 @@ function Historico() {
     }
   }
 
-  const handleExportarPDFRegistro = async (id, titulo) => {
+  // Relatório consolidado dos registros listados (com busca ou período)
+  const handleRelatorioListados = async () => {
+    setExportando(true)
+    try {
+      const ids = registros.slice(0, RELATORIO_MAX_REGISTROS).map((registro) => registro.id)
+      const blob = await exportarRelatorioRegistros(ids)
+      const url = window.URL.createObjectURL(blob)
+      const a = document.createElement('a')
+      a.href = url
+      a.download = `relatorio_${new Date().toISOString().split('T')[0]}.pdf`
+      document.body.appendChild(a)
+      a.click()
+      window.URL.revokeObjectURL(url)
+      document.body.removeChild(a)
+    } catch (error) {
+      console.error('Erro ao gerar relatório:', error)
+      alert('Erro ao gerar relatório')
+    } finally {
+      setExportando(false)
+    }
+  }
+
+  const handleExportarPDFRegistro = useCallback(async (id, titulo) => {
     setExportandoId(id)
     try {
       const blob = await exportarPDFRegistro(id)
@@ -76,28 +226,26 @@ function Historico() {
     } finally {
       setExportandoId(null)
     }
-  }
-
-  const agruparPorMes = (registros) => {
-    const grupos = {}
-    registros.forEach(registro => {
-      const data = new Date(registro.criado_em)
-      const chave = `${data.getFullYear()}-${String(data.getMonth() + 1).padStart(2, '0')}`
-      const label = data.toLocaleDateString('pt-BR', { month: 'long', year: 'numeric' })
+  }, [])
 
-      if (!grupos[chave]) {
-        grupos[chave] = { label, registros: [] }
-      }
-      grupos[chave].registros.push(registro)
-    })
-    return Object.values(grupos)
-  }
+  const linhas = useMemo(() => agruparPorMes(registros), [registros])
 
-  if (loading) {
-    return <div className="loading">Carregando histórico...</div>
-  }
-
-  const gruposPorMes = agruparPorMes(registros)
+  const renderLinha = useCallback((linha) => {
+    if (linha.tipo === 'mes') {
+      return (
+        <div className={`timeline-mes${linha.primeiro ? '' : ' timeline-mes-separado'}`}>
+          {linha.label}
+        </div>
+      )
+    }
+    return (
+      <ItemTimeline
+        registro={linha.registro}
+        exportando={exportandoId === linha.registro.id}
+        onExportarPDF={handleExportarPDFRegistro}
+      />
+    )
+  }, [exportandoId, handleExportarPDFRegistro])
 
   return (
     <>
@@ -112,6 +260,17 @@ function Historico() {
             <PictureAsPdfIcon sx={{ fontSize: 18, marginRight: 0.5 }} />
             {exportando ? 'Exportando...' : 'Exportar PDF'}
           </button>
+          {filtrando && registros.length > 0 && (
+            <button
+              className="btn btn-pdf"
+              onClick={handleRelatorioListados}
+              disabled={exportando}
+              title="Os registros listados, com os campos e os anexos"
+            >
+              <PictureAsPdfIcon sx={{ fontSize: 18, marginRight: 0.5 }} />
+              Relatório dos listados
+            </button>
+          )}
           <Link to="/" className="btn btn-secondary">
             <ArrowBackIcon sx={{ fontSize: 18, marginRight: 0.5 }} />
             Voltar
@@ -119,48 +278,66 @@ function Historico() {
         </div>
       </div>
 
-      {registros.length === 0 ? (
-        <div className="empty-state">
-          <p>Nenhuma manutenção registrada ainda.</p>
-          <Link to="/criar" className="btn btn-primary">
-            <AddIcon sx={{ fontSize: 18, marginRight: 0.5 }} />
-            Criar primeiro registro
-          </Link>
+      <div className="busca-container">
+        <div className="busca-form">
+          <input
+            type="search"
+            className="busca-input"
+            placeholder="Buscar por veículo, placa, óleo..."
+            value={busca}
+            onChange={(e) => setBusca(e.target.value)}
+          />
+          <input
+            type="date"
+            className="busca-data"
+            title="De"
+            value={de}
+            max={ate || undefined}
+            onChange={(e) => setDe(e.target.value)}
+          />
+          <input
+            type="date"
+            className="busca-data"
+            title="Até"
+            value={ate}
+            min={de || undefined}
+            onChange={(e) => setAte(e.target.value)}
+          />
         </div>
+      </div>
+
+      {loading ? (
+        <div className="loading">Carregando histórico...</div>
+      ) : registros.length === 0 ? (
+        buscaAplicada ? (
+          <div className="empty-state">
+            <p>Nenhum registro encontrado para "{buscaAplicada}".</p>
+          </div>
+        ) : de || ate ? (
+          <div className="empty-state">
+            <p>Nenhum registro encontrado no período.</p>
+          </div>
+        ) : (
+          <div className="empty-state">
+            <p>Nenhuma manutenção registrada ainda.</p>
+            <Link to="/criar" className="btn btn-primary">
+              <AddIcon sx={{ fontSize: 18, marginRight: 0.5 }} />
+              Criar primeiro registro
+            </Link>
+          </div>
+        )
       ) : (
-        <div className="timeline">
-          {gruposPorMes.map((grupo, index) => (
-            <div key={index} className="timeline-grupo">
-              <div className="timeline-mes">{grupo.label}</div>
-              {grupo.registros.map((registro) => (
-                <div key={registro.id} className="timeline-item">
-                  <div className="timeline-marker"></div>
-                  <div className="timeline-content">
-                    <div className="timeline-header">
-                      <h3>{registro.titulo}</h3>
-                      <span className="timeline-data">{formatarData(registro.criado_em)}</span>
-                    </div>
-
-                    <div className="timeline-actions">
-                      <button
-                        className="btn btn-pdf btn-sm"
-                        onClick={() => handleExportarPDFRegistro(registro.id, registro.titulo)}
-                        disabled={exportandoId === registro.id}
-                      >
-                        <PictureAsPdfIcon sx={{ fontSize: 16, marginRight: 0.5 }} />
-                        {exportandoId === registro.id ? 'Exportando...' : 'PDF'}
-                      </button>
-                      <Link to={`/detalhes/${registro.id}`} className="btn btn-secondary btn-sm">
-                        <VisibilityIcon sx={{ fontSize: 16, marginRight: 0.5 }} />
-                        Ver detalhes
-                      </Link>
-                    </div>
-                  </div>
-                </div>
-              ))}
-            </div>
-          ))}
-        </div>
+        <>
+          <ListaVirtual
+            className="timeline"
+            itens={linhas}
+            alturaItem={alturaLinha}
+            chaveItem={chaveLinha}
+            renderItem={renderLinha}
+            onFimAlcancado={proximoCursor ? carregarMais : undefined}
+          />
+          {carregandoMais && <div className="loading">Carregando mais...</div>}
+        </>
       )}
     </>
   )
@@ -1,11 +1,12 @@
 import { useState, useEffect } from 'react'
 import { useNavigate } from 'react-router-dom'
-import { login, isAuthenticated } from '../services/api'
+import { login, isAuthenticated, inquilinoAtual } from '../services/api'
 import LoginIcon from '@mui/icons-material/Login'
 import BuildIcon from '@mui/icons-material/Build'
 
 function Login() {
   const [senha, setSenha] = useState('')
+  const [inquilino, setInquilino] = useState(inquilinoAtual())
   const [erro, setErro] = useState('')
   const [loading, setLoading] = useState(false)
   const navigate = useNavigate()
@@ -22,7 +23,7 @@ function Login() {
     setLoading(true)
 
     try {
-      await login(senha)
+      await login(senha, inquilino.trim().toLowerCase())
       navigate('/')
     } catch (error) {
       setErro(error.response?.data?.detail || 'Erro ao fazer login')
@@ -40,6 +41,18 @@ function Login() {
         {erro && <div className="alert alert-error">{erro}</div>}
 
         <form onSubmit={handleSubmit}>
+          <div className="form-group">
+            <label htmlFor="inquilino">Frota</label>
+            <input
+              type="text"
+              id="inquilino"
+              placeholder="Deixe em branco se não houver"
+              value={inquilino}
+              onChange={(e) => setInquilino(e.target.value)}
+              autoCapitalize="none"
+              disabled={loading}
+            />
+          </div>
           <div className="form-group">
             <label htmlFor="senha">Senha</label>
             <input
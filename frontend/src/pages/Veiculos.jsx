@@ -1,12 +1,13 @@
 import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
-import { listarVeiculos, criarVeiculo, atualizarVeiculo, excluirVeiculo } from '../services/api'
+import { listarVeiculos, criarVeiculo, atualizarVeiculo, excluirVeiculo, exportarRelatorioVeiculo, ouvirAlteracoes } from '../services/api'
 import AddIcon from '@mui/icons-material/Add'
 import ArrowBackIcon from '@mui/icons-material/ArrowBack'
 import EditIcon from '@mui/icons-material/Edit'
 import DeleteIcon from '@mui/icons-material/Delete'
 import SaveIcon from '@mui/icons-material/Save'
 import CancelIcon from '@mui/icons-material/Cancel'
+import PictureAsPdfIcon from '@mui/icons-material/PictureAsPdf'
 
 function Veiculos() {
   const [veiculos, setVeiculos] = useState([])
@@ -20,14 +21,21 @@ function Veiculos() {
     cor: ''
   })
   const [salvando, setSalvando] = useState(false)
+  const [exportandoId, setExportandoId] = useState(null)
 
   useEffect(() => {
     carregarVeiculos()
   }, [])
 
+  useEffect(() => ouvirAlteracoes((alteracoes) => {
+    if (!alteracoes || alteracoes.veiculos.length || alteracoes.excluidos.veiculos.length) {
+      listarVeiculos().then(setVeiculos).catch(() => {})
+    }
+  }), [])
+
   const carregarVeiculos = async () => {
     try {
-      const data = await listarVeiculos()
+      const data = await listarVeiculos({ onAtualizar: setVeiculos })
       setVeiculos(data)
     } catch (error) {
       console.error('Erro ao carregar veículos:', error)
@@ -140,6 +148,26 @@ function Veiculos() {
     }
   }
 
+  const handleRelatorio = async (veiculo) => {
+    setExportandoId(veiculo.id)
+    try {
+      const blob = await exportarRelatorioVeiculo(veiculo.id)
+      const url = window.URL.createObjectURL(blob)
+      const a = document.createElement('a')
+      a.href = url
+      a.download = `historico_${veiculo.placa.replace(/[^a-zA-Z0-9]/g, '_')}_${new Date().toISOString().split('T')[0]}.pdf`
+      document.body.appendChild(a)
+      a.click()
+      window.URL.revokeObjectURL(url)
+      document.body.removeChild(a)
+    } catch (error) {
+      console.error('Erro ao gerar relatório:', error)
+      alert('Erro ao gerar relatório')
+    } finally {
+      setExportandoId(null)
+    }
+  }
+
   if (loading) {
     return <div className="loading">Carregando veículos...</div>
   }
@@ -181,6 +209,15 @@ function Veiculos() {
                 </div>
               </div>
               <div className="veiculo-acoes">
+                <button
+                  className="btn btn-pdf btn-sm"
+                  onClick={() => handleRelatorio(veiculo)}
+                  disabled={exportandoId === veiculo.id}
+                  title="Histórico completo em PDF, com os anexos"
+                >
+                  <PictureAsPdfIcon sx={{ fontSize: 16, marginRight: 0.5 }} />
+                  {exportandoId === veiculo.id ? 'Gerando...' : 'Relatório'}
+                </button>
                 <button
                   className="btn btn-secondary btn-sm"
                   onClick={() => abrirModal(veiculo)}
@@ -0,0 +1,63 @@
+import { lazy } from 'react'
+
+// Cada página vira um chunk separado, baixado só quando a rota é visitada
+const importadores = {
+  Home: () => import('./pages/Home'),
+  Criar: () => import('./pages/Criar'),
+  Editar: () => import('./pages/Editar'),
+  Detalhes: () => import('./pages/Detalhes'),
+  Historico: () => import('./pages/Historico'),
+  Veiculos: () => import('./pages/Veiculos')
+}
+
+export const paginas = Object.fromEntries(
+  Object.entries(importadores).map(([nome, importar]) => [nome, lazy(importar)])
+)
+
+// Próximas rotas prováveis a partir de cada página
+const rotasProvaveis = {
+  '/login': ['Home'],
+  '/': ['Historico', 'Criar', 'Veiculos'],
+  '/historico': ['Detalhes'],
+  '/detalhes': ['Editar'],
+  '/veiculos': ['Criar'],
+  '/criar': ['Home'],
+  '/editar': ['Home']
+}
+
+// Página renderizada por cada rota (para começar o download antes da checagem de auth)
+const paginaDaRota = {
+  '/': 'Home',
+  '/criar': 'Criar',
+  '/editar': 'Editar',
+  '/detalhes': 'Detalhes',
+  '/historico': 'Historico',
+  '/veiculos': 'Veiculos'
+}
+
+const jaCarregadas = new Set()
+
+export const prefetchPaginas = (...nomes) => {
+  for (const nome of nomes) {
+    if (!jaCarregadas.has(nome) && importadores[nome]) {
+      jaCarregadas.add(nome)
+      importadores[nome]().catch(() => jaCarregadas.delete(nome))
+    }
+  }
+}
+
+// Baixa em segundo plano (quando o navegador estiver ocioso) as páginas prováveis
+export const prefetchRotasProvaveis = (caminho) => {
+  const base = caminho === '/' ? '/' : `/${caminho.split('/')[1]}`
+  if (paginaDaRota[base]) {
+    prefetchPaginas(paginaDaRota[base])
+  }
+
+  const nomes = rotasProvaveis[base] || []
+  if (nomes.length === 0) return undefined
+
+  const agendar = window.requestIdleCallback || ((fn) => setTimeout(fn, 1500))
+  const cancelar = window.cancelIdleCallback || clearTimeout
+  const id = agendar(() => prefetchPaginas(...nomes))
+  return () => cancelar(id)
+}
@@ -1,4 +1,5 @@
 import axios from 'axios'
+import * as cache from './cache'
 
 // URL da API - usa variável de ambiente ou URL do Render em produção
 const API_URL = import.meta.env.VITE_API_URL || 'https://manutencoes-api.onrender.com/api'
@@ -24,12 +25,52 @@ api.interceptors.request.use(
   }
 )
 
+// Renovação do access token (curta duração) via refresh token;
+// requisições simultâneas que recebem 401 compartilham a mesma renovação
+let renovacaoEmAndamento = null
+
+const renovarToken = () => {
+  if (!renovacaoEmAndamento) {
+    renovacaoEmAndamento = (async () => {
+      const refreshToken = localStorage.getItem('refresh_token')
+      if (!refreshToken) throw new Error('Sem refresh token')
+      const response = await axios.post(`${API_URL}/refresh`, { refresh_token: refreshToken })
+      salvarTokens(response.data)
+      return response.data.access_token
+    })().finally(() => {
+      renovacaoEmAndamento = null
+    })
+  }
+  return renovacaoEmAndamento
+}
+
+const salvarTokens = ({ access_token, refresh_token }) => {
+  localStorage.setItem('token', access_token)
+  localStorage.setItem('refresh_token', refresh_token)
+}
+
+const limparTokens = () => {
+  localStorage.removeItem('token')
+  localStorage.removeItem('refresh_token')
+}
+
 // Interceptor para tratar erros de autenticação
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const original = error.config
+    if (error.response?.status === 401 && original && !original._renovado) {
+      original._renovado = true
+      try {
+        const token = await renovarToken()
+        original.headers.Authorization = `Bearer ${token}`
+        return api(original)
+      } catch {
+        // Refresh inválido ou expirado: segue para o login
+      }
+    }
     if (error.response?.status === 401) {
-      localStorage.removeItem('token')
+      limparTokens()
       window.location.href = '/login'
     }
     return Promise.reject(error)
@@ -37,15 +78,32 @@ api.interceptors.response.use(
 )
 
 // Auth
-export const login = async (senha) => {
-  const response = await api.post('/login', { senha })
-  const { access_token } = response.data
-  localStorage.setItem('token', access_token)
-  return access_token
+// Frota (inquilino) do último login; vazio = senha da aplicação
+export const inquilinoAtual = () => localStorage.getItem('inquilino') || ''
+
+export const login = async (senha, inquilino = '') => {
+  const response = await api.post('/login', { senha, inquilino: inquilino || null })
+  // O cache local e a fila offline pertencem a uma frota só
+  if (inquilino !== inquilinoAtual()) {
+    estado = null
+    await cache.limpar().catch(() => {})
+    localStorage.removeItem('ultima_notificacao')
+    localStorage.setItem('inquilino', inquilino)
+  }
+  salvarTokens(response.data)
+  return response.data.access_token
 }
 
 export const logout = () => {
-  localStorage.removeItem('token')
+  // Revoga os tokens no servidor sem bloquear a saída
+  const token = localStorage.getItem('token')
+  const refreshToken = localStorage.getItem('refresh_token')
+  api.post('/logout', { refresh_token: refreshToken }, {
+    headers: { Authorization: `Bearer ${token}` }
+  }).catch(() => {})
+  limparTokens()
+  estado = null
+  cache.limpar().catch(() => {})
 }
 
 export const isAuthenticated = () => {
@@ -61,52 +119,353 @@ export const verificarAuth = async () => {
   }
 }
 
+// Cache local (IndexedDB) com stale-while-revalidate e fila offline
+const ESTADO_VAZIO = { sincronizado: false, token: 0, registros: {}, veiculos: {}, anexos: {} }
+
+let estado = null
+let sincronizacaoEmAndamento = null
+let reenvioEmAndamento = null
+
+const semConexao = (error) => !error.response
+
+const agoraSQLite = () => new Date().toISOString().slice(0, 19).replace('T', ' ')
+
+const carregarEstado = async () => {
+  if (!estado) {
+    estado = (await cache.ler('sync').catch(() => null)) || ESTADO_VAZIO
+  }
+  return estado
+}
+
+const salvarEstado = async (novo) => {
+  estado = novo
+  await cache.gravar('sync', novo).catch(() => {})
+}
+
+// Entradas com id negativo foram criadas offline e ainda estão na fila
+const apenasPendentes = (mapa) => Object.fromEntries(
+  Object.entries(mapa).filter(([id]) => Number(id) < 0)
+)
+
+const aplicarAlteracoes = (atual, alteracoes) => {
+  const novo = { sincronizado: true, token: alteracoes.token }
+  for (const entidade of ['registros', 'veiculos', 'anexos']) {
+    const mapa = alteracoes.completo
+      ? apenasPendentes(atual[entidade])
+      : { ...atual[entidade] }
+    for (const item of alteracoes[entidade]) {
+      mapa[item.id] = item
+    }
+    for (const id of alteracoes.excluidos[entidade]) {
+      delete mapa[id]
+    }
+    novo[entidade] = mapa
+  }
+  return novo
+}
+
+// Busca apenas o delta desde o último token; chamadas simultâneas compartilham a mesma requisição
+export const sincronizarCache = () => {
+  if (!sincronizacaoEmAndamento) {
+    sincronizacaoEmAndamento = (async () => {
+      const atual = await carregarEstado()
+      const alteracoes = await sincronizar(atual.sincronizado ? atual.token : 0)
+      const mudou = alteracoes.completo || alteracoes.token !== atual.token || !atual.sincronizado
+      if (mudou) {
+        await salvarEstado(aplicarAlteracoes(atual, alteracoes))
+      }
+      return mudou
+    })().finally(() => {
+      sincronizacaoEmAndamento = null
+    })
+  }
+  return sincronizacaoEmAndamento
+}
+
+// Retorna o dado local imediatamente e revalida em segundo plano;
+// onAtualizar recebe a versão nova se algo mudou no servidor
+const comRevalidacao = async (lerLocal, onAtualizar) => {
+  const atual = await carregarEstado()
+  if (atual.sincronizado) {
+    // Com o stream de alterações aberto o cache já está em dia
+    if (!aoVivo) {
+      sincronizarCache()
+        .then((mudou) => {
+          if (mudou && onAtualizar) onAtualizar(lerLocal())
+        })
+        .catch(() => {})
+    }
+    return lerLocal()
+  }
+  await sincronizarCache()
+  return lerLocal()
+}
+
+const salvarLocal = async (entidade, item) => {
+  const atual = await carregarEstado()
+  await salvarEstado({ ...atual, [entidade]: { ...atual[entidade], [item.id]: item } })
+}
+
+const removerLocal = async (entidade, id) => {
+  const atual = await carregarEstado()
+  const mapa = { ...atual[entidade] }
+  delete mapa[id]
+  await salvarEstado({ ...atual, [entidade]: mapa })
+}
+
+const ordenarDesc = (campo) => (a, b) =>
+  (b[campo] || '').localeCompare(a[campo] || '') || b.id - a.id
+
+const contemTexto = (registro, termo) => {
+  const busca = termo.toLowerCase()
+  return registro.titulo.toLowerCase().includes(busca) ||
+    JSON.stringify(registro.dados || {}).toLowerCase().includes(busca)
+}
+
+// Chaves do autocompletar de veículos, iguais às do backend (database.normalizar_placa/
+// normalizar_modelo): a placa Mercosul vira o padrão antigo (5ª posição A-J -> 0-9)
+const normalizarPlaca = (placa) => {
+  const chave = placa.toUpperCase().replace(/[^A-Z0-9]/g, '')
+  return /^[A-Z]{3}[0-9][A-J]/.test(chave)
+    ? chave.slice(0, 4) + (chave.charCodeAt(4) - 65) + chave.slice(5)
+    : chave
+}
+
+const normalizarModelo = (modelo) => modelo
+  .normalize('NFKD')
+  .replace(/[\u0300-\u036f]/g, '')
+  .toLowerCase()
+  .replace(/[^a-z0-9]+/g, ' ')
+  .trim()
+
+// Reenvia, em ordem, as escritas feitas sem conexão
+export const reenviarFila = () => {
+  if (!reenvioEmAndamento) {
+    reenvioEmAndamento = (async () => {
+      const fila = (await cache.listarFila()).sort((a, b) => a.id - b.id)
+      const descartadas = new Set()
+      for (let i = 0; i < fila.length; i++) {
+        const operacao = fila[i]
+        if (descartadas.has(operacao.id)) continue
+        try {
+          if (operacao.tipo === 'criarRegistro') {
+            const response = await api.post('/registros', operacao.dados)
+            // Operações seguintes passam a apontar para o id definitivo
+            for (const seguinte of fila.slice(i + 1)) {
+              if (seguinte.registroId === operacao.idTemporario) {
+                seguinte.registroId = response.data.id
+                await cache.atualizarNaFila(seguinte)
+              }
+            }
+            await removerLocal('registros', operacao.idTemporario)
+          } else if (operacao.tipo === 'atualizarRegistro') {
+            await api.put(`/registros/${operacao.registroId}`, operacao.dados)
+          } else if (operacao.tipo === 'uploadAnexo') {
+            await enviarArquivo(operacao.registroId, operacao.arquivo, operacao.nome)
+            await removerLocal('anexos', operacao.idTemporario)
+          }
+        } catch (error) {
+          if (semConexao(error)) break
+          // Rejeitada pelo servidor: descarta para não bloquear o restante da fila
+          console.error('Erro ao reenviar operação offline:', error)
+          if (operacao.tipo === 'criarRegistro') {
+            // Sem o registro, as operações que dependem do id temporário também são descartadas
+            await removerLocal('registros', operacao.idTemporario)
+            for (const seguinte of fila.slice(i + 1)) {
+              if (seguinte.registroId === operacao.idTemporario) {
+                if (seguinte.tipo === 'uploadAnexo') await removerLocal('anexos', seguinte.idTemporario)
+                await cache.removerDaFila(seguinte.id)
+                descartadas.add(seguinte.id)
+              }
+            }
+          } else if (operacao.tipo === 'uploadAnexo') {
+            await removerLocal('anexos', operacao.idTemporario)
+          }
+        }
+        await cache.removerDaFila(operacao.id)
+      }
+      await sincronizarCache().catch(() => {})
+    })().finally(() => {
+      reenvioEmAndamento = null
+    })
+  }
+  return reenvioEmAndamento
+}
+
 // Registros
-export const listarRegistros = async (busca = '') => {
-  const params = busca ? { busca } : {}
-  const response = await api.get('/registros', { params })
-  return response.data
+export const listarRegistros = async (busca = '', { onAtualizar } = {}) => {
+  const lerLocal = () => Object.values(estado.registros)
+    .filter((registro) => !busca || contemTexto(registro, busca))
+    .sort(ordenarDesc('atualizado_em'))
+  return comRevalidacao(lerLocal, onAtualizar)
 }
 
-export const obterRegistro = async (id) => {
+export const obterRegistro = async (id, { onAtualizar } = {}) => {
+  const atual = await carregarEstado()
+  if (atual.registros[id]) {
+    return comRevalidacao(() => estado.registros[id], onAtualizar)
+  }
   const response = await api.get(`/registros/${id}`)
   return response.data
 }
 
 export const criarRegistro = async (registro) => {
-  const response = await api.post('/registros', registro)
-  return response.data
+  try {
+    const response = await api.post('/registros', registro)
+    await sincronizarCache().catch(() => {})
+    return response.data
+  } catch (error) {
+    if (!semConexao(error)) throw error
+    const agora = agoraSQLite()
+    const otimista = {
+      quilometragem: null,
+      proxima_troca: null,
+      data_proxima_troca: null,
+      filtro_trocado: false,
+      dados: {},
+      ...registro,
+      id: -Date.now(),
+      criado_em: agora,
+      atualizado_em: agora,
+      pendente: true
+    }
+    await salvarLocal('registros', otimista)
+    await cache.enfileirar({ tipo: 'criarRegistro', idTemporario: otimista.id, dados: registro })
+    return otimista
+  }
 }
 
 export const atualizarRegistro = async (id, registro) => {
-  const response = await api.put(`/registros/${id}`, registro)
-  return response.data
+  const registroId = Number(id)
+  if (registroId < 0) {
+    // Registro ainda não enviado: atualiza a própria criação pendente
+    const fila = await cache.listarFila()
+    const criacao = fila.find((op) => op.tipo === 'criarRegistro' && op.idTemporario === registroId)
+    if (criacao) {
+      await cache.atualizarNaFila({ ...criacao, dados: registro })
+    }
+    const atual = await carregarEstado()
+    const atualizado = { ...atual.registros[registroId], ...registro, atualizado_em: agoraSQLite() }
+    await salvarLocal('registros', atualizado)
+    return atualizado
+  }
+  try {
+    const response = await api.put(`/registros/${registroId}`, registro)
+    await sincronizarCache().catch(() => {})
+    return response.data
+  } catch (error) {
+    if (!semConexao(error)) throw error
+    const atual = await carregarEstado()
+    const otimista = { ...atual.registros[registroId], ...registro, atualizado_em: agoraSQLite(), pendente: true }
+    await salvarLocal('registros', otimista)
+    await cache.enfileirar({ tipo: 'atualizarRegistro', registroId, dados: registro })
+    return otimista
+  }
 }
 
 export const excluirRegistro = async (id) => {
   await api.delete(`/registros/${id}`)
+  await sincronizarCache().catch(() => {})
 }
 
 export const obterDataPadrao = async () => {
-  const response = await api.get('/data-padrao-proxima-troca')
-  return response.data
+  try {
+    const response = await api.get('/data-padrao-proxima-troca')
+    return response.data
+  } catch (error) {
+    if (!semConexao(error)) throw error
+    // Sem conexão: calcula localmente (hoje + 6 meses)
+    const hoje = new Date()
+    const data = new Date(hoje)
+    data.setMonth(data.getMonth() + 6)
+    return { data: data.toISOString().split('T')[0], hoje: hoje.toISOString().split('T')[0] }
+  }
 }
 
 // Histórico
-export const listarHistorico = async () => {
-  const response = await api.get('/historico')
+export const listarHistorico = async ({ onAtualizar } = {}) => {
+  const lerLocal = () => Object.values(estado.registros).sort(ordenarDesc('criado_em'))
+  return comRevalidacao(lerLocal, onAtualizar)
+}
+
+// Página da timeline com busca no servidor (paginação por cursor);
+// sem conexão, pagina o cache local. A timeline só exibe título e datas:
+// por padrão pede a projeção "resumo" (sem os campos dinâmicos)
+// `de`/`ate` ("YYYY-MM-DD") incluem os registros arquivados no servidor;
+// o cache local só tem os ativos
+export const listarHistoricoPaginado = async ({ busca = '', cursor = null, limite = 50, campos = 'resumo', de = '', ate = '' } = {}) => {
+  if (!cursor?.startsWith('local:')) {
+    try {
+      const params = { limite, campos }
+      if (busca) params.busca = busca
+      if (de) params.de = de
+      if (ate) params.ate = ate
+      if (cursor) params.cursor = cursor
+      const response = await api.get('/historico', { params })
+      return { registros: response.data, proximoCursor: response.headers['x-proximo-cursor'] || null }
+    } catch (error) {
+      // Sem conexão no meio de uma paginação do servidor: não há como continuar
+      if (!semConexao(error) || cursor) throw error
+    }
+  }
+  const atual = await carregarEstado()
+  const lista = Object.values(atual.registros)
+    .filter((registro) => !busca || contemTexto(registro, busca))
+    .filter((registro) => (!de || registro.criado_em.slice(0, 10) >= de) && (!ate || registro.criado_em.slice(0, 10) <= ate))
+    .sort(ordenarDesc('criado_em'))
+  const inicio = cursor?.startsWith('local:') ? Number(cursor.slice(6)) : 0
+  const fim = inicio + limite
+  return {
+    registros: lista.slice(inicio, fim),
+    proximoCursor: fim < lista.length ? `local:${fim}` : null
+  }
+}
+
+// Sincronização incremental: retorna apenas o que mudou desde o token
+export const sincronizar = async (desde = 0) => {
+  const response = await api.get('/sync', { params: { desde } })
   return response.data
 }
 
 // Anexos
-export const listarAnexos = async (registroId) => {
-  const response = await api.get(`/registros/${registroId}/anexos`)
-  return response.data
+export const listarAnexos = async (registroId, { onAtualizar } = {}) => {
+  const id = Number(registroId)
+  const lerLocal = () => Object.values(estado.anexos)
+    .filter((anexo) => anexo.registro_id === id)
+    .sort(ordenarDesc('criado_em'))
+  return comRevalidacao(lerLocal, onAtualizar)
 }
 
-export const uploadAnexo = async (registroId, arquivo) => {
+// Upload direto para o armazenamento (S3) quando o backend oferece; senão pela API
+const enviarDireto = async (registroId, arquivo, nome) => {
+  const { data } = await api.post(`/registros/${registroId}/anexos/upload-direto`, {
+    nome,
+    tipo: arquivo.type || null,
+    tamanho: arquivo.size
+  })
+  if (!data.upload) return null
+
+  const formData = new FormData()
+  Object.entries(data.upload.fields).forEach(([campo, valor]) => formData.append(campo, valor))
+  formData.append('file', arquivo, nome)
+  // Sem o header Authorization: a URL pré-assinada já autoriza o envio
+  const resposta = await fetch(data.upload.url, { method: 'POST', body: formData })
+  if (!resposta.ok) throw new Error(`Falha no upload para o armazenamento (${resposta.status})`)
+
+  const concluido = await api.post(`/registros/${registroId}/anexos/concluir`, {
+    nome_arquivo: data.nome_arquivo,
+    nome_original: nome,
+    tipo: arquivo.type || null
+  })
+  return concluido.data
+}
+
+const enviarArquivo = async (registroId, arquivo, nome) => {
+  const direto = await enviarDireto(registroId, arquivo, nome)
+  if (direto) return direto
+
   const formData = new FormData()
-  formData.append('arquivo', arquivo)
+  formData.append('arquivo', arquivo, nome)
 
   const response = await api.post(`/registros/${registroId}/anexos`, formData, {
     headers: {
@@ -116,8 +475,46 @@ export const uploadAnexo = async (registroId, arquivo) => {
   return response.data
 }
 
+export const uploadAnexo = async (registroId, arquivo) => {
+  const id = Number(registroId)
+  try {
+    if (id < 0) throw new Error('Registro ainda não sincronizado')
+    const anexo = await enviarArquivo(id, arquivo, arquivo.name)
+    await sincronizarCache().catch(() => {})
+    return anexo
+  } catch (error) {
+    if (id >= 0 && !semConexao(error)) throw error
+    const otimista = {
+      id: -Date.now(),
+      registro_id: id,
+      nome_original: arquivo.name,
+      nome_arquivo: '',
+      tipo: arquivo.type,
+      tamanho: arquivo.size,
+      criado_em: agoraSQLite(),
+      pendente: true
+    }
+    await salvarLocal('anexos', otimista)
+    await cache.enfileirar({
+      tipo: 'uploadAnexo',
+      idTemporario: otimista.id,
+      registroId: id,
+      arquivo,
+      nome: arquivo.name
+    })
+    return otimista
+  }
+}
+
 export const excluirAnexo = async (anexoId) => {
   await api.delete(`/anexos/${anexoId}`)
+  await sincronizarCache().catch(() => {})
+}
+
+// URL pré-assinada de curta duração (null quando o armazenamento é local)
+export const obterUrlDownloadAnexo = async (anexoId) => {
+  const response = await api.get(`/anexos/${anexoId}/url`)
+  return response.data.url
 }
 
 export const getUrlDownloadAnexo = (anexoId) => {
@@ -126,9 +523,35 @@ export const getUrlDownloadAnexo = (anexoId) => {
 }
 
 // Veículos
-export const listarVeiculos = async () => {
-  const response = await api.get('/veiculos')
-  return response.data
+export const listarVeiculos = async ({ onAtualizar } = {}) => {
+  const lerLocal = () => Object.values(estado.veiculos)
+    .sort((a, b) => a.modelo.localeCompare(b.modelo))
+  return comRevalidacao(lerLocal, onAtualizar)
+}
+
+// Veículos cuja placa ou modelo começa com `termo` (placas primeiro); sem conexão, no cache local
+export const autocompletarVeiculos = async (termo, limite = 10) => {
+  try {
+    const response = await api.get('/veiculos/autocomplete', { params: { q: termo, limite } })
+    return response.data
+  } catch (error) {
+    if (!semConexao(error)) throw error
+  }
+  const atual = await carregarEstado()
+  const placa = normalizarPlaca(termo)
+  const modelo = normalizarModelo(termo)
+  const veiculos = Object.values(atual.veiculos)
+  const porPlaca = placa
+    ? veiculos.filter((veiculo) => normalizarPlaca(veiculo.placa).startsWith(placa))
+      .sort((a, b) => normalizarPlaca(a.placa).localeCompare(normalizarPlaca(b.placa)))
+    : []
+  const porModelo = modelo
+    ? veiculos.filter((veiculo) => normalizarModelo(veiculo.modelo).startsWith(modelo))
+      .sort((a, b) => normalizarModelo(a.modelo).localeCompare(normalizarModelo(b.modelo)))
+    : []
+  return [...new Set([...porPlaca, ...porModelo])]
+    .slice(0, limite)
+    .map((veiculo) => ({ id: veiculo.id, placa: veiculo.placa, modelo: veiculo.modelo }))
 }
 
 export const obterVeiculo = async (id) => {
@@ -138,16 +561,19 @@ export const obterVeiculo = async (id) => {
 
 export const criarVeiculo = async (veiculo) => {
   const response = await api.post('/veiculos', veiculo)
+  await sincronizarCache().catch(() => {})
   return response.data
 }
 
 export const atualizarVeiculo = async (id, veiculo) => {
   const response = await api.put(`/veiculos/${id}`, veiculo)
+  await sincronizarCache().catch(() => {})
   return response.data
 }
 
 export const excluirVeiculo = async (id) => {
   await api.delete(`/veiculos/${id}`)
+  await sincronizarCache().catch(() => {})
 }
 
 // Exportação
@@ -161,4 +587,159 @@ export const exportarPDFRegistro = async (registroId) => {
   return response.data
 }
 
+// Relatórios consolidados: cada registro com os campos e as miniaturas dos anexos
+export const exportarRelatorioRegistros = async (ids) => {
+  const response = await api.post('/relatorios/registros', { ids }, { responseType: 'blob' })
+  return response.data
+}
+
+export const exportarRelatorioVeiculo = async (veiculoId) => {
+  const response = await api.get(`/veiculos/${veiculoId}/relatorio`, { responseType: 'blob' })
+  return response.data
+}
+
+// Streams SSE: o EventSource não envia headers, então o token vai na URL;
+// quando a conexão cai (ex.: token expirado), renova o token e reabre
+const abrirStream = (caminho, { lerDesde = () => null, aoAbrir, aoFechar, ouvintes }) => {
+  let fonte = null
+  let reabrir = null
+  let encerrado = false
+
+  const abrir = () => {
+    const params = new URLSearchParams({ token: localStorage.getItem('token') || '' })
+    const desde = lerDesde()
+    if (desde) params.set('desde', desde)
+    fonte = new EventSource(`${API_URL}${caminho}?${params}`)
+    if (aoAbrir) fonte.onopen = aoAbrir
+    for (const [nome, ouvinte] of Object.entries(ouvintes)) {
+      fonte.addEventListener(nome, ouvinte)
+    }
+    fonte.onerror = () => {
+      fonte.close()
+      if (aoFechar) aoFechar()
+      if (encerrado) return
+      reabrir = setTimeout(async () => {
+        // verificarAuth passa pelo interceptor, que renova o token se expirou
+        if (await verificarAuth() && !encerrado) abrir()
+      }, 5000)
+    }
+  }
+
+  abrir()
+  return () => {
+    encerrado = true
+    clearTimeout(reabrir)
+    fonte?.close()
+    if (aoFechar) aoFechar()
+  }
+}
+
+// Um único stream por aba, compartilhado pelos componentes; a troca de rota
+// desmonta e remonta o Layout, então o fechamento espera um instante
+const compartilharStream = (abrir) => {
+  let fechar = null
+  let fechamento = null
+  let assinantes = 0
+  return () => {
+    assinantes++
+    clearTimeout(fechamento)
+    if (!fechar) fechar = abrir()
+    return () => {
+      assinantes--
+      if (assinantes > 0) return
+      fechamento = setTimeout(() => {
+        fechar()
+        fechar = null
+      }, 1000)
+    }
+  }
+}
+
+// Notificações: avisos de trocas próximas e vencidas
+const ouvintesNotificacoes = new Set()
+
+const assinarStreamNotificacoes = compartilharStream(() => abrirStream('/notificacoes/stream', {
+  lerDesde: () => localStorage.getItem('ultima_notificacao'),
+  ouvintes: {
+    notificacao: (evento) => {
+      localStorage.setItem('ultima_notificacao', evento.lastEventId)
+      const aviso = JSON.parse(evento.data)
+      for (const ouvinte of ouvintesNotificacoes) ouvinte(aviso)
+    }
+  }
+}))
+
+export const assinarNotificacoes = (aoReceber) => {
+  ouvintesNotificacoes.add(aoReceber)
+  const cancelar = assinarStreamNotificacoes()
+  return () => {
+    ouvintesNotificacoes.delete(aoReceber)
+    cancelar()
+  }
+}
+
+// Alterações ao vivo: enquanto o stream está aberto o servidor envia o delta
+// de cada escrita (de qualquer usuário), o cache local fica em dia e as
+// leituras não precisam revalidar com /sync
+let aoVivo = false
+let aplicacaoEmAndamento = Promise.resolve()
+const ouvintesAlteracoes = new Set()
+
+// O ouvinte recebe o delta aplicado, ou null se o cache foi ressincronizado
+export const ouvirAlteracoes = (ouvinte) => {
+  ouvintesAlteracoes.add(ouvinte)
+  return () => ouvintesAlteracoes.delete(ouvinte)
+}
+
+const avisarOuvintes = (alteracoes) => {
+  for (const ouvinte of ouvintesAlteracoes) ouvinte(alteracoes)
+}
+
+const ressincronizar = async () => {
+  if (await sincronizarCache()) avisarOuvintes(null)
+}
+
+const aplicarEvento = async (alteracoes) => {
+  const atual = await carregarEstado()
+  // Só aplica um delta que parte exatamente do token local
+  if (alteracoes.resincronizar || !atual.sincronizado || alteracoes.desde !== atual.token) {
+    await ressincronizar()
+    return
+  }
+  await salvarEstado(aplicarAlteracoes(atual, { ...alteracoes, completo: false }))
+  avisarOuvintes(alteracoes)
+}
+
+// Eventos são aplicados em ordem, um de cada vez
+const enfileirarAplicacao = (funcao) => {
+  aplicacaoEmAndamento = aplicacaoEmAndamento.then(funcao).catch(() => {})
+}
+
+export const assinarAlteracoes = compartilharStream(() => abrirStream('/alteracoes/stream', {
+  aoAbrir: () => {
+    aoVivo = true
+    // Alcança o que mudou enquanto o stream estava fechado
+    enfileirarAplicacao(ressincronizar)
+  },
+  aoFechar: () => {
+    aoVivo = false
+  },
+  ouvintes: {
+    alteracoes: (evento) => {
+      const alteracoes = JSON.parse(evento.data)
+      enfileirarAplicacao(() => aplicarEvento(alteracoes))
+    }
+  }
+}))
+
+// Reenvia a fila offline quando a conexão volta
+if (typeof window !== 'undefined') {
+  window.addEventListener('online', () => {
+    if (isAuthenticated()) reenviarFila().catch(() => {})
+  })
+  if (navigator.onLine && isAuthenticated()) {
+    reenviarFila().catch(() => {})
+  }
+}
+
 export default api
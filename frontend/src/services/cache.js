@@ -0,0 +1,104 @@
+// Cache local em IndexedDB: dados sincronizados e fila de escritas offline.
+// Se o IndexedDB não estiver disponível (ex.: navegação privada), usa memória.
+
+const DB_NOME = 'manutencoes'
+const DB_VERSAO = 1
+const STORE_DADOS = 'dados'
+const STORE_FILA = 'fila'
+
+let dbPromise = null
+const memoria = { dados: new Map(), fila: new Map(), proximoId: 1 }
+
+const abrirBanco = () => {
+  if (!window.indexedDB) {
+    return Promise.resolve(null)
+  }
+  if (!dbPromise) {
+    dbPromise = new Promise((resolve) => {
+      const request = window.indexedDB.open(DB_NOME, DB_VERSAO)
+      request.onupgradeneeded = () => {
+        const db = request.result
+        if (!db.objectStoreNames.contains(STORE_DADOS)) {
+          db.createObjectStore(STORE_DADOS)
+        }
+        if (!db.objectStoreNames.contains(STORE_FILA)) {
+          db.createObjectStore(STORE_FILA, { keyPath: 'id', autoIncrement: true })
+        }
+      }
+      request.onsuccess = () => resolve(request.result)
+      request.onerror = () => resolve(null)
+    })
+  }
+  return dbPromise
+}
+
+const executar = async (store, modo, operacao) => {
+  const db = await abrirBanco()
+  if (!db) return undefined
+  return new Promise((resolve, reject) => {
+    const transacao = db.transaction(store, modo)
+    const request = operacao(transacao.objectStore(store))
+    transacao.oncomplete = () => resolve(request?.result)
+    transacao.onerror = () => reject(transacao.error)
+  })
+}
+
+// Dados (chave/valor)
+export const ler = async (chave) => {
+  const db = await abrirBanco()
+  if (!db) return memoria.dados.get(chave)
+  return executar(STORE_DADOS, 'readonly', (store) => store.get(chave))
+}
+
+export const gravar = async (chave, valor) => {
+  const db = await abrirBanco()
+  if (!db) {
+    memoria.dados.set(chave, valor)
+    return
+  }
+  await executar(STORE_DADOS, 'readwrite', (store) => store.put(valor, chave))
+}
+
+// Fila de escritas feitas offline (reenviadas em ordem)
+export const enfileirar = async (operacao) => {
+  const db = await abrirBanco()
+  if (!db) {
+    const id = memoria.proximoId++
+    memoria.fila.set(id, { ...operacao, id })
+    return id
+  }
+  return executar(STORE_FILA, 'readwrite', (store) => store.add(operacao))
+}
+
+export const listarFila = async () => {
+  const db = await abrirBanco()
+  if (!db) return [...memoria.fila.values()]
+  return executar(STORE_FILA, 'readonly', (store) => store.getAll())
+}
+
+export const atualizarNaFila = async (operacao) => {
+  const db = await abrirBanco()
+  if (!db) {
+    memoria.fila.set(operacao.id, operacao)
+    return
+  }
+  await executar(STORE_FILA, 'readwrite', (store) => store.put(operacao))
+}
+
+export const removerDaFila = async (id) => {
+  const db = await abrirBanco()
+  if (!db) {
+    memoria.fila.delete(id)
+    return
+  }
+  await executar(STORE_FILA, 'readwrite', (store) => store.delete(id))
+}
+
+export const limpar = async () => {
+  memoria.dados.clear()
+  memoria.fila.clear()
+  const db = await abrirBanco()
+  if (!db) return
+  await executar(STORE_DADOS, 'readwrite', (store) => store.clear())
+  await executar(STORE_FILA, 'readwrite', (store) => store.clear())
+}
@@ -1,8 +1,52 @@
 import { defineConfig } from 'vite'
 import react from '@vitejs/plugin-react'
+import { gzipSync } from 'node:zlib'
+
+// Orçamento de tamanho (KB gzip). O build falha se algum limite for ultrapassado.
+const ORCAMENTO_KB = {
+  entrada: Number(process.env.BUNDLE_BUDGET_ENTRY_KB || 120),
+  chunk: Number(process.env.BUNDLE_BUDGET_CHUNK_KB || 150)
+}
+
+function orcamentoBundle() {
+  return {
+    name: 'orcamento-bundle',
+    apply: 'build',
+    generateBundle(_, bundle) {
+      const excedidos = []
+      for (const arquivo of Object.values(bundle)) {
+        if (arquivo.type !== 'chunk' && !arquivo.fileName.endsWith('.css')) continue
+        const conteudo = arquivo.type === 'chunk' ? arquivo.code : arquivo.source
+        const kb = gzipSync(conteudo).length / 1024
+        const limite = arquivo.isEntry ? ORCAMENTO_KB.entrada : ORCAMENTO_KB.chunk
+        this.info?.(`${arquivo.fileName}: ${kb.toFixed(1)} KB gzip (limite ${limite} KB)`)
+        if (kb > limite) {
+          excedidos.push(`${arquivo.fileName} (${kb.toFixed(1)} KB > ${limite} KB)`)
+        }
+      }
+      if (excedidos.length > 0) {
+        this.error(`Orçamento de bundle excedido: ${excedidos.join(', ')}`)
+      }
+    }
+  }
+}
 
 export default defineConfig({
-  plugins: [react()],
+  plugins: [react(), orcamentoBundle()],
+  build: {
+    rollupOptions: {
+      output: {
+        // Bibliotecas mudam raramente: chunks próprios continuam em cache entre deploys
+        manualChunks(id) {
+          if (!id.includes('node_modules')) return undefined
+          if (id.includes('@mui') || id.includes('@emotion')) return 'vendor-mui'
+          if (id.includes('axios')) return 'vendor-axios'
+          if (/[\\/](react|react-dom|react-router|react-router-dom|scheduler)[\\/]/.test(id)) return 'vendor-react'
+          return 'vendor'
+        }
+      }
+    }
+  },
   server: {
     port: 5173,
     host: '0.0.0.0',